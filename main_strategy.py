@@ -75,7 +75,8 @@ class EnhancedDayTradingSystem:
             'obv_ma_period': self.config['chip_analysis']['obv']['ma_period'],
             'volume_ma_period': self.config['technical_indicators']['volume']['ma_period'],
             'volume_threshold': self.config['technical_indicators']['volume']['min_volume_ratio'],
-            'institutional_threshold': self.config['chip_analysis']['institutional']['threshold_lots']
+            'institutional_threshold': self.config['chip_analysis']['institutional']['threshold_lots'],
+            'indicator_dtype': self.config['technical_indicators'].get('float_dtype', 'float64')
         }
         self.strategy = EnhancedStrategyC(strategy_cfg)
         
@@ -146,11 +147,13 @@ class EnhancedDayTradingSystem:
             return []
         
         # 使用策略掃描
-        results = self.strategy.scan_stocks(stocks_data, institutional_data)
+        results = self.strategy.scan_stocks(stocks_data, institutional_data, render=False)
         
-        # 應用評分過濾
+        # 應用評分過濾；理由文字只對通過的股票產生
         min_score = self.config['scoring']['min_score_for_entry']
         filtered = [r for r in results if r['score'] >= min_score]
+        for r in filtered:
+            self.strategy.render_reasons(r)
         
         logger.info(f"掃描 {len(stocks_data)} 檔股票，{len(filtered)} 檔符合條件（分數 >= {min_score}）")
         
@@ -0,0 +1,27 @@
+"""
+選用的 Numba JIT 相容層
+
+若環境安裝了 numba，`njit` / `prange` 直接使用 numba 的版本；
+否則退回為不做任何事的裝飾器與內建 `range`，核心邏輯仍以純 Python 執行。
+"""
+
+try:
+    from numba import njit, prange
+
+    HAS_NUMBA = True
+except ImportError:  # pragma: no cover - 依環境而定
+    HAS_NUMBA = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        """numba.njit 的替代品：原樣回傳被裝飾的函式"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+
+        def decorator(func):
+            return func
+
+        return decorator
+
+
+__all__ = ["HAS_NUMBA", "njit", "prange"]
@@ -72,15 +72,19 @@ class DataValidator:
                 raise DataValidationError(error_msg)
             return False, errors
         
-        # 3. 檢查 NaN 值
-        for col in required_columns:
-            if col in df.columns:
-                nan_count = df[col].isna().sum()
-                if nan_count > 0:
-                    error_msg = f"欄位 '{col}' 包含 {nan_count} 個 NaN 值"
-                    errors.append(error_msg)
-                    if strict:
-                        raise DataValidationError(error_msg)
+        # 3. 檢查 NaN 值（數值欄位取出底層陣列一次，單次掃描得到各欄位的 NaN 數）
+        present_columns = [col for col in required_columns if col in df.columns]
+        block = df[present_columns]
+        if all(pd.api.types.is_numeric_dtype(dtype) for dtype in block.dtypes):
+            nan_counts = np.isnan(block.to_numpy(dtype=np.float64, na_value=np.nan)).sum(axis=0)
+        else:
+            nan_counts = block.isna().to_numpy().sum(axis=0)
+        for col, nan_count in zip(present_columns, nan_counts):
+            if nan_count > 0:
+                error_msg = f"欄位 '{col}' 包含 {nan_count} 個 NaN 值"
+                errors.append(error_msg)
+                if strict:
+                    raise DataValidationError(error_msg)
         
         # 4. 檢查價格關係 (High >= Low, High >= Open/Close, Low <= Open/Close)
         if all(col in df.columns for col in ['open', 'high', 'low', 'close']):
@@ -267,12 +271,18 @@ class DataValidator:
             布林序列，True 表示異常值
         """
         if method == 'iqr':
-            Q1 = data.quantile(0.25)
-            Q3 = data.quantile(0.75)
+            # 兩個分位數以一次 nanquantile 取得（與 Series.quantile 相同：忽略 NaN、線性內插），
+            # 上下界比較直接在 NumPy 陣列上進行
+            values = data.to_numpy(dtype=np.float64, na_value=np.nan)
+            if np.isnan(values).all():
+                return pd.Series(False, index=data.index, name=data.name)
+            Q1, Q3 = np.nanquantile(values, [0.25, 0.75])
             IQR = Q3 - Q1
             lower_bound = Q1 - threshold * IQR
             upper_bound = Q3 + threshold * IQR
-            return (data < lower_bound) | (data > upper_bound)
+            return pd.Series(
+                (values < lower_bound) | (values > upper_bound), index=data.index, name=data.name
+            )
         
         elif method == 'zscore':
             mean = data.mean()
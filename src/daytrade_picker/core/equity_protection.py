@@ -15,6 +15,48 @@ from datetime import datetime, timedelta
 from enum import Enum
 import logging
 
+from .._jit import njit
+
+
+# 報告模板（於模組載入時建立一次，export_report 以 format_map 套用統計值）
+_REPORT_TEMPLATE = """
+{separator}
+資金保護系統報告
+{separator}
+
+【資金狀況】
+  初始資金: {initial_capital:,.0f} 元
+  當前資金: {current_capital:,.0f} 元
+  總損益: {total_pnl:,.0f} 元 ({total_return_pct:+.2f}%)
+  高峰資金: {peak_capital:,.0f} 元
+
+【風險指標】
+  當前回撤: {current_drawdown_pct:.2f}%
+  最大回撤: {max_drawdown_pct:.2f}%
+  回撤上限: {max_dd_limit_pct:.0f}%
+
+【交易統計】
+  總交易次數: {total_trades}
+  獲利次數: {winning_trades}
+  虧損次數: {losing_trades}
+  勝率: {win_rate_pct:.1f}%
+  
+【績效指標】
+  平均獲利: {avg_profit:,.0f} 元
+  平均虧損: {avg_loss:,.0f} 元
+  獲利因子: {profit_factor:.2f}
+  
+【當前狀態】
+  交易狀態: {trading_status}
+  連續獲利: {consecutive_wins} 次
+  連續虧損: {consecutive_losses} 次
+  部位乘數: {position_size_multiplier:.2f}
+
+{separator}
+生成時間: {generated_at}
+{separator}
+"""
+
 
 class TradingStatus(Enum):
     """交易狀態"""
@@ -24,6 +66,100 @@ class TradingStatus(Enum):
     RECOVERY = "recovery"          # 恢復階段（謹慎交易）
 
 
+# 編譯核心內以整數代表交易狀態，索引即為代碼
+_STATUS_BY_CODE = (
+    TradingStatus.ACTIVE,
+    TradingStatus.REDUCED,
+    TradingStatus.SUSPENDED,
+    TradingStatus.RECOVERY,
+)
+_STATUS_CODES = {status: code for code, status in enumerate(_STATUS_BY_CODE)}
+_ACTIVE, _REDUCED, _SUSPENDED, _RECOVERY = 0, 1, 2, 3
+
+
+@njit(cache=True)
+def _equity_kernel(
+    pnls,
+    capital,
+    peak,
+    daily_pnl,
+    max_drawdown_reached,
+    wins,
+    losses,
+    status,
+    initial_capital,
+    max_daily_loss_pct,
+    max_drawdown_pct,
+    consecutive_loss_limit,
+    auto_suspend,
+    suspension_elapsed,
+    new_suspension_elapsed
+):
+    """
+    逐筆套用損益的狀態機核心（可由 numba 編譯），規則與 update_equity 相同
+    
+    suspension_elapsed 為目前的暫停是否已滿恢復期；new_suspension_elapsed
+    為序列中新觸發的暫停是否立即滿期（恢復期 <= 0 天時）。
+    
+    Returns:
+        (各筆後資金, 各筆後回撤, 各筆後狀態代碼, 各筆觸發的暫停規則
+         （0=無, 1=單日虧損, 2=最大回撤）, 最終高峰資金, 最終單日損益,
+         最終最大回撤, 最終連續獲利, 最終連續虧損)
+    """
+    n = pnls.shape[0]
+    capitals = np.empty(n)
+    drawdowns = np.empty(n)
+    statuses = np.empty(n, dtype=np.int8)
+    suspend_rules = np.zeros(n, dtype=np.int8)
+    
+    for i in range(n):
+        pnl = pnls[i]
+        capital += pnl
+        daily_pnl += pnl
+        
+        if capital > peak:
+            peak = capital
+        drawdown = (peak - capital) / peak
+        if drawdown > max_drawdown_reached:
+            max_drawdown_reached = drawdown
+        
+        if pnl > 0:
+            wins += 1
+            losses = 0
+        elif pnl < 0:
+            losses += 1
+            wins = 0
+        
+        # 保護規則（對應 _check_protection_rules）
+        if daily_pnl < 0 and abs(daily_pnl / initial_capital) >= max_daily_loss_pct:
+            suspend_rules[i] = 1
+            if auto_suspend:
+                status = _SUSPENDED
+                suspension_elapsed = new_suspension_elapsed
+        if drawdown >= max_drawdown_pct:
+            suspend_rules[i] = 2
+            if auto_suspend:
+                status = _SUSPENDED
+                suspension_elapsed = new_suspension_elapsed
+        if losses >= consecutive_loss_limit and status == _ACTIVE:
+            status = _REDUCED
+        
+        # 恢復條件（對應 _check_recovery_conditions）
+        if status == _SUSPENDED:
+            if suspension_elapsed:
+                status = _RECOVERY
+        elif status == _REDUCED:
+            if wins >= 2:
+                status = _RECOVERY
+        
+        capitals[i] = capital
+        drawdowns[i] = drawdown
+        statuses[i] = status
+    
+    return (capitals, drawdowns, statuses, suspend_rules,
+            peak, daily_pnl, max_drawdown_reached, wins, losses)
+
+
 class EquityProtection:
     """
     資金曲線保護系統
@@ -40,6 +176,7 @@ class EquityProtection:
         recovery_period_days: int = 5,
         position_scaling: bool = True,
         auto_suspend: bool = True,
+        track_trade_history: bool = False,
         logger: Optional[logging.Logger] = None
     ):
         """
@@ -53,6 +190,7 @@ class EquityProtection:
             recovery_period_days: 恢復期天數
             position_scaling: 是否啟用動態部位調整
             auto_suspend: 是否自動暫停交易
+            track_trade_history: 是否保留逐筆交易明細（trade_history）
             logger: 日誌記錄器
         """
         self.initial_capital = initial_capital
@@ -65,6 +203,7 @@ class EquityProtection:
         self.recovery_period_days = recovery_period_days
         self.position_scaling = position_scaling
         self.auto_suspend = auto_suspend
+        self.track_trade_history = track_trade_history
         
         self.logger = logger or logging.getLogger(__name__)
         
@@ -79,6 +218,7 @@ class EquityProtection:
         # 歷史記錄
         self.equity_curve = [initial_capital]
         self.equity_dates = [datetime.now()]
+        self.pnl_history: List[float] = []
         self.trade_history = []
         
         # 暫停相關
@@ -135,14 +275,16 @@ class EquityProtection:
             self.consecutive_losses += 1
             self.consecutive_wins = 0
         
-        # 記錄交易
-        self.trade_history.append({
-            'timestamp': timestamp,
-            'pnl': pnl,
-            'equity': self.current_capital,
-            'drawdown': self.current_drawdown,
-            'status': self.trading_status.value
-        })
+        # 記錄交易（統計只需損益序列，明細僅在需要時保留）
+        self.pnl_history.append(pnl)
+        if self.track_trade_history:
+            self.trade_history.append({
+                'timestamp': timestamp,
+                'pnl': pnl,
+                'equity': self.current_capital,
+                'drawdown': self.current_drawdown,
+                'status': self.trading_status.value
+            })
         
         # 檢查保護條件
         protection_triggered = self._check_protection_rules()
@@ -158,6 +300,103 @@ class EquityProtection:
             'position_size_multiplier': self.get_position_size_multiplier()
         }
     
+    def update_equity_series(
+        self,
+        pnls: np.ndarray,
+        timestamp: Optional[datetime] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        依序套用多筆損益（批次版本），最終狀態與逐筆呼叫 update_equity 相同
+        
+        逐筆的狀態機由編譯核心處理，適合回測中大量損益序列；
+        暫停 / 減倉只在最後記錄一次日誌，而非每筆記錄。
+        
+        Args:
+            pnls: 損益陣列（依時間先後）
+            timestamp: 資金曲線使用的時間戳記（整批共用）
+        
+        Returns:
+            包含 equity、drawdown、daily_pnl、trading_status 陣列的字典（每筆之後的值）
+        """
+        pnls = np.ascontiguousarray(np.atleast_1d(np.asarray(pnls, dtype=np.float64)))
+        if timestamp is None:
+            timestamp = datetime.now()
+        
+        prev_status = _STATUS_CODES[self.trading_status]
+        start_daily_pnl = float(self.daily_pnl)
+        suspension_elapsed = bool(
+            self.suspension_start_date
+            and (datetime.now() - self.suspension_start_date).days >= self.recovery_period_days
+        )
+        
+        (capitals, drawdowns, statuses, suspend_rules,
+         self.peak_capital, self.daily_pnl, self.max_drawdown_reached,
+         self.consecutive_wins, self.consecutive_losses) = _equity_kernel(
+            pnls,
+            float(self.current_capital),
+            float(self.peak_capital),
+            start_daily_pnl,
+            float(self.max_drawdown_reached),
+            int(self.consecutive_wins),
+            int(self.consecutive_losses),
+            prev_status,
+            float(self.initial_capital),
+            float(self.max_daily_loss_pct),
+            float(self.max_drawdown_pct),
+            int(self.consecutive_loss_limit),
+            bool(self.auto_suspend),
+            suspension_elapsed,
+            self.recovery_period_days <= 0
+        )
+        
+        daily_pnls = start_daily_pnl + np.cumsum(pnls)
+        status_values = np.array([s.value for s in _STATUS_BY_CODE], dtype=object)[statuses]
+        before = np.concatenate(([prev_status], statuses[:-1])).astype(np.intp)
+        
+        if len(pnls):
+            self.current_capital = float(capitals[-1])
+            self.current_drawdown = float(drawdowns[-1])
+            self.trading_status = _STATUS_BY_CODE[statuses[-1]]
+        
+        self.equity_curve.extend(capitals.tolist())
+        self.equity_dates.extend([timestamp] * len(pnls))
+        self.pnl_history.extend(pnls.tolist())
+        if self.track_trade_history:
+            # 明細記錄的是套用保護規則前（即前一筆之後）的狀態
+            for k in range(len(pnls)):
+                self.trade_history.append({
+                    'timestamp': timestamp,
+                    'pnl': float(pnls[k]),
+                    'equity': float(capitals[k]),
+                    'drawdown': float(drawdowns[k]),
+                    'status': _STATUS_BY_CODE[before[k]].value
+                })
+        
+        # 日誌：只記錄序列中最後一次觸發的暫停規則與減倉
+        triggered = np.flatnonzero(suspend_rules)
+        if len(triggered):
+            k = triggered[-1]
+            if suspend_rules[k] == 2:
+                reason = f"回撤達 {drawdowns[k]:.2%}，超過上限 {self.max_drawdown_pct:.2%}"
+            else:
+                reason = (
+                    f"單日虧損達 {abs(daily_pnls[k] / self.initial_capital):.2%}，"
+                    f"超過上限 {self.max_daily_loss_pct:.2%}"
+                )
+            self._trigger_suspension(reason)
+            # _trigger_suspension 會直接設為暫停，改回核心算出的最終狀態（恢復期可能已滿）
+            if len(pnls):
+                self.trading_status = _STATUS_BY_CODE[statuses[-1]]
+        if np.any((statuses == _REDUCED) & (before != _REDUCED)):
+            self.logger.warning(f"⚠️ 進入減倉模式: 連續虧損達 {self.consecutive_loss_limit} 次")
+        
+        return {
+            'equity': capitals,
+            'drawdown': drawdowns,
+            'daily_pnl': daily_pnls,
+            'trading_status': status_values
+        }
+    
     def _check_protection_rules(self) -> bool:
         """
         檢查是否觸發保護機制
@@ -318,18 +557,20 @@ class EquityProtection:
         total_pnl = self.current_capital - self.initial_capital
         total_return = (total_pnl / self.initial_capital) * 100
         
+        pnls = np.asarray(self.pnl_history, dtype=float)
+        profits = pnls[pnls > 0]
+        losses = pnls[pnls < 0]
+        
         # 計算勝率
-        winning_trades = sum(1 for t in self.trade_history if t['pnl'] > 0)
-        total_trades = len(self.trade_history)
+        winning_trades = int(profits.size)
+        total_trades = int(pnls.size)
         win_rate = (winning_trades / total_trades * 100) if total_trades > 0 else 0
         
         # 計算平均獲利/虧損
-        profits = [t['pnl'] for t in self.trade_history if t['pnl'] > 0]
-        losses = [t['pnl'] for t in self.trade_history if t['pnl'] < 0]
-        
-        avg_profit = np.mean(profits) if profits else 0
-        avg_loss = np.mean(losses) if losses else 0
-        profit_factor = abs(sum(profits) / sum(losses)) if losses and sum(losses) != 0 else 0
+        avg_profit = profits.mean() if profits.size else 0
+        avg_loss = losses.mean() if losses.size else 0
+        total_loss = losses.sum()
+        profit_factor = abs(profits.sum() / total_loss) if total_loss != 0 else 0
         
         return {
             'current_capital': self.current_capital,
@@ -424,43 +665,10 @@ class EquityProtection:
         """
         stats = self.get_statistics()
         
-        report = f"""
-{'='*80}
-資金保護系統報告
-{'='*80}
-
-【資金狀況】
-  初始資金: {stats['initial_capital']:,.0f} 元
-  當前資金: {stats['current_capital']:,.0f} 元
-  總損益: {stats['total_pnl']:,.0f} 元 ({stats['total_return_pct']:+.2f}%)
-  高峰資金: {stats['peak_capital']:,.0f} 元
-
-【風險指標】
-  當前回撤: {stats['current_drawdown_pct']:.2f}%
-  最大回撤: {stats['max_drawdown_pct']:.2f}%
-  回撤上限: {self.max_drawdown_pct*100:.0f}%
-
-【交易統計】
-  總交易次數: {stats['total_trades']}
-  獲利次數: {stats['winning_trades']}
-  虧損次數: {stats['losing_trades']}
-  勝率: {stats['win_rate_pct']:.1f}%
-  
-【績效指標】
-  平均獲利: {stats['avg_profit']:,.0f} 元
-  平均虧損: {stats['avg_loss']:,.0f} 元
-  獲利因子: {stats['profit_factor']:.2f}
-  
-【當前狀態】
-  交易狀態: {stats['trading_status']}
-  連續獲利: {stats['consecutive_wins']} 次
-  連續虧損: {stats['consecutive_losses']} 次
-  部位乘數: {stats['position_size_multiplier']:.2f}
-
-{'='*80}
-生成時間: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-{'='*80}
-"""
+        stats['separator'] = '=' * 80
+        stats['max_dd_limit_pct'] = self.max_drawdown_pct * 100
+        stats['generated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        report = _REPORT_TEMPLATE.format_map(stats)
         
         with open(filepath, 'w', encoding='utf-8') as f:
             f.write(report)
@@ -10,12 +10,40 @@ Version: 2.0
 
 import logging
 import functools
+import math
+import threading
 import traceback
+from collections import deque
 from typing import Callable, Any, Optional
 from datetime import datetime
 import pandas as pd
 import numpy as np
 
+from .._jit import njit
+
+
+# 視為有效數值的型別（含 numpy 純量）
+_NUMERIC_TYPES = (int, float, np.integer, np.floating)
+
+
+@njit(cache=True)
+def _validate_price_code(price, min_price):
+    """
+    價格檢查核心（可由 numba 編譯），回傳錯誤代碼而不拋出例外
+    
+    Returns:
+        0=有效, 1=NaN, 2=無限值, 3=非正數, 4=低於最小價格
+    """
+    if price != price:
+        return 1
+    if not math.isfinite(price):
+        return 2
+    if price <= 0.0:
+        return 3
+    if price < min_price:
+        return 4
+    return 0
+
 
 class TradingError(Exception):
     """交易系統基礎錯誤類別"""
@@ -57,8 +85,11 @@ class ErrorHandler:
             logger: 日誌記錄器，如果為 None 則創建默認記錄器
         """
         self.logger = logger or self._create_default_logger()
+        # 錯誤次數與錯誤日誌由同一把鎖保護（多執行緒呼叫 safe_execute 時），
+        # 讀取時在鎖內取快照，避免迭代中被其他執行緒修改
+        self._lock = threading.Lock()
         self.error_count = 0
-        self.error_log = []
+        self.error_log = deque()
     
     @staticmethod
     def _create_default_logger() -> logging.Logger:
@@ -105,7 +136,6 @@ class ErrorHandler:
                 try:
                     return func(*args, **kwargs)
                 except Exception as e:
-                    self.error_count += 1
                     error_info = {
                         'timestamp': datetime.now(),
                         'function': func.__name__,
@@ -114,7 +144,9 @@ class ErrorHandler:
                         'args': str(args)[:100],  # 限制長度
                         'kwargs': str(kwargs)[:100]
                     }
-                    self.error_log.append(error_info)
+                    with self._lock:
+                        self.error_count += 1
+                        self.error_log.append(error_info)
                     
                     # 記錄錯誤
                     if log_traceback:
@@ -180,13 +212,15 @@ class ErrorHandler:
             )
         
         # 檢查 NaN 值
-        if check_nan:
-            for col in required_columns:
-                if df[col].isna().any():
-                    nan_count = df[col].isna().sum()
-                    raise DataValidationError(
-                        f"Column '{col}' contains {nan_count} NaN values"
-                    )
+        if check_nan and required_columns:
+            # 一次向量化掃描所有必要欄位
+            nan_counts = df[required_columns].isna().sum(axis=0)
+            bad = nan_counts[nan_counts > 0]
+            if len(bad) > 0:
+                raise DataValidationError(
+                    f"Columns {bad.index.tolist()} contain NaN values: "
+                    f"{bad.to_dict()}"
+                )
         
         return True
     
@@ -208,13 +242,14 @@ class ErrorHandler:
             計算結果或默認值
         """
         try:
-            if denominator == 0 or np.isnan(denominator) or np.isinf(denominator):
+            # 純量使用 math 模組檢查，避免 numpy ufunc 的呼叫開銷
+            if denominator == 0 or not math.isfinite(denominator):
                 return default
             
             result = numerator / denominator
             
             # 檢查結果是否有效
-            if np.isnan(result) or np.isinf(result):
+            if not math.isfinite(result):
                 return default
             
             return result
@@ -248,8 +283,10 @@ class ErrorHandler:
             else:
                 return value.fillna(default)
         else:
-            # 單一值處理
-            if pd.isna(value) or np.isnan(value) if isinstance(value, (int, float)) else False:
+            # 單一值處理：NaN 不等於自身，涵蓋 Python float 與各精度的 NumPy 浮點（float16/32/64）
+            if value is None or value is pd.NA or (
+                isinstance(value, (float, np.floating)) and value != value
+            ):
                 return default
             return value
     
@@ -268,21 +305,30 @@ class ErrorHandler:
         Raises:
             DataValidationError: 價格無效時
         """
-        if pd.isna(price) or np.isnan(price):
+        if price is None:
             raise DataValidationError(f"Price is NaN")
         
-        if np.isinf(price):
-            raise DataValidationError(f"Price is infinite")
-        
-        if price <= 0:
-            raise DataValidationError(f"Price must be positive, got {price}")
-        
-        if price < min_price:
+        if not isinstance(price, _NUMERIC_TYPES):
             raise DataValidationError(
-                f"Price {price} below minimum {min_price}"
+                f"Price must be numeric, got {type(price).__name__}"
             )
         
-        return True
+        # 正常路徑只需一次核心呼叫，僅在失敗時才建立例外
+        code = _validate_price_code(float(price), float(min_price))
+        if code == 0:
+            return True
+        
+        match code:
+            case 1:
+                raise DataValidationError(f"Price is NaN")
+            case 2:
+                raise DataValidationError(f"Price is infinite")
+            case 3:
+                raise DataValidationError(f"Price must be positive, got {price}")
+            case _:
+                raise DataValidationError(
+                    f"Price {price} below minimum {min_price}"
+                )
     
     @staticmethod
     def validate_quantity(quantity: int, max_quantity: int = 1000) -> bool:
@@ -299,7 +345,16 @@ class ErrorHandler:
         Raises:
             DataValidationError: 數量無效時
         """
-        if pd.isna(quantity):
+        if quantity is None:
+            raise DataValidationError("Quantity is NaN")
+        
+        if not isinstance(quantity, _NUMERIC_TYPES):
+            raise DataValidationError(
+                f"Quantity must be numeric, got {type(quantity).__name__}"
+            )
+        
+        # NaN 僅可能出現在浮點數，且 NaN != NaN
+        if quantity != quantity:
             raise DataValidationError("Quantity is NaN")
         
         if quantity < 0:
@@ -319,24 +374,31 @@ class ErrorHandler:
         Returns:
             包含錯誤統計的字典
         """
+        with self._lock:
+            total_errors = self.error_count
+            errors = tuple(self.error_log)
         return {
-            'total_errors': self.error_count,
-            'recent_errors': self.error_log[-10:] if self.error_log else [],
-            'error_types': self._count_error_types()
+            'total_errors': total_errors,
+            'recent_errors': list(errors[-10:]),
+            'error_types': self._count_error_types(errors)
         }
     
-    def _count_error_types(self) -> dict:
+    def _count_error_types(self, errors: Optional[tuple] = None) -> dict:
         """統計各類型錯誤的數量"""
+        if errors is None:
+            with self._lock:
+                errors = tuple(self.error_log)
         error_types = {}
-        for error in self.error_log:
+        for error in errors:
             error_type = error['error_type']
             error_types[error_type] = error_types.get(error_type, 0) + 1
         return error_types
     
     def reset_error_log(self):
         """重置錯誤日誌"""
-        self.error_count = 0
-        self.error_log = []
+        with self._lock:
+            self.error_count = 0
+            self.error_log.clear()
         self.logger.info("Error log has been reset")
 
 
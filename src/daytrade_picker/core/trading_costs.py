@@ -13,11 +13,126 @@ Author: TW DayTrade Picker
 Version: 2.0
 """
 
-import pandas as pd
+import functools
 import numpy as np
-from typing import Optional, Dict, Tuple
-from datetime import datetime
+from typing import Optional, Dict, Mapping, Tuple
 import logging
+from types import MappingProxyType
+
+from .._jit import HAS_NUMBA, njit, prange
+
+
+# 常見券商費率預設（內外層皆唯讀，模組載入時建立一次）
+_BROKER_PRESETS = MappingProxyType({
+    'standard': MappingProxyType({
+        'commission_rate': 0.1425,
+        'commission_discount': 1.0,
+        'description': '標準費率（無折扣）'
+    }),
+    'discount_6': MappingProxyType({
+        'commission_rate': 0.1425,
+        'commission_discount': 0.6,
+        'description': '6 折手續費（常見）'
+    }),
+    'discount_5': MappingProxyType({
+        'commission_rate': 0.1425,
+        'commission_discount': 0.5,
+        'description': '5 折手續費（優惠）'
+    }),
+    'discount_28': MappingProxyType({
+        'commission_rate': 0.1425,
+        'commission_discount': 0.28,
+        'description': '28 折手續費（電子下單優惠）'
+    }),
+    'ultra_low': MappingProxyType({
+        'commission_rate': 0.1425,
+        'commission_discount': 0.2,
+        'description': '2 折手續費（大戶或特殊優惠）'
+    })
+})
+
+
+@njit(cache=True)
+def _breakeven_kernel(
+    entry_price,
+    quantity,
+    commission_rate,
+    commission_discount,
+    tax_rate,
+    min_commission,
+    slippage_bps
+):
+    """
+    損益兩平價迭代核心（可由 numba 編譯）
+    
+    將往返成本的計算內嵌於迴圈中，費率皆為小數，
+    tax_rate 為已依交易型態選定的稅率，未啟用滑價時 slippage_bps 傳 0。
+    
+    Returns:
+        (損益兩平價格, 總成本)
+    """
+    shares = quantity * 1000.0
+    rate = commission_rate * commission_discount
+    
+    # 買入成本與賣出價格無關，只需計算一次
+    buy_value = entry_price * shares
+    buy_cost = max(buy_value * rate, min_commission) + buy_value * slippage_bps
+    
+    breakeven_price = entry_price
+    total_cost = 0.0
+    for _ in range(10):
+        prev_breakeven = breakeven_price
+        sell_value = breakeven_price * shares
+        total_cost = (
+            buy_cost
+            + max(sell_value * rate, min_commission)
+            + sell_value * tax_rate
+            + sell_value * slippage_bps
+        )
+        breakeven_price = entry_price + total_cost / shares
+        
+        # 檢查收斂（與上一輪的估計值比較）
+        if abs(breakeven_price - prev_breakeven) < 1e-4:
+            break
+    
+    return breakeven_price, total_cost
+
+
+@njit(parallel=True, cache=True)
+def _round_trip_cost_array(
+    entry_prices,
+    exit_prices,
+    quantities,
+    tax_rates,
+    commission_rate,
+    min_commission,
+    slippage_bps
+):
+    """
+    逐筆計算往返交易成本的平行核心（需 numba 才有平行效果）
+    
+    commission_rate 為已乘上折扣的手續費率，tax_rates 為每筆交易適用的稅率。
+    
+    Returns:
+        (買進手續費, 賣出手續費, 證交稅, 買進滑價, 賣出滑價) 五個陣列
+    """
+    n = entry_prices.shape[0]
+    buy_commission = np.empty(n)
+    sell_commission = np.empty(n)
+    tax = np.empty(n)
+    buy_slippage = np.empty(n)
+    sell_slippage = np.empty(n)
+    
+    for i in prange(n):
+        buy_value = entry_prices[i] * quantities[i] * 1000.0
+        sell_value = exit_prices[i] * quantities[i] * 1000.0
+        buy_commission[i] = max(buy_value * commission_rate, min_commission)
+        sell_commission[i] = max(sell_value * commission_rate, min_commission)
+        tax[i] = sell_value * tax_rates[i]
+        buy_slippage[i] = buy_value * slippage_bps
+        sell_slippage[i] = sell_value * slippage_bps
+    
+    return buy_commission, sell_commission, tax, buy_slippage, sell_slippage
 
 
 class TradingCostCalculator:
@@ -73,13 +188,44 @@ class TradingCostCalculator:
         self.total_slippage = 0.0
         self.trade_count = 0
         
-        self.logger.info(
-            f"交易成本計算器已初始化: "
-            f"手續費={commission_rate}%×{commission_discount}, "
-            f"稅率={tax_rate}%, "
-            f"當沖稅率={daytrade_tax_rate}%, "
-            f"滑價={slippage_bps} bps"
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info(
+                f"交易成本計算器已初始化: "
+                f"手續費={commission_rate}%×{commission_discount}, "
+                f"稅率={tax_rate}%, "
+                f"當沖稅率={daytrade_tax_rate}%, "
+                f"滑價={slippage_bps} bps"
+            )
+    
+    def _costs_one_side(
+        self,
+        trade_value: float,
+        is_sell: bool = False,
+        is_daytrade: bool = False
+    ) -> Tuple[float, float, float]:
+        """
+        計算單邊交易的各項成本（未四捨五入）
+        
+        Args:
+            trade_value: 交易金額（元）
+            is_sell: 是否為賣出（僅賣出收取證交稅）
+            is_daytrade: 是否為當沖交易
+        
+        Returns:
+            (手續費, 證交稅, 滑價)
+        """
+        commission = max(
+            trade_value * self.commission_rate * self.commission_discount,
+            self.min_commission
         )
+        
+        tax = 0.0
+        if is_sell:
+            tax = trade_value * (self.daytrade_tax_rate if is_daytrade else self.tax_rate)
+        
+        slippage = trade_value * self.slippage_bps if self.enable_slippage else 0.0
+        
+        return commission, tax, slippage
     
     def calculate_commission(
         self,
@@ -99,15 +245,9 @@ class TradingCostCalculator:
             手續費金額（元）
         """
         # 計算交易金額（1 張 = 1000 股）
-        trade_value = price * quantity * 1000
+        commission, _, _ = self._costs_one_side(price * quantity * 1000)
         
-        # 計算手續費
-        commission = trade_value * self.commission_rate * self.commission_discount
-        
-        # 確保不低於最低手續費
-        commission = max(commission, self.min_commission)
-        
-        return round(commission, 0)  # 四捨五入到整數
+        return commission
     
     def calculate_tax(
         self,
@@ -127,15 +267,11 @@ class TradingCostCalculator:
             證交稅金額（元）
         """
         # 計算交易金額
-        trade_value = price * quantity * 1000
-        
-        # 選擇稅率
-        tax_rate = self.daytrade_tax_rate if is_daytrade else self.tax_rate
-        
-        # 計算證交稅
-        tax = trade_value * tax_rate
+        _, tax, _ = self._costs_one_side(
+            price * quantity * 1000, is_sell=True, is_daytrade=is_daytrade
+        )
         
-        return round(tax, 0)  # 四捨五入到整數
+        return tax
     
     def calculate_slippage(
         self,
@@ -159,16 +295,11 @@ class TradingCostCalculator:
         if not self.enable_slippage:
             return 0.0
         
-        # 計算交易金額
-        trade_value = price * quantity * 1000
-        
         # 基礎滑價
-        base_slippage = trade_value * self.slippage_bps
+        _, _, base_slippage = self._costs_one_side(price * quantity * 1000)
         
         # 考慮市場衝擊（大量交易會有更多滑價）
-        slippage = base_slippage * market_impact_factor
-        
-        return round(slippage, 0)
+        return base_slippage * market_impact_factor
     
     def calculate_round_trip_cost(
         self,
@@ -189,14 +320,17 @@ class TradingCostCalculator:
         Returns:
             包含各項成本的字典
         """
+        # 每一邊的交易金額只計算一次
+        buy_value = entry_price * quantity * 1000
+        sell_value = exit_price * quantity * 1000
+        
         # 買入成本
-        buy_commission = self.calculate_commission(entry_price, quantity, is_buy=True)
-        buy_slippage = self.calculate_slippage(entry_price, quantity, is_buy=True)
+        buy_commission, _, buy_slippage = self._costs_one_side(buy_value)
         
         # 賣出成本
-        sell_commission = self.calculate_commission(exit_price, quantity, is_buy=False)
-        sell_tax = self.calculate_tax(exit_price, quantity, is_daytrade=is_daytrade)
-        sell_slippage = self.calculate_slippage(exit_price, quantity, is_buy=False)
+        sell_commission, sell_tax, sell_slippage = self._costs_one_side(
+            sell_value, is_sell=True, is_daytrade=is_daytrade
+        )
         
         # 總成本
         total_commission = buy_commission + sell_commission
@@ -222,6 +356,88 @@ class TradingCostCalculator:
             'cost_rate': self._calculate_cost_rate(entry_price, quantity, total_cost)
         }
     
+    def calculate_round_trip_cost_batch(
+        self,
+        entry_prices: np.ndarray,
+        exit_prices: np.ndarray,
+        quantities: np.ndarray,
+        is_daytrade=True
+    ) -> Dict[str, np.ndarray]:
+        """
+        批次計算多筆往返交易成本（向量化版本）
+        
+        Args:
+            entry_prices: 買入價格陣列
+            exit_prices: 賣出價格陣列
+            quantities: 數量陣列（張）
+            is_daytrade: 是否為當沖（布林值或布林陣列）
+        
+        Returns:
+            與 calculate_round_trip_cost 相同鍵值的字典，每個值為陣列
+        """
+        entry_prices, exit_prices, quantities = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(entry_prices, dtype=float)),
+            np.atleast_1d(np.asarray(exit_prices, dtype=float)),
+            np.atleast_1d(np.asarray(quantities, dtype=float))
+        )
+        
+        # 計算交易金額（1 張 = 1000 股）
+        buy_value = entry_prices * quantities * 1000
+        sell_value = exit_prices * quantities * 1000
+        
+        commission_rate = self.commission_rate * self.commission_discount
+        tax_rate = np.where(is_daytrade, self.daytrade_tax_rate, self.tax_rate)
+        slippage_bps = self.slippage_bps if self.enable_slippage else 0.0
+        
+        if HAS_NUMBA:
+            # 大量交易時改用平行化的逐筆核心
+            (buy_commission, sell_commission, tax,
+             buy_slippage, sell_slippage) = _round_trip_cost_array(
+                np.ascontiguousarray(entry_prices),
+                np.ascontiguousarray(exit_prices),
+                np.ascontiguousarray(quantities),
+                np.ascontiguousarray(np.broadcast_to(tax_rate, buy_value.shape)),
+                commission_rate,
+                float(self.min_commission),
+                slippage_bps
+            )
+        else:
+            # 手續費（不低於最低手續費）
+            buy_commission = np.maximum(buy_value * commission_rate, self.min_commission)
+            sell_commission = np.maximum(sell_value * commission_rate, self.min_commission)
+            
+            # 證交稅（僅賣出時收取）
+            tax = sell_value * tax_rate
+            
+            # 滑價
+            buy_slippage = buy_value * slippage_bps
+            sell_slippage = sell_value * slippage_bps
+        
+        total_commission = buy_commission + sell_commission
+        total_slippage = buy_slippage + sell_slippage
+        total_cost = total_commission + tax + total_slippage
+        
+        # 更新追蹤
+        self.total_commission += float(total_commission.sum())
+        self.total_tax += float(tax.sum())
+        self.total_slippage += float(total_slippage.sum())
+        self.trade_count += int(total_cost.size)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cost_rate = np.where(buy_value > 0, total_cost / buy_value * 100, 0.0)
+        
+        return {
+            'buy_commission': buy_commission,
+            'sell_commission': sell_commission,
+            'total_commission': total_commission,
+            'tax': tax,
+            'buy_slippage': buy_slippage,
+            'sell_slippage': sell_slippage,
+            'total_slippage': total_slippage,
+            'total_cost': total_cost,
+            'cost_rate': cost_rate
+        }
+    
     def calculate_net_pnl(
         self,
         entry_price: float,
@@ -268,7 +484,55 @@ class TradingCostCalculator:
             'net_return_pct': net_return,
             'cost_rate_pct': costs['cost_rate']
         }
-    
+
+    def calculate_net_pnl_batch(
+        self,
+        entry_prices: np.ndarray,
+        exit_prices: np.ndarray,
+        quantities: np.ndarray,
+        is_daytrade=True
+    ) -> Dict[str, np.ndarray]:
+        """
+        批次計算多筆交易扣除成本後的淨損益（向量化版本）
+
+        Args:
+            entry_prices: 買入價格陣列
+            exit_prices: 賣出價格陣列
+            quantities: 數量陣列（張）
+            is_daytrade: 是否為當沖（布林值或布林陣列）
+
+        Returns:
+            與 calculate_net_pnl 相同鍵值的字典，每個值為陣列
+        """
+        costs = self.calculate_round_trip_cost_batch(
+            entry_prices, exit_prices, quantities, is_daytrade
+        )
+        entry_prices, exit_prices, quantities = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(entry_prices, dtype=float)),
+            np.atleast_1d(np.asarray(exit_prices, dtype=float)),
+            np.atleast_1d(np.asarray(quantities, dtype=float))
+        )
+
+        gross_pnl = (exit_prices - entry_prices) * quantities * 1000
+        net_pnl = gross_pnl - costs['total_cost']
+
+        investment = entry_prices * quantities * 1000
+        with np.errstate(divide='ignore', invalid='ignore'):
+            gross_return = np.where(investment > 0, gross_pnl / investment * 100, 0.0)
+            net_return = np.where(investment > 0, net_pnl / investment * 100, 0.0)
+
+        return {
+            'gross_pnl': gross_pnl,
+            'net_pnl': net_pnl,
+            'total_cost': costs['total_cost'],
+            'commission': costs['total_commission'],
+            'tax': costs['tax'],
+            'slippage': costs['total_slippage'],
+            'gross_return_pct': gross_return,
+            'net_return_pct': net_return,
+            'cost_rate_pct': costs['cost_rate']
+        }
+
     def _calculate_cost_rate(
         self,
         price: float,
@@ -309,34 +573,16 @@ class TradingCostCalculator:
         Returns:
             包含損益兩平資訊的字典
         """
-        # 初始估算（假設賣出價 = 買入價）
-        costs = self.calculate_round_trip_cost(
-            entry_price, entry_price, quantity, is_daytrade
+        breakeven_price, total_cost = _breakeven_kernel(
+            float(entry_price),
+            float(quantity),
+            self.commission_rate,
+            self.commission_discount,
+            self.daytrade_tax_rate if is_daytrade else self.tax_rate,
+            float(self.min_commission),
+            self.slippage_bps if self.enable_slippage else 0.0
         )
         
-        # 需要彌補的成本
-        total_cost = costs['total_cost']
-        
-        # 計算損益兩平價格（考慮賣出時也需要手續費和稅）
-        # 設 x 為損益兩平價格
-        # (x - entry_price) * qty * 1000 = buy_comm + sell_comm(x) + tax(x) + slippage
-        
-        # 簡化計算：使用迭代法
-        breakeven_price = entry_price
-        max_iterations = 10
-        
-        for i in range(max_iterations):
-            costs = self.calculate_round_trip_cost(
-                entry_price, breakeven_price, quantity, is_daytrade
-            )
-            
-            gross_pnl_needed = costs['total_cost']
-            breakeven_price = entry_price + (gross_pnl_needed / (quantity * 1000))
-            
-            # 檢查收斂
-            if i > 0 and abs(breakeven_price - entry_price) < 0.01:
-                break
-        
         # 計算需要的漲幅
         price_increase = breakeven_price - entry_price
         price_increase_pct = (price_increase / entry_price) * 100
@@ -346,9 +592,48 @@ class TradingCostCalculator:
             'breakeven_price': round(breakeven_price, 2),
             'price_increase': round(price_increase, 2),
             'price_increase_pct': round(price_increase_pct, 3),
-            'total_cost': round(costs['total_cost'], 0)
+            'total_cost': round(total_cost, 0)
         }
     
+    def estimate_breakeven_price_batch(
+        self,
+        entry_prices: np.ndarray,
+        quantities=1,
+        is_daytrade=True
+    ) -> np.ndarray:
+        """
+        批次估算損益兩平價格（封閉解，無需迭代）
+        
+        成本對賣出價為線性（僅最低手續費形成轉折），因此可直接解出：
+        賣出手續費高於最低手續費時 x = (entry + buy_cost/股數) / (1 - 賣出費率)，
+        否則以最低手續費代入 x = (entry + (buy_cost + 最低手續費)/股數) / (1 - 稅率 - 滑價)。
+        
+        Args:
+            entry_prices: 買入價格陣列
+            quantities: 數量（張，純量或陣列）
+            is_daytrade: 是否為當沖（布林值或布林陣列）
+        
+        Returns:
+            損益兩平價格陣列（未四捨五入）
+        """
+        entry_prices = np.asarray(entry_prices, dtype=float)
+        shares = np.asarray(quantities, dtype=float) * 1000
+        
+        rate = self.commission_rate * self.commission_discount
+        tax_rate = np.where(is_daytrade, self.daytrade_tax_rate, self.tax_rate)
+        slippage_bps = self.slippage_bps if self.enable_slippage else 0.0
+        
+        buy_value = entry_prices * shares
+        buy_cost = np.maximum(buy_value * rate, self.min_commission) + buy_value * slippage_bps
+        base = entry_prices + buy_cost / shares
+        
+        # 賣出手續費按比例計算的解
+        proportional = base / (1 - rate - tax_rate - slippage_bps)
+        # 賣出手續費落在最低手續費的解
+        floored = (base + self.min_commission / shares) / (1 - tax_rate - slippage_bps)
+        
+        return np.where(proportional * shares * rate >= self.min_commission, proportional, floored)
+    
     def get_cost_summary(self) -> Dict[str, any]:
         """
         獲取成本統計摘要
@@ -389,40 +674,20 @@ class TradingCostCalculator:
         self.logger.info("成本追蹤已重置")
     
     @staticmethod
-    def get_broker_presets() -> Dict[str, Dict[str, float]]:
+    def get_broker_presets() -> Mapping[str, Mapping[str, float]]:
         """
         獲取常見券商費率預設
         
         Returns:
-            券商費率字典
+            券商費率字典（內外層皆為唯讀共用物件；需修改時請先以 dict(...) 複製）
         """
-        return {
-            'standard': {
-                'commission_rate': 0.1425,
-                'commission_discount': 1.0,
-                'description': '標準費率（無折扣）'
-            },
-            'discount_6': {
-                'commission_rate': 0.1425,
-                'commission_discount': 0.6,
-                'description': '6 折手續費（常見）'
-            },
-            'discount_5': {
-                'commission_rate': 0.1425,
-                'commission_discount': 0.5,
-                'description': '5 折手續費（優惠）'
-            },
-            'discount_28': {
-                'commission_rate': 0.1425,
-                'commission_discount': 0.28,
-                'description': '28 折手續費（電子下單優惠）'
-            },
-            'ultra_low': {
-                'commission_rate': 0.1425,
-                'commission_discount': 0.2,
-                'description': '2 折手續費（大戶或特殊優惠）'
-            }
-        }
+        return _BROKER_PRESETS
+
+
+@functools.lru_cache(maxsize=16)
+def _get_cached_calculator(commission_discount: float) -> TradingCostCalculator:
+    """依手續費折扣快取計算器，避免重複建立（估算損益兩平不會更動成本追蹤）"""
+    return TradingCostCalculator(commission_discount=commission_discount)
 
 
 def calculate_min_profit_target(
@@ -447,7 +712,7 @@ def calculate_min_profit_target(
         >>> result = calculate_min_profit_target(100, quantity=1)
         >>> print(f"損益兩平價: {result['breakeven_price']}")
     """
-    calculator = TradingCostCalculator(commission_discount=commission_discount)
+    calculator = _get_cached_calculator(commission_discount)
     return calculator.estimate_breakeven_price(entry_price, quantity, is_daytrade)
 
 
@@ -3,15 +3,58 @@
 判斷大盤趨勢、恐慌指標、產業輪動
 """
 from typing import Dict, Optional, List
-from dataclasses import dataclass
-from enum import Enum
+from dataclasses import dataclass, field
+from enum import Enum, IntFlag
 import pandas as pd
 import numpy as np
 import logging
 
+try:
+    from ._jit import HAS_NUMBA, njit
+except ImportError:  # 以頂層模組載入時（main_strategy.py）
+    from _jit import HAS_NUMBA, njit
+
 logger = logging.getLogger(__name__)
 
 
+@njit(cache=True)
+def _rolling_means(values, windows):
+    """
+    單次走訪計算多個視窗的移動平均（可由 numba 編譯）
+    
+    與 pandas rolling(w).mean() 相同：前 w-1 筆及視窗內含 NaN 時為 NaN。
+    
+    Returns:
+        shape 為 (len(windows), len(values)) 的陣列
+    """
+    n = values.shape[0]
+    k = windows.shape[0]
+    out = np.full((k, n), np.nan)
+    sums = np.zeros(k)
+    nan_counts = np.zeros(k, dtype=np.int64)
+    
+    for i in range(n):
+        value = values[i]
+        for j in range(k):
+            window = windows[j]
+            if value != value:
+                nan_counts[j] += 1
+            else:
+                sums[j] += value
+            
+            if i >= window:
+                old = values[i - window]
+                if old != old:
+                    nan_counts[j] -= 1
+                else:
+                    sums[j] -= old
+            
+            if i >= window - 1 and nan_counts[j] == 0:
+                out[j, i] = sums[j] / window
+    
+    return out
+
+
 class MarketTrend(Enum):
     """市場趨勢"""
     STRONG_BULL = "強勢多頭"
@@ -30,6 +73,47 @@ class MarketSentiment(Enum):
     EXTREME_FEAR = "極度恐慌"
 
 
+class MarketSignal(IntFlag):
+    """市場訊號（位元旗標，依顯示順序排列）"""
+    BULL_ABOVE_MA20 = 1
+    GOLDEN_CROSS = 2
+    FEAR_REBOUND = 4
+    BEAR_TREND = 8
+    DEATH_CROSS = 16
+    BELOW_MA60 = 32
+    EXTREME_GREED = 64
+    EXTREME_FEAR = 128
+    FOREIGN_BUY = 256
+    FOREIGN_SELL = 512
+    FOREIGN_SELL_PRESSURE = 1024
+    BEAR_HEAVY_VOLUME = 2048
+
+
+# 訊號對應的顯示文字（{foreign_bias} 於產生時代入）
+_SIGNAL_TEXT = {
+    MarketSignal.BULL_ABOVE_MA20: "✓ 大盤多頭，站穩月線",
+    MarketSignal.GOLDEN_CROSS: "✓ 黃金交叉出現",
+    MarketSignal.FEAR_REBOUND: "⚠ 恐慌情緒，可能短線超跌反彈",
+    MarketSignal.BEAR_TREND: "✗ 大盤空頭，避免做多",
+    MarketSignal.DEATH_CROSS: "✗ 死亡交叉出現",
+    MarketSignal.BELOW_MA60: "✗ 跌破季線",
+    MarketSignal.EXTREME_GREED: "⚠ 市場過度樂觀，注意風險",
+    MarketSignal.EXTREME_FEAR: "⚠ 市場極度恐慌，可能轉折點",
+    MarketSignal.FOREIGN_BUY: "✓ 外資{foreign_bias}",
+    MarketSignal.FOREIGN_SELL: "✗ 外資{foreign_bias}",
+    MarketSignal.FOREIGN_SELL_PRESSURE: "⚠ 外資賣壓，謹慎操作",
+    MarketSignal.BEAR_HEAVY_VOLUME: "⚠ 空頭爆量，可能恐慌殺盤",
+}
+
+# 外資動向標籤（依買賣超金額由小到大排列）
+_FOREIGN_LABELS = ("強力賣超", "賣超", "平衡", "買超", "強力買超")
+
+# 決策時常用的狀態集合（預先建立，避免每次判斷都重建 list）
+_BULL_TRENDS = frozenset({MarketTrend.STRONG_BULL, MarketTrend.BULL})
+_BEAR_TRENDS = frozenset({MarketTrend.BEAR, MarketTrend.STRONG_BEAR})
+_FEAR_SENTIMENTS = frozenset({MarketSentiment.FEAR, MarketSentiment.EXTREME_FEAR})
+
+
 @dataclass
 class MarketEnvironment:
     """市場環境狀態"""
@@ -40,7 +124,19 @@ class MarketEnvironment:
     foreign_bias: str  # 外資偏好
     can_long: bool  # 是否適合做多
     can_short: bool  # 是否適合做空
-    signals: List[str]  # 訊號列表
+    signal_flags: MarketSignal = MarketSignal(0)  # 訊號旗標
+    _signals: Optional[List[str]] = field(default=None, init=False, repr=False, compare=False)
+    
+    @property
+    def signals(self) -> List[str]:
+        """訊號文字列表（首次讀取時才由旗標產生，之後可直接 append 自訂訊號）"""
+        if self._signals is None:
+            self._signals = [
+                _SIGNAL_TEXT[flag].format(foreign_bias=self.foreign_bias)
+                for flag in MarketSignal
+                if self.signal_flags & flag
+            ]
+        return self._signals
 
 
 class MarketAnalyzer:
@@ -48,6 +144,29 @@ class MarketAnalyzer:
     
     def __init__(self):
         self.index_symbol = "^TWII"  # 加權指數
+    
+    @staticmethod
+    def _ensure_indicators(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        一次補齊分析所需的技術指標欄位（已存在的欄位不重算）
+        MA5/MA10/MA20/MA60
+        """
+        missing = {'MA5', 'MA10', 'MA20', 'MA60'} - set(df.columns)
+        if not missing:
+            return df
+        
+        windows = [w for w in (5, 10, 20, 60) if f'MA{w}' in missing]
+        if HAS_NUMBA:
+            # 一次走訪 Close 同時算出所有缺少的均線
+            mas = _rolling_means(df['Close'].to_numpy(dtype=float), np.array(windows))
+            for window, ma in zip(windows, mas):
+                df[f'MA{window}'] = ma
+        else:
+            close = df['Close']
+            for window in windows:
+                df[f'MA{window}'] = close.rolling(window=window).mean()
+        
+        return df
         
     def analyze_trend(self, df: pd.DataFrame) -> MarketTrend:
         """
@@ -58,21 +177,15 @@ class MarketAnalyzer:
             logger.warning("資料不足 60 天，無法完整分析趨勢")
             return MarketTrend.NEUTRAL
         
-        latest = df.iloc[-1]
-        close = latest['Close']
-        
         # 計算均線（如果不存在）
-        if 'MA5' not in df.columns:
-            df['MA5'] = df['Close'].rolling(window=5).mean()
-        if 'MA10' not in df.columns:
-            df['MA10'] = df['Close'].rolling(window=10).mean()
-        if 'MA20' not in df.columns:
-            df['MA20'] = df['Close'].rolling(window=20).mean()
-        if 'MA60' not in df.columns:
-            df['MA60'] = df['Close'].rolling(window=60).mean()
+        self._ensure_indicators(df)
         
-        latest = df.iloc[-1]
-        ma5, ma10, ma20, ma60 = latest['MA5'], latest['MA10'], latest['MA20'], latest['MA60']
+        # 直接以 iat 取純量，避免 iloc 建立整列 Series
+        close = df['Close'].iat[-1]
+        ma5 = df['MA5'].iat[-1]
+        ma10 = df['MA10'].iat[-1]
+        ma20 = df['MA20'].iat[-1]
+        ma60 = df['MA60'].iat[-1]
         
         # 多頭排列: 短均 > 長均
         bull_alignment = ma5 > ma10 > ma20 > ma60
@@ -83,11 +196,9 @@ class MarketAnalyzer:
         above_ma60 = close > ma60
         above_ma20 = close > ma20
         
-        # 計算 20 日漲跌幅
-        if len(df) >= 20:
-            price_change_20d = ((close - df.iloc[-20]['Close']) / df.iloc[-20]['Close']) * 100
-        else:
-            price_change_20d = 0
+        # 計算 20 日漲跌幅（前面已確保至少 60 筆資料）
+        close_20d_ago = df['Close'].iat[-20]
+        price_change_20d = (close - close_20d_ago) / close_20d_ago * 100
         
         # 判斷趨勢
         if bull_alignment and above_ma60 and price_change_20d > 5:
@@ -109,14 +220,15 @@ class MarketAnalyzer:
         if len(df) < 20:
             return MarketSentiment.NEUTRAL
         
-        # 計算波動率（20 日標準差）
-        returns = df['Close'].pct_change()
-        volatility = returns.rolling(window=20).std().iloc[-1] * 100
+        # 計算波動率（以最近 21 筆收盤算出 20 日報酬率的標準差，與 pandas rolling 相同使用 ddof=1；
+        # 僅 20 筆時首筆報酬為 NaN，結果同 rolling(20) 為 NaN）
+        returns = df['Close'].iloc[-21:].pct_change().to_numpy()[-20:]
+        volatility = np.std(returns, ddof=1) * 100
         
         # 成交量變化
         if 'Volume' in df.columns:
-            avg_volume_20 = df['Volume'].rolling(window=20).mean().iloc[-1]
-            current_volume = df['Volume'].iloc[-1]
+            avg_volume_20 = df['Volume'].to_numpy()[-20:].mean()
+            current_volume = df['Volume'].iat[-1]
             volume_ratio = current_volume / avg_volume_20 if avg_volume_20 > 0 else 1
         else:
             volume_ratio = 1
@@ -153,32 +265,31 @@ class MarketAnalyzer:
             'above_ma20': bool,
             'above_ma60': bool,
             'ma5_up': bool,  # MA5 向上
-            'ma20_up': bool
+            'ma20_up': bool,
+            'golden_cross': bool,  # 黃金交叉
+            'death_cross': bool  # 死亡交叉
         }
         """
         if len(df) < 60:
             return {}
         
         # 確保均線存在
-        if 'MA5' not in df.columns:
-            df['MA5'] = df['Close'].rolling(window=5).mean()
-        if 'MA20' not in df.columns:
-            df['MA20'] = df['Close'].rolling(window=20).mean()
-        if 'MA60' not in df.columns:
-            df['MA60'] = df['Close'].rolling(window=60).mean()
+        self._ensure_indicators(df)
         
-        latest = df.iloc[-1]
-        prev = df.iloc[-2]
-        close = latest['Close']
+        # 先轉為 Python float，之後的比較皆為純量運算並回傳原生 bool
+        close = float(df['Close'].iat[-1])
+        ma5_prev, ma5 = df['MA5'].to_numpy()[-2:].tolist()
+        ma20_prev, ma20 = df['MA20'].to_numpy()[-2:].tolist()
+        ma60 = float(df['MA60'].iat[-1])
         
         return {
-            'above_ma5': close > latest['MA5'],
-            'above_ma20': close > latest['MA20'],
-            'above_ma60': close > latest['MA60'],
-            'ma5_up': latest['MA5'] > prev['MA5'],
-            'ma20_up': latest['MA20'] > prev['MA20'],
-            'golden_cross': latest['MA5'] > latest['MA20'] and prev['MA5'] <= prev['MA20'],  # 黃金交叉
-            'death_cross': latest['MA5'] < latest['MA20'] and prev['MA5'] >= prev['MA20']   # 死亡交叉
+            'above_ma5': close > ma5,
+            'above_ma20': close > ma20,
+            'above_ma60': close > ma60,
+            'ma5_up': ma5 > ma5_prev,
+            'ma20_up': ma20 > ma20_prev,
+            'golden_cross': ma5 > ma20 and ma5_prev <= ma20_prev,  # 黃金交叉
+            'death_cross': ma5 < ma20 and ma5_prev >= ma20_prev   # 死亡交叉
         }
     
     def analyze_foreign_investment(self, net_buy_amount: float, threshold: float = 5_000_000_000) -> str:
@@ -187,16 +298,26 @@ class MarketAnalyzer:
         net_buy_amount: 外資買賣超金額（台幣）
         threshold: 判斷門檻（預設 50 億）
         """
-        if net_buy_amount > threshold:
-            return "強力買超"
-        elif net_buy_amount > 0:
-            return "買超"
-        elif net_buy_amount < -threshold:
-            return "強力賣超"
-        elif net_buy_amount < 0:
-            return "賣超"
-        else:
+        if net_buy_amount != net_buy_amount:  # NaN
             return "平衡"
+        # 以比較結果相加取得標籤索引，取代多層 if/elif
+        idx = (int(net_buy_amount >= -threshold) + int(net_buy_amount >= 0)
+               + int(net_buy_amount > 0) + int(net_buy_amount > threshold))
+        return _FOREIGN_LABELS[idx]
+    
+    def analyze_foreign_investment_batch(self, net_buy_amounts: np.ndarray,
+                                         threshold: float = 5_000_000_000) -> np.ndarray:
+        """
+        批次分析外資動向（向量化版本）
+        net_buy_amounts: 外資買賣超金額陣列（台幣）
+        threshold: 判斷門檻（預設 50 億）
+        """
+        amounts = np.asarray(net_buy_amounts, dtype=float)
+        # 左閉（>= -threshold, >= 0）與右開（> 0, > threshold）邊界分兩次搜尋
+        idx = (np.searchsorted([-threshold, 0.0], amounts, side='right')
+               + np.searchsorted([0.0, threshold], amounts, side='left'))
+        idx = np.where(np.isnan(amounts), 2, idx)  # NaN 視為平衡
+        return np.asarray(_FOREIGN_LABELS)[idx]
     
     def get_market_environment(self, index_df: pd.DataFrame, 
                                vix_value: Optional[float] = None,
@@ -212,6 +333,9 @@ class MarketAnalyzer:
         Returns:
             MarketEnvironment 物件
         """
+        # 一次補齊所有指標，後續各項分析直接讀取
+        self._ensure_indicators(index_df)
+        
         # 分析趨勢
         trend = self.analyze_trend(index_df)
         
@@ -229,8 +353,8 @@ class MarketAnalyzer:
         
         # 判斷成交量
         if 'Volume' in index_df.columns and len(index_df) >= 20:
-            avg_volume = index_df['Volume'].rolling(window=20).mean().iloc[-1]
-            current_volume = index_df['Volume'].iloc[-1]
+            avg_volume = index_df['Volume'].to_numpy()[-20:].mean()
+            current_volume = index_df['Volume'].iat[-1]
             if current_volume > avg_volume * 1.5:
                 volume_status = "爆量"
             elif current_volume > avg_volume * 1.2:
@@ -243,54 +367,54 @@ class MarketAnalyzer:
             volume_status = "未知"
         
         # 決策邏輯
-        signals = []
+        flags = MarketSignal(0)
         can_long = False
         can_short = False
         
         # 做多條件
-        if trend in [MarketTrend.STRONG_BULL, MarketTrend.BULL]:
+        if trend in _BULL_TRENDS:
             if ma_status.get('above_ma20', False):
                 can_long = True
-                signals.append("✓ 大盤多頭，站穩月線")
+                flags |= MarketSignal.BULL_ABOVE_MA20
             
             if ma_status.get('golden_cross', False):
-                signals.append("✓ 黃金交叉出現")
+                flags |= MarketSignal.GOLDEN_CROSS
                 can_long = True
             
-            if sentiment in [MarketSentiment.FEAR, MarketSentiment.EXTREME_FEAR]:
-                signals.append("⚠ 恐慌情緒，可能短線超跌反彈")
+            if sentiment in _FEAR_SENTIMENTS:
+                flags |= MarketSignal.FEAR_REBOUND
         
         # 做空/觀望條件
-        if trend in [MarketTrend.BEAR, MarketTrend.STRONG_BEAR]:
+        if trend in _BEAR_TRENDS:
             can_long = False
             can_short = True
-            signals.append("✗ 大盤空頭，避免做多")
+            flags |= MarketSignal.BEAR_TREND
             
             if ma_status.get('death_cross', False):
-                signals.append("✗ 死亡交叉出現")
+                flags |= MarketSignal.DEATH_CROSS
             
             if not ma_status.get('above_ma60', False):
-                signals.append("✗ 跌破季線")
+                flags |= MarketSignal.BELOW_MA60
         
         # 極端情緒警告
         if sentiment == MarketSentiment.EXTREME_GREED:
-            signals.append("⚠ 市場過度樂觀，注意風險")
+            flags |= MarketSignal.EXTREME_GREED
             can_long = False
         
         if sentiment == MarketSentiment.EXTREME_FEAR:
-            signals.append("⚠ 市場極度恐慌，可能轉折點")
+            flags |= MarketSignal.EXTREME_FEAR
         
         # 外資訊號
-        if foreign_bias in ["強力買超", "買超"]:
-            signals.append(f"✓ 外資{foreign_bias}")
-        elif foreign_bias in ["強力賣超", "賣超"]:
-            signals.append(f"✗ 外資{foreign_bias}")
+        if foreign_bias in ("強力買超", "買超"):
+            flags |= MarketSignal.FOREIGN_BUY
+        elif foreign_bias in ("強力賣超", "賣超"):
+            flags |= MarketSignal.FOREIGN_SELL
             if can_long:
-                signals.append("⚠ 外資賣壓，謹慎操作")
+                flags |= MarketSignal.FOREIGN_SELL_PRESSURE
         
         # 成交量訊號
-        if volume_status == "爆量" and trend in [MarketTrend.BEAR, MarketTrend.STRONG_BEAR]:
-            signals.append("⚠ 空頭爆量，可能恐慌殺盤")
+        if volume_status == "爆量" and trend in _BEAR_TRENDS:
+            flags |= MarketSignal.BEAR_HEAVY_VOLUME
             can_long = False
         
         return MarketEnvironment(
@@ -301,7 +425,7 @@ class MarketAnalyzer:
             foreign_bias=foreign_bias,
             can_long=can_long,
             can_short=can_short,
-            signals=signals
+            signal_flags=flags
         )
     
     def print_environment(self, env: MarketEnvironment):
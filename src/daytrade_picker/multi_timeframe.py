@@ -2,10 +2,18 @@
 多時間框架確認機制 - Multi-Timeframe Analysis
 避免只看單一時間週期造成的誤判
 """
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple, Union
+from dataclasses import dataclass
 from enum import Enum
 import pandas as pd
+import numpy as np
 import logging
+import weakref
+
+try:
+    from ._jit import HAS_NUMBA, njit
+except ImportError:  # 以頂層模組載入時（main_strategy.py）
+    from _jit import HAS_NUMBA, njit
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +30,10 @@ class TimeFrame(Enum):
     MONTHLY = "月線"
 
 
+# 時間框架由短到長的排序
+_TIMEFRAME_ORDER = {tf: i for i, tf in enumerate(TimeFrame)}
+
+
 class TrendDirection(Enum):
     """趨勢方向"""
     STRONG_UP = "強勢上漲"
@@ -31,50 +43,269 @@ class TrendDirection(Enum):
     STRONG_DOWN = "強勢下跌"
 
 
+@dataclass
+class OHLCV:
+    """以欄為單位的 K 線陣列（SoA），避免重複透過 pandas 取欄"""
+    open_: Optional[np.ndarray]
+    high: Optional[np.ndarray]
+    low: Optional[np.ndarray]
+    close: np.ndarray
+    volume: Optional[np.ndarray]
+    
+    def __len__(self) -> int:
+        return self.close.shape[0]
+
+
+def _as_soa(df: Union[pd.DataFrame, OHLCV]) -> OHLCV:
+    """將 DataFrame 一次轉為 OHLCV 陣列（已是 OHLCV 則直接回傳；缺少的欄位為 None）"""
+    if isinstance(df, OHLCV):
+        return df
+    
+    def column(name: str) -> Optional[np.ndarray]:
+        return df[name].to_numpy(dtype=np.float64) if name in df.columns else None
+    
+    return OHLCV(
+        open_=column('Open'),
+        high=column('High'),
+        low=column('Low'),
+        close=df['Close'].to_numpy(dtype=np.float64),
+        volume=column('Volume'),
+    )
+
+
+_UP_SET = frozenset({TrendDirection.UP, TrendDirection.STRONG_UP})
+_DOWN_SET = frozenset({TrendDirection.DOWN, TrendDirection.STRONG_DOWN})
+
+
+@dataclass(frozen=True)
+class TrendConfig:
+    """趨勢分類門檻（均線 4 根 K 棒斜率，單位 %）"""
+    strong_up_ma5: float = 2.0
+    strong_up_ma20: float = 1.0
+    strong_down_ma5: float = -2.0
+    strong_down_ma20: float = -1.0
+
+
+# 趨勢分類代碼對應的趨勢方向
+_TREND_TABLE = (
+    TrendDirection.SIDEWAYS,
+    TrendDirection.UP,
+    TrendDirection.STRONG_UP,
+    TrendDirection.DOWN,
+    TrendDirection.STRONG_DOWN,
+)
+
+
+@njit(cache=True)
+def _window_mean(c, start, end):
+    """c[start:end] 的平均（start/end 為非負索引）"""
+    total = 0.0
+    for i in range(start, end):
+        total += c[i]
+    return total / (end - start)
+
+
+@njit(cache=True)
+def _trend_inputs(c):
+    """
+    由收盤價序列（至少 20 筆）取出趨勢分類所需的收盤價與均線（可由 numba 編譯）
+    
+    Returns:
+        (close, ma5, ma20, ma5_prev, ma20_prev)
+    """
+    n = c.shape[0]
+    close = c[n - 1]
+    ma5 = _window_mean(c, n - 5, n)
+    ma20 = _window_mean(c, n - 20, n)
+    
+    # 與 4 根 K 棒前的均線比較；資料不足 24 筆時 MA20 斜率比照 rolling 視為 NaN
+    ma5_prev = _window_mean(c, n - 9, n - 4)
+    ma20_prev = _window_mean(c, n - 24, n - 4) if n >= 24 else np.nan
+    return close, ma5, ma20, ma5_prev, ma20_prev
+
+
+@njit(cache=True)
+def _classify_trend(close, ma5, ma20, ma5_prev, ma20_prev):
+    """
+    依收盤價與當前 / 4 根 K 棒前的均線判斷趨勢（預設門檻）
+    
+    Returns:
+        0=盤整, 1=上漲, 2=強勢上漲, 3=下跌, 4=強勢下跌
+    """
+    ma5_slope = (ma5 - ma5_prev) / ma5_prev * 100
+    ma20_slope = (ma20 - ma20_prev) / ma20_prev * 100
+    
+    if close > ma5 and ma5 > ma20 and ma5_slope > 2 and ma20_slope > 1:
+        return 2
+    elif close > ma20 and ma5_slope > 0:
+        return 1
+    elif close < ma5 and ma5 < ma20 and ma5_slope < -2 and ma20_slope < -1:
+        return 4
+    elif close < ma20 and ma5_slope < 0:
+        return 3
+    return 0
+
+
+def _make_classifier(config: TrendConfig):
+    """
+    依門檻設定產生趨勢分類函式
+    
+    預設門檻直接使用 _classify_trend；自訂門檻則把常數綁進預設參數，
+    呼叫時不必再查 config 屬性（有 numba 時一併編譯）。
+    """
+    if config == TrendConfig():
+        return _classify_trend
+    
+    def classify(close, ma5, ma20, ma5_prev, ma20_prev,
+                 up5=config.strong_up_ma5, up20=config.strong_up_ma20,
+                 down5=config.strong_down_ma5, down20=config.strong_down_ma20):
+        ma5_slope = (ma5 - ma5_prev) / ma5_prev * 100
+        ma20_slope = (ma20 - ma20_prev) / ma20_prev * 100
+        
+        if close > ma5 and ma5 > ma20 and ma5_slope > up5 and ma20_slope > up20:
+            return 2
+        elif close > ma20 and ma5_slope > 0:
+            return 1
+        elif close < ma5 and ma5 < ma20 and ma5_slope < down5 and ma20_slope < down20:
+            return 4
+        elif close < ma20 and ma5_slope < 0:
+            return 3
+        return 0
+    
+    return njit(classify)
+
+
+# 寬表 rolling 使用 numba 引擎時的參數
+_NUMBA_ENGINE_KWARGS = {'nopython': True, 'nogil': True, 'parallel': True}
+
+
+def precompute_mas(closes_wide: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    對全市場收盤價寬表一次計算 MA5 / MA20
+    
+    Args:
+        closes_wide: 列為時間、欄為股票代號的收盤價寬表（各股時間需對齊）
+    
+    Returns:
+        (ma5_wide, ma20_wide)，形狀與 closes_wide 相同
+    """
+    def rolling_mean(window: int) -> pd.DataFrame:
+        if HAS_NUMBA:
+            return closes_wide.rolling(window, method='table').mean(
+                engine='numba', engine_kwargs=_NUMBA_ENGINE_KWARGS
+            )
+        return closes_wide.rolling(window).mean()
+    
+    return rolling_mean(5), rolling_mean(20)
+
+
 class MultiTimeFrameAnalyzer:
     """多時間框架分析器"""
     
-    def __init__(self):
-        pass
+    # 快取筆數上限，超過時整批清空
+    CACHE_MAXSIZE = 4096
+    # 趨勢判斷所需的最少 K 棒數
+    MIN_BARS = 20
     
-    def analyze_trend(self, df: pd.DataFrame) -> TrendDirection:
-        """
-        分析趨勢方向
-        使用均線斜率和價格位置
+    def __init__(self, panel_cache: Optional[Dict[TimeFrame, Dict]] = None,
+                 trend_config: Optional[TrendConfig] = None):
+        # 以 (物件 id, 筆數, 最後一筆索引, 最後收盤價) 為鍵的分析結果快取；
+        # 值為 (資料的弱參照, 結果)，命中時確認仍是同一物件，避免 id 被回收重用後誤取他人結果
+        self.trend_cache: Dict[tuple, Tuple[weakref.ref, TrendDirection]] = {}
+        self.sr_cache: Dict[tuple, Tuple[weakref.ref, Dict]] = {}
+        # 全市場寬表預算結果：{TimeFrame: {'columns', 'close', 'ma5', 'ma20'}}
+        self.panel_cache: Dict[TimeFrame, Dict] = panel_cache if panel_cache is not None else {}
+        # 趨勢分類門檻在建構時即固定進分類函式
+        self.trend_config = trend_config or TrendConfig()
+        self._classify = _make_classifier(self.trend_config)
+    
+    def clear_cache(self):
+        """清除分析結果快取（新一輪掃描開始時呼叫）"""
+        self.trend_cache.clear()
+        self.sr_cache.clear()
+    
+    def load_panel(self, timeframe: TimeFrame, closes_wide: pd.DataFrame):
         """
-        if len(df) < 20:
-            return TrendDirection.SIDEWAYS
+        預先計算某時間框架全市場的均線，供 analyze_trend_panel 查表
         
-        # 計算均線
-        df['MA5'] = df['Close'].rolling(window=5).mean()
-        df['MA20'] = df['Close'].rolling(window=20).mean()
-        
-        latest = df.iloc[-1]
-        close = latest['Close']
-        ma5 = latest['MA5']
-        ma20 = latest['MA20']
+        Args:
+            timeframe: 時間框架
+            closes_wide: 列為時間、欄為股票代號的收盤價寬表
+        """
+        ma5, ma20 = precompute_mas(closes_wide)
+        self.panel_cache[timeframe] = {
+            'columns': {stock_id: j for j, stock_id in enumerate(closes_wide.columns)},
+            'close': closes_wide.to_numpy(dtype=np.float64),
+            'ma5': ma5.to_numpy(dtype=np.float64),
+            'ma20': ma20.to_numpy(dtype=np.float64),
+        }
+    
+    def analyze_trend_panel(self, stock_id: str, timeframe: TimeFrame) -> TrendDirection:
+        """
+        由 load_panel 預算的均線判斷單一股票趨勢（結果同 analyze_trend）
         
-        # 計算均線斜率（用最近 5 筆資料）
-        if len(df) >= 5:
-            ma5_slope = (df['MA5'].iloc[-1] - df['MA5'].iloc[-5]) / df['MA5'].iloc[-5] * 100
-            ma20_slope = (df['MA20'].iloc[-1] - df['MA20'].iloc[-5]) / df['MA20'].iloc[-5] * 100
-        else:
-            ma5_slope = 0
-            ma20_slope = 0
+        Raises:
+            KeyError: 該時間框架尚未載入，或寬表中沒有此股票
+        """
+        panel = self.panel_cache[timeframe]
+        j = panel['columns'][stock_id]
+        ma5 = panel['ma5']
+        if ma5.shape[0] < 5:
+            return TrendDirection.SIDEWAYS
         
-        # 判斷趨勢
-        if close > ma5 > ma20 and ma5_slope > 2 and ma20_slope > 1:
-            return TrendDirection.STRONG_UP
-        elif close > ma20 and ma5_slope > 0:
-            return TrendDirection.UP
-        elif close < ma5 < ma20 and ma5_slope < -2 and ma20_slope < -1:
-            return TrendDirection.STRONG_DOWN
-        elif close < ma20 and ma5_slope < 0:
-            return TrendDirection.DOWN
-        else:
+        ma20 = panel['ma20']
+        code = self._classify(panel['close'][-1, j], ma5[-1, j], ma20[-1, j],
+                              ma5[-5, j], ma20[-5, j])
+        return _TREND_TABLE[code]
+    
+    @classmethod
+    def _too_short(cls, df: Union[pd.DataFrame, OHLCV]) -> bool:
+        """K 棒數不足 MIN_BARS"""
+        rows = df.close.shape[0] if isinstance(df, OHLCV) else df.shape[0]
+        return rows < cls.MIN_BARS
+    
+    @staticmethod
+    def _cache_key(df: Union[pd.DataFrame, OHLCV]) -> tuple:
+        """產生快取鍵：同一份資料且最後一根 K 棒未變時鍵值相同"""
+        n = len(df)
+        if n == 0:
+            return (id(df), 0, None, None)
+        if isinstance(df, OHLCV):
+            return (id(df), n, None, float(df.close[-1]))
+        return (id(df), n, df.index[-1], float(df['Close'].iat[-1]))
+    
+    @staticmethod
+    def _cache_get(cache: Dict[tuple, tuple], key: tuple, df: Union[pd.DataFrame, OHLCV]):
+        """取出快取結果；物件已被回收（id 遭重用）時視為未命中"""
+        entry = cache.get(key)
+        if entry is None or entry[0]() is not df:
+            return None
+        return entry[1]
+    
+    def _cache_put(self, cache: Dict[tuple, tuple], key: tuple,
+                   df: Union[pd.DataFrame, OHLCV], value) -> None:
+        """寫入快取，超過 CACHE_MAXSIZE 時整批清空"""
+        if len(cache) >= self.CACHE_MAXSIZE:
+            cache.clear()
+        cache[key] = (weakref.ref(df), value)
+    
+    def analyze_trend(self, df: Union[pd.DataFrame, OHLCV]) -> TrendDirection:
+        """
+        分析趨勢方向
+        使用均線斜率和價格位置；均線只在區域陣列上計算，不會在傳入的 df 新增欄位
+        """
+        if self._too_short(df):
             return TrendDirection.SIDEWAYS
+        
+        key = self._cache_key(df)
+        trend = self._cache_get(self.trend_cache, key, df)
+        if trend is None:
+            # 只需最後幾筆均線值，交由核心直接對收盤價尾端計算
+            trend = _TREND_TABLE[self._classify(*_trend_inputs(_as_soa(df).close))]
+            self._cache_put(self.trend_cache, key, df, trend)
+        return trend
     
-    def analyze_support_resistance(self, df: pd.DataFrame, lookback: int = 20) -> Dict:
+    def analyze_support_resistance(self, df: Union[pd.DataFrame, OHLCV], lookback: int = 20) -> Dict:
         """
         分析支撐壓力
         
@@ -89,19 +320,24 @@ class MultiTimeFrameAnalyzer:
         if len(df) < lookback:
             lookback = len(df)
         
-        recent = df.tail(lookback)
+        key = (self._cache_key(df), lookback)
+        cached = self._cache_get(self.sr_cache, key, df)
+        if cached is not None:
+            return dict(cached)
         
-        # 簡單的支撐壓力：最近的最高/最低
-        support = recent['Low'].min()
-        resistance = recent['High'].max()
+        bars = _as_soa(df)
         
-        current_price = df['Close'].iloc[-1]
+        # 簡單的支撐壓力：最近的最高/最低（直接對 ndarray 尾端取值，略過 NaN 同 pandas）
+        support = np.nanmin(bars.low[-lookback:])
+        resistance = np.nanmax(bars.high[-lookback:])
+        
+        current_price = bars.close[-1]
         
         # 判斷是否接近支撐/壓力（±2%）
         support_distance = abs(current_price - support) / support
         resistance_distance = abs(current_price - resistance) / resistance
         
-        return {
+        result = {
             'support': support,
             'resistance': resistance,
             'near_support': support_distance < 0.02,
@@ -109,6 +345,9 @@ class MultiTimeFrameAnalyzer:
             'support_distance_pct': support_distance * 100,
             'resistance_distance_pct': resistance_distance * 100
         }
+        
+        self._cache_put(self.sr_cache, key, df, result)
+        return dict(result)
     
     def multi_timeframe_check(self, data_dict: Dict[TimeFrame, pd.DataFrame]) -> Dict:
         """
@@ -140,16 +379,31 @@ class MultiTimeFrameAnalyzer:
                 'analysis': ['無資料']
             }
         
-        # 分析各時間框架趨勢
+        # K 棒不足的時間框架不參與多空統計
+        skipped = [tf for tf, df in data_dict.items() if self._too_short(df)]
+        if skipped:
+            data_dict = {tf: df for tf, df in data_dict.items() if not self._too_short(df)}
+            if not data_dict:
+                return {
+                    'alignment': 'mixed',
+                    'trends': {},
+                    'entry_timeframe': None,
+                    'confidence': 0,
+                    'analysis': ['資料不足']
+                }
+        
+        # 分析各時間框架趨勢（快取未命中時才轉換陣列）
         trends = {}
         for timeframe, df in data_dict.items():
             trends[timeframe] = self.analyze_trend(df)
         
-        # 統計多空方向
-        up_count = sum(1 for t in trends.values() 
-                      if t in [TrendDirection.UP, TrendDirection.STRONG_UP])
-        down_count = sum(1 for t in trends.values() 
-                        if t in [TrendDirection.DOWN, TrendDirection.STRONG_DOWN])
+        # 統計多空方向（單次走訪）
+        up_count = down_count = 0
+        for t in trends.values():
+            if t in _UP_SET:
+                up_count += 1
+            elif t in _DOWN_SET:
+                down_count += 1
         total_count = len(trends)
         
         # 判斷一致性
@@ -171,9 +425,11 @@ class MultiTimeFrameAnalyzer:
         # 詳細分析每個時間框架
         for timeframe, trend in trends.items():
             analysis.append(f"{timeframe.value}: {trend.value}")
+        for timeframe in skipped:
+            analysis.append(f"{timeframe.value}: 資料不足，略過")
         
         # 決定進場時間框架（使用最短的時間框架）
-        entry_timeframe = min(data_dict.keys(), key=lambda x: list(TimeFrame).index(x))
+        entry_timeframe = min(data_dict.keys(), key=_TIMEFRAME_ORDER.__getitem__)
         
         return {
             'alignment': alignment,
@@ -183,8 +439,8 @@ class MultiTimeFrameAnalyzer:
             'analysis': analysis
         }
     
-    def get_entry_signal(self, long_term_df: pd.DataFrame, 
-                        short_term_df: pd.DataFrame,
+    def get_entry_signal(self, long_term_df: Union[pd.DataFrame, OHLCV], 
+                        short_term_df: Union[pd.DataFrame, OHLCV],
                         trend_alignment: str) -> Dict:
         """
         獲取進場訊號
@@ -207,13 +463,25 @@ class MultiTimeFrameAnalyzer:
                 'reason': str
             }
         """
+        # 任一週期 K 棒不足時直接觀望
+        if self._too_short(long_term_df) or self._too_short(short_term_df):
+            closes = _as_soa(short_term_df).close
+            return {
+                'signal': 'WAIT',
+                'entry_price': closes[-1] if closes.shape[0] else 0,
+                'stop_loss': 0,
+                'take_profit': 0,
+                'reason': '資料不足，等待更多 K 棒'
+            }
+        
         # 分析長週期支撐壓力
         lt_sr = self.analyze_support_resistance(long_term_df)
         
-        # 分析短週期趨勢
+        # 分析短週期趨勢（與 multi_timeframe_check 共用快取）
         st_trend = self.analyze_trend(short_term_df)
         
-        current_price = short_term_df['Close'].iloc[-1]
+        short_term = _as_soa(short_term_df)
+        current_price = short_term.close[-1]
         
         signal = 'WAIT'
         reason = ''
@@ -229,12 +497,12 @@ class MultiTimeFrameAnalyzer:
                     reason = '長週期多頭，短週期回調至支撐區'
                     stop_loss = lt_sr['support'] * 0.97  # 支撐下方 3%
                     take_profit = lt_sr['resistance']
-            elif st_trend in [TrendDirection.UP, TrendDirection.STRONG_UP]:
+            elif st_trend in _UP_SET:
                 signal = 'BUY'
                 reason = '多時間框架一致看多'
                 # 使用短週期均線作為停損
-                short_term_df['MA5'] = short_term_df['Close'].rolling(window=5).mean()
-                stop_loss = short_term_df['MA5'].iloc[-1] * 0.98
+                ma5 = short_term.close[-5:].mean()
+                stop_loss = ma5 * 0.98
                 take_profit = current_price * 1.06  # 6% 停利
         
         # 做空訊號
@@ -245,11 +513,11 @@ class MultiTimeFrameAnalyzer:
                     reason = '長週期空頭，短週期反彈至壓力區'
                     stop_loss = lt_sr['resistance'] * 1.03
                     take_profit = lt_sr['support']
-            elif st_trend in [TrendDirection.DOWN, TrendDirection.STRONG_DOWN]:
+            elif st_trend in _DOWN_SET:
                 signal = 'SELL'
                 reason = '多時間框架一致看空'
-                short_term_df['MA5'] = short_term_df['Close'].rolling(window=5).mean()
-                stop_loss = short_term_df['MA5'].iloc[-1] * 1.02
+                ma5 = short_term.close[-5:].mean()
+                stop_loss = ma5 * 1.02
                 take_profit = current_price * 0.94
         
         # 分歧時觀望
@@ -279,8 +547,6 @@ class MultiTimeFrameAnalyzer:
 
 # 使用範例
 if __name__ == "__main__":
-    import numpy as np
-    
     # 模擬資料生成函數
     def generate_data(length: int, trend: str = 'up'):
         dates = pd.date_range(start='2024-01-01', periods=length, freq='D')
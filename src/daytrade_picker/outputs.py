@@ -1,4 +1,5 @@
 import datetime as dt
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import pandas as pd
@@ -21,16 +22,30 @@ def write_daily_outputs(df: pd.DataFrame, run_date: dt.date, cfg: dict) -> None:
         "score",
     ]
 
-    out = df.copy()
-    for c in cols:
-        if c not in out.columns:
-            out[c] = pd.NA
-
-    out = out[cols]
+    # 一次完成欄位挑選與排序，缺少的欄位補空值
+    out = df.reindex(columns=cols)
 
     csv_path = out_dir / f"candidates_{run_date.isoformat()}.csv"
-    out.to_csv(csv_path, index=False, encoding="utf-8-sig")
+    if out.empty or not cfg["storage"].get("write_xlsx", True):
+        # 沒有候選股或設定關閉 XLSX 時只寫 CSV，不必載入 Excel 引擎
+        out.to_csv(csv_path, index=False, encoding="utf-8-sig")
+        return
 
     xlsx_path = out_dir / f"{run_date.isoformat()}.xlsx"
-    with pd.ExcelWriter(xlsx_path, engine="openpyxl") as w:
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        f_csv = ex.submit(out.to_csv, csv_path, index=False, encoding="utf-8-sig")
+        f_xlsx = ex.submit(_write_xlsx, out, xlsx_path)
+        f_csv.result()
+        f_xlsx.result()
+
+
+def _write_xlsx(out: pd.DataFrame, xlsx_path: Path) -> None:
+    # xlsxwriter 較快；未安裝時退回 openpyxl。
+    # 不開 constant_memory：pandas 的 to_excel 逐欄寫出，該模式只保留依列順序寫入的儲存格，其餘欄位會被丟棄
+    try:
+        import xlsxwriter  # noqa: F401
+        engine = "xlsxwriter"
+    except ImportError:
+        engine = "openpyxl"
+    with pd.ExcelWriter(xlsx_path, engine=engine) as w:
         out.to_excel(w, index=False, sheet_name="Candidates")
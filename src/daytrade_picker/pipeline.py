@@ -1,4 +1,6 @@
+import copy
 import datetime as dt
+from functools import lru_cache
 from pathlib import Path
 
 import pandas as pd
@@ -11,8 +13,15 @@ from .strategies.strategy_a import apply_strategy_a
 from .outputs import write_daily_outputs
 
 
+@lru_cache(maxsize=32)
+def _load_cfg(path_str: str, mtime: float) -> dict:
+    # 以 (路徑, 修改時間) 為鍵，設定檔被修改後會重新讀取
+    return yaml.safe_load(Path(path_str).read_text(encoding="utf-8"))
+
+
 def run_pipeline(run_date: dt.date, config_path: Path) -> None:
-    cfg = yaml.safe_load(config_path.read_text(encoding="utf-8"))
+    # 回傳副本，避免下游修改到快取中的設定
+    cfg = copy.deepcopy(_load_cfg(str(config_path), config_path.stat().st_mtime))
 
     prices = fetch_daily_prices_all(run_date)
     inst = fetch_institution_net_all(run_date)
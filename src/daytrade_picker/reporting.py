@@ -1,9 +1,34 @@
 import datetime as dt
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
 
+# 報表用到的數值欄，讀檔時直接解析為 float64
+_MARKET_DTYPES = {"turnover": "float64", "pct_change": "float64", "close": "float64"}
+_CAND_DTYPES = {"score_total": "float64", "suggest_entry": "float64", "suggest_stop": "float64"}
+
+
+def _read_typed_csv(path: Path, dtypes: dict) -> pd.DataFrame:
+    try:
+        import pyarrow  # noqa: F401
+        engine = "pyarrow"
+    except ImportError:
+        engine = "c"
+
+    try:
+        return pd.read_csv(path, encoding="utf-8-sig", engine=engine, dtype=dtypes)
+    except ValueError:
+        # 數值欄混有無法解析的字串時，退回逐欄 to_numeric（無法解析者為 NaN）
+        df = pd.read_csv(path, encoding="utf-8-sig")
+        for c in dtypes:
+            if c in df.columns:
+                df[c] = pd.to_numeric(df[c], errors="coerce")
+        return df
+
+
 def generate_report(
     trade_date: dt.date,
     market_dir: Path,
@@ -20,23 +45,22 @@ def generate_report(
     if not cand_path.exists():
         raise RuntimeError(f"Missing Strategy C candidates file: {cand_path}")
 
-    market = pd.read_csv(market_path, encoding="utf-8-sig")
-    cand = pd.read_csv(cand_path, encoding="utf-8-sig")
-
-    for c in ["turnover", "pct_change", "close"]:
-        if c in market.columns:
-            market[c] = pd.to_numeric(market[c], errors="coerce")
-
-    if "score_total" in cand.columns:
-        cand["score_total"] = pd.to_numeric(cand["score_total"], errors="coerce")
+    market = _read_typed_csv(market_path, _MARKET_DTYPES)
+    cand = _read_typed_csv(cand_path, _CAND_DTYPES)
 
     img_score = out_dir / f"score_dist_{trade_date.isoformat()}.png"
     img_themes = out_dir / f"themes_top_{trade_date.isoformat()}.png"
     img_scatter = out_dir / f"turnover_scatter_{trade_date.isoformat()}.png"
 
-    _plot_score_distribution(cand, img_score)
-    _plot_top_themes(cand, img_themes)
-    _plot_turnover_scatter(market, cand, img_scatter)
+    # 三張圖彼此獨立，各自在子行程中繪製與編碼 PNG
+    with ProcessPoolExecutor(max_workers=3, initializer=_init_plot_worker) as ex:
+        futures = [
+            ex.submit(_plot_score_distribution, cand, img_score),
+            ex.submit(_plot_top_themes, cand, img_themes),
+            ex.submit(_plot_turnover_scatter, market, cand, img_scatter),
+        ]
+        for f in futures:
+            f.result()
 
     md_path = out_dir / f"report_{trade_date.isoformat()}.md"
     md_path.write_text(
@@ -47,6 +71,13 @@ def generate_report(
     return md_path
 
 
+def _init_plot_worker() -> None:
+    # 子行程只輸出檔案，固定使用非互動式 Agg 後端
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+
 def _plot_score_distribution(cand: pd.DataFrame, out_path: Path) -> None:
     import matplotlib.pyplot as plt
 
@@ -83,13 +114,21 @@ def _plot_top_themes(cand: pd.DataFrame, out_path: Path) -> None:
         plt.close(fig)
         return
 
-    tmp = cand.copy()
-    if "score_total" in tmp.columns:
-        tmp["score_total"] = pd.to_numeric(tmp["score_total"], errors="coerce")
+    # 先以 value_counts 取出前 12 名（同數量者一併保留，以平均分數決勝），只對這些題材計算平均
+    themes = cand.loc[cand["stock_id"].notna(), "themes"]
+    counts = themes.value_counts().sort_index()
+    if len(counts) > 12:
+        counts = counts[counts >= counts.nlargest(12).iloc[-1]]
+
+    if "score_total" in cand.columns:
+        picked = themes.isin(counts.index)
+        scores = pd.to_numeric(cand.loc[picked.index[picked], "score_total"], errors="coerce")
+        means = scores.groupby(themes[picked]).mean().reindex(counts.index)
+    else:
+        means = pd.Series(np.nan, index=counts.index)
 
     agg = (
-        tmp.groupby("themes", as_index=False)
-        .agg(num_candidates=("stock_id", "count"), avg_score=("score_total", "mean"))
+        pd.DataFrame({"themes": counts.index, "num_candidates": counts.to_numpy(), "avg_score": means.to_numpy()})
         .sort_values(["num_candidates", "avg_score"], ascending=[False, False])
         .head(12)
     )
@@ -145,15 +184,11 @@ def _render_markdown(
     n_market = len(market)
     n_cand = len(cand)
 
-    top10 = cand.copy()
-    for c in ["score_total", "suggest_entry", "suggest_stop"]:
-        if c in top10.columns:
-            top10[c] = pd.to_numeric(top10[c], errors="coerce")
-
-    show_cols = [c for c in ["stock_id", "stock_name", "themes", "score_total", "suggest_entry", "suggest_stop", "shares"] if c in top10.columns]
+    show_cols = [c for c in ["stock_id", "stock_name", "themes", "score_total", "suggest_entry", "suggest_stop", "shares"] if c in cand.columns]
     top10_md = "(no candidates)"
-    if len(top10) > 0 and show_cols:
-        top10_md = _to_markdown_table(top10[show_cols].head(10))
+    if n_cand > 0 and show_cols:
+        # 先取前 10 列再選欄，只有這一小段會被複製（數值欄已於讀檔時解析）
+        top10_md = _to_markdown_table(cand.head(10)[show_cols])
 
     rel_score = img_score.name
     rel_themes = img_themes.name
@@ -190,21 +225,27 @@ def _to_markdown_table(df: pd.DataFrame) -> str:
     if df is None or len(df) == 0:
         return "(empty)"
 
+    try:
+        import tabulate  # noqa: F401
+    except ImportError:
+        pass
+    else:
+        # 有 tabulate 時交給 pandas 產生；關閉數字解析以免 "0050" 之類的代號被轉成 50
+        clean = df.replace("\n", " ", regex=True).astype(object)
+        clean = clean.where(clean.notna(), None)
+        return clean.to_markdown(index=False, tablefmt="github", missingval="", disable_numparse=True)
+
     cols = [str(c) for c in df.columns]
     header = "| " + " | ".join(cols) + " |"
     sep = "| " + " | ".join(["---"] * len(cols)) + " |"
 
-    rows = []
-    for _, r in df.iterrows():
-        cells = []
-        for c in cols:
-            v = r[c]
-            if pd.isna(v):
-                s = ""
-            else:
-                s = str(v)
-            s = s.replace("\n", " ")
-            cells.append(s)
-        rows.append("| " + " | ".join(cells) + " |")
+    # 逐欄轉成字串陣列再拼接，避免 iterrows 逐格裝箱
+    formatted = []
+    for i in range(len(cols)):
+        a = df.iloc[:, i].to_numpy(dtype=object)
+        texts = np.where(pd.isna(a), "", a).astype(str)
+        formatted.append(np.char.replace(texts, "\n", " "))
+
+    rows = ["| " + " | ".join(cells) + " |" for cells in zip(*formatted)]
 
     return "\n".join([header, sep] + rows)
@@ -1,27 +1,58 @@
+import operator
+
+import numpy as np
 import pandas as pd
 
+_OPS = {">=": operator.ge, "<=": operator.le, "==": operator.eq}
+
 
 def apply_risk_filter(df: pd.DataFrame, cfg: dict) -> pd.DataFrame:
     r = cfg.get("risk", {})
 
-    out = df.copy()
+    # 收集 (欄位陣列名稱, 運算子, 門檻)，最後一次合併成遮罩再切片
+    arrays = {}
+    checks = []
 
     min_turnover = r.get("min_turnover")
     if min_turnover is not None:
-        out = out[out["turnover"].fillna(0) >= float(min_turnover)]
+        arrays["turnover"] = df["turnover"].to_numpy(dtype=float, na_value=0.0)
+        checks.append(("turnover", ">=", float(min_turnover)))
 
     min_price = r.get("min_price")
-    if min_price is not None:
-        out = out[out["close"].fillna(0) >= float(min_price)]
-
     max_price = r.get("max_price")
-    if max_price is not None:
-        out = out[out["close"].fillna(0) <= float(max_price)]
+    if min_price is not None or max_price is not None:
+        arrays["close"] = df["close"].to_numpy(dtype=float, na_value=0.0)
+        if min_price is not None:
+            checks.append(("close", ">=", float(min_price)))
+        if max_price is not None:
+            checks.append(("close", "<=", float(max_price)))
 
     if r.get("exclude_disposition"):
-        out = out[out["is_disposition"].fillna(False) == False]  # noqa: E712
+        arrays["keep_disposition"] = (df["is_disposition"].fillna(False) == False).to_numpy()  # noqa: E712
+        checks.append(("keep_disposition", "==", True))
 
     if r.get("exclude_full_cash_delivery"):
-        out = out[out["is_full_cash_delivery"].fillna(False) == False]  # noqa: E712
+        arrays["keep_full_cash"] = (df["is_full_cash_delivery"].fillna(False) == False).to_numpy()  # noqa: E712
+        checks.append(("keep_full_cash", "==", True))
+
+    return df.loc[_combine_checks(arrays, checks, len(df))]
+
+
+def _combine_checks(arrays: dict, checks: list, n: int) -> np.ndarray:
+    if not checks:
+        return np.ones(n, dtype=bool)
+
+    try:
+        import numexpr
+    except ImportError:
+        numexpr = None
+
+    if numexpr is not None:
+        # numexpr 單次走訪完成所有比較與 AND，不產生中間布林陣列
+        expr = " & ".join(f"({name} {op} {bound!r})" for name, op, bound in checks)
+        return numexpr.evaluate(expr, local_dict=arrays)
 
-    return out
+    mask = np.ones(n, dtype=bool)
+    for name, op, bound in checks:
+        mask &= _OPS[op](arrays[name], bound)
+    return mask
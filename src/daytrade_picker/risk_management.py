@@ -6,9 +6,57 @@ from typing import Dict, Optional, List
 from dataclasses import dataclass
 from datetime import datetime
 import logging
+import time
+
+import numpy as np
+
+try:
+    from ._jit import njit
+except ImportError:  # 以頂層模組載入時（main_strategy.py）
+    from _jit import njit
 
 logger = logging.getLogger(__name__)
 
+# _exit_check 回傳的出場代碼
+EXIT_HOLD = 0
+EXIT_STOP_LOSS = 1
+EXIT_TAKE_PROFIT = 2
+
+
+# 明確簽章讓 numba 在載入模組時即編譯（搭配 cache=True 直接讀取快取）
+@njit("Tuple((i8, f8))(f8, f8, f8, f8, f8)", cache=True)
+def _exit_check(current_price, entry_price, stop_loss, take_profit, trailing_stop_pct):
+    """
+    單一持倉的出場判斷（純浮點運算，可由 numba 編譯）
+    
+    Returns:
+        (出場代碼, 停損價)；持有中且觸發移動停利時，停損價為上移後的新值
+    """
+    if current_price <= stop_loss:
+        return EXIT_STOP_LOSS, stop_loss
+    if current_price >= take_profit:
+        return EXIT_TAKE_PROFIT, stop_loss
+    
+    # 移動停利（當價格上漲超過一定幅度時）
+    profit_pct = (current_price - entry_price) / entry_price * 100
+    if profit_pct > trailing_stop_pct * 2:
+        new_stop = entry_price * (1 + trailing_stop_pct / 100)
+        if new_stop > stop_loss:
+            return EXIT_HOLD, new_stop
+    return EXIT_HOLD, stop_loss
+
+
+@njit("Tuple((i8[:], f8[:]))(f8[:], f8[:], f8[:], f8[:], f8)", cache=True)
+def _exit_check_batch(current_prices, entry_prices, stop_losses, take_profits, trailing_stop_pct):
+    """對所有持倉一次執行 _exit_check，回傳 (出場代碼陣列, 停損價陣列)"""
+    n = current_prices.shape[0]
+    codes = np.empty(n, dtype=np.int64)
+    stops = np.empty(n, dtype=np.float64)
+    for i in range(n):
+        codes[i], stops[i] = _exit_check(current_prices[i], entry_prices[i], stop_losses[i],
+                                         take_profits[i], trailing_stop_pct)
+    return codes, stops
+
 
 @dataclass
 class Position:
@@ -51,20 +99,64 @@ class RiskManager:
         self.config = config
         self.initial_capital = initial_capital
         self.current_capital = initial_capital
-        self.positions: Dict[str, Position] = {}
         self.daily_pnl = 0.0
         self.peak_capital = initial_capital
         self.consecutive_losses = 0
         self.last_loss_time: Optional[datetime] = None
+        # 冷靜期以單調時鐘秒數計算，避免每次檢查都建立 datetime
+        self._last_loss_ts: Optional[float] = None
+        self._cooldown_seconds = config.cooldown_period_minutes * 60
         self.trade_history: List[Dict] = []
         
+        # 持倉以欄為單位的平行陣列存放（SoA），_slots 記錄代號對應的槽位
+        capacity = max(int(config.max_open_positions), 1)
+        self._slots: Dict[str, int] = {}
+        self._syms: List[Optional[str]] = [None] * capacity
+        self._entry_time: List[Optional[datetime]] = [None] * capacity
+        self._entry = np.zeros(capacity, dtype=np.float64)
+        self._stop = np.zeros(capacity, dtype=np.float64)
+        self._take = np.zeros(capacity, dtype=np.float64)
+        self._size_pct = np.zeros(capacity, dtype=np.float64)
+        self._qty = np.zeros(capacity, dtype=np.int64)
+        self._active = np.zeros(capacity, dtype=bool)
+    
+    @property
+    def positions(self) -> Dict[str, Position]:
+        """目前持倉的快照 {代號: Position}（修改快照不會回寫）"""
+        return {symbol: self._position_at(i) for symbol, i in self._slots.items()}
+    
+    def _position_at(self, i: int) -> Position:
+        return Position(
+            symbol=self._syms[i],
+            entry_price=float(self._entry[i]),
+            quantity=int(self._qty[i]),
+            entry_time=self._entry_time[i],
+            stop_loss=float(self._stop[i]),
+            take_profit=float(self._take[i]),
+            position_size_pct=float(self._size_pct[i])
+        )
+    
+    def _free_slot(self) -> int:
+        """取得空槽位；陣列已滿時容量加倍"""
+        free = np.flatnonzero(~self._active)
+        if free.size:
+            return int(free[0])
+        
+        i = self._active.shape[0]
+        for name in ('_entry', '_stop', '_take', '_size_pct', '_qty', '_active'):
+            arr = getattr(self, name)
+            setattr(self, name, np.concatenate([arr, np.zeros_like(arr)]))
+        self._syms.extend([None] * i)
+        self._entry_time.extend([None] * i)
+        return i
+        
     def can_open_position(self) -> tuple[bool, str]:
         """
         檢查是否可以開新倉
         Returns: (是否可開倉, 原因)
         """
         # 檢查持倉數量
-        if len(self.positions) >= self.config.max_open_positions:
+        if len(self._slots) >= self.config.max_open_positions:
             return False, f"已達最大持倉數 {self.config.max_open_positions}"
         
         # 檢查單日虧損
@@ -79,10 +171,10 @@ class RiskManager:
         
         # 檢查連續虧損冷靜期
         if self.consecutive_losses >= self.config.max_consecutive_losses:
-            if self.last_loss_time:
-                cooldown_end = self.last_loss_time.timestamp() + (self.config.cooldown_period_minutes * 60)
-                if datetime.now().timestamp() < cooldown_end:
-                    remaining = int((cooldown_end - datetime.now().timestamp()) / 60)
+            if self._last_loss_ts is not None:
+                remaining_seconds = self._last_loss_ts + self._cooldown_seconds - time.monotonic()
+                if remaining_seconds > 0:
+                    remaining = int(remaining_seconds / 60)
                     return False, f"連續虧損 {self.consecutive_losses} 次，冷靜期剩餘 {remaining} 分鐘"
                 else:
                     # 冷靜期結束，重置計數
@@ -121,15 +213,38 @@ class RiskManager:
             quantity = (quantity // 1000) * 1000
         
         stop_loss_price = entry_price * (1 - stop_loss_pct / 100)
-        
+
         return quantity, stop_loss_price
-    
+
+    def calculate_position_sizes(self, entry_prices: np.ndarray,
+                                 stop_loss_pcts: Optional[np.ndarray] = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        批次計算建議持倉數量（calculate_position_size 的向量化版本，不逐檔記錄警告）
+        Returns: (股數陣列, 停損價陣列)
+        """
+        entry = np.asarray(entry_prices, dtype=np.float64)
+        if stop_loss_pcts is None:
+            stop_pct = np.full(entry.shape, self.config.default_stop_loss_pct, dtype=np.float64)
+        else:
+            stop_pct = np.broadcast_to(np.asarray(stop_loss_pcts, dtype=np.float64), entry.shape)
+
+        risk_amount = self.current_capital * (self.config.max_risk_per_trade_pct / 100)
+        max_position_value = self.current_capital * (self.config.max_position_size_pct / 100)
+        quantity = np.trunc(risk_amount / (entry * (stop_pct / 100))).astype(np.int64)
+        max_quantity = np.trunc(max_position_value / entry).astype(np.int64)
+        quantity = np.minimum(quantity, max_quantity)
+
+        # 不足 1 張補為 1000 股，其餘調整為 1000 的倍數
+        quantity = np.where(quantity < 1000, 1000, (quantity // 1000) * 1000)
+
+        return quantity, entry * (1 - stop_pct / 100)
+
     def open_position(self, symbol: str, entry_price: float, quantity: int,
                      stop_loss: float, take_profit: Optional[float] = None) -> bool:
         """
         開倉
         """
-        if symbol in self.positions:
+        if symbol in self._slots:
             logger.warning(f"{symbol} 已有持倉，無法重複開倉")
             return False
         
@@ -144,17 +259,17 @@ class RiskManager:
         if take_profit is None:
             take_profit = entry_price * (1 + self.config.default_take_profit_pct / 100)
         
-        position = Position(
-            symbol=symbol,
-            entry_price=entry_price,
-            quantity=quantity,
-            entry_time=datetime.now(),
-            stop_loss=stop_loss,
-            take_profit=take_profit,
-            position_size_pct=position_size_pct
-        )
+        i = self._free_slot()
+        self._slots[symbol] = i
+        self._syms[i] = symbol
+        self._entry_time[i] = datetime.now()
+        self._entry[i] = entry_price
+        self._stop[i] = stop_loss
+        self._take[i] = take_profit
+        self._size_pct[i] = position_size_pct
+        self._qty[i] = quantity
+        self._active[i] = True
         
-        self.positions[symbol] = position
         logger.info(f"開倉 {symbol}: 價格 {entry_price}, 數量 {quantity}, "
                    f"停損 {stop_loss:.2f}, 停利 {take_profit:.2f}")
         return True
@@ -164,38 +279,62 @@ class RiskManager:
         檢查是否需要出場
         Returns: (是否出場, 原因)
         """
-        if symbol not in self.positions:
+        i = self._slots.get(symbol)
+        if i is None:
             return False, "無此持倉"
         
-        position = self.positions[symbol]
+        code, new_stop = _exit_check(float(current_price), self._entry[i], self._stop[i],
+                                     self._take[i], float(self.config.trailing_stop_pct))
+        return self._apply_exit_result(i, code, new_stop)
+    
+    def check_exit_signals_batch(self, prices: Dict[str, float]) -> Dict[str, tuple[bool, str]]:
+        """
+        以一次批次運算檢查多檔持倉是否需要出場（回測逐 tick 掃描用）
         
-        # 檢查停損
-        if current_price <= position.stop_loss:
-            return True, f"觸及停損 {position.stop_loss:.2f}"
+        Args:
+            prices: {代號: 當前價格}，只檢查有持倉的代號
         
-        # 檢查停利
-        if current_price >= position.take_profit:
-            return True, f"觸及停利 {position.take_profit:.2f}"
+        Returns:
+            {代號: (是否出場, 原因)}
+        """
+        symbols = [s for s in prices if s in self._slots]
+        if not symbols:
+            return {}
         
-        # 移動停利（當價格上漲超過一定幅度時）
-        profit_pct = ((current_price - position.entry_price) / position.entry_price) * 100
-        if profit_pct > self.config.trailing_stop_pct * 2:
-            new_stop = position.entry_price * (1 + self.config.trailing_stop_pct / 100)
-            if new_stop > position.stop_loss:
-                position.stop_loss = new_stop
-                logger.info(f"{symbol} 移動停利至 {new_stop:.2f}")
+        # 槽位索引直接切出各欄陣列，不必逐筆取 Position 屬性
+        idx = np.array([self._slots[s] for s in symbols], dtype=np.int64)
+        codes, stops = _exit_check_batch(
+            np.array([prices[s] for s in symbols], dtype=np.float64),
+            self._entry[idx], self._stop[idx], self._take[idx],
+            float(self.config.trailing_stop_pct),
+        )
+        return {
+            s: self._apply_exit_result(i, code, stop)
+            for s, i, code, stop in zip(symbols, idx.tolist(), codes.tolist(), stops.tolist())
+        }
+    
+    def _apply_exit_result(self, i: int, code: int, new_stop: float) -> tuple[bool, str]:
+        """將槽位 i 的出場代碼轉為 (是否出場, 原因)，並套用上移後的停損價"""
+        if code == EXIT_STOP_LOSS:
+            return True, f"觸及停損 {self._stop[i]:.2f}"
+        if code == EXIT_TAKE_PROFIT:
+            return True, f"觸及停利 {self._take[i]:.2f}"
         
+        if new_stop > self._stop[i]:
+            self._stop[i] = new_stop
+            logger.info(f"{self._syms[i]} 移動停利至 {new_stop:.2f}")
         return False, "持有中"
     
     def close_position(self, symbol: str, exit_price: float, reason: str = "") -> Dict:
         """
         平倉
         """
-        if symbol not in self.positions:
+        i = self._slots.get(symbol)
+        if i is None:
             logger.warning(f"無法平倉 {symbol}: 無此持倉")
             return {}
         
-        position = self.positions[symbol]
+        position = self._position_at(i)
         pnl = (exit_price - position.entry_price) * position.quantity
         pnl_pct = ((exit_price - position.entry_price) / position.entry_price) * 100
         
@@ -211,6 +350,7 @@ class RiskManager:
         if pnl < 0:
             self.consecutive_losses += 1
             self.last_loss_time = datetime.now()
+            self._last_loss_ts = time.monotonic()
         else:
             self.consecutive_losses = 0
         
@@ -231,8 +371,11 @@ class RiskManager:
         logger.info(f"平倉 {symbol}: 進場 {position.entry_price:.2f}, 出場 {exit_price:.2f}, "
                    f"損益 {pnl:+.0f} ({pnl_pct:+.2f}%), 原因: {reason}")
         
-        # 移除持倉
-        del self.positions[symbol]
+        # 移除持倉（釋放槽位）
+        del self._slots[symbol]
+        self._syms[i] = None
+        self._entry_time[i] = None
+        self._active[i] = False
         
         return trade_record
     
@@ -248,7 +391,7 @@ class RiskManager:
             'total_pnl': self.current_capital - self.initial_capital,
             'total_pnl_pct': ((self.current_capital - self.initial_capital) / self.initial_capital) * 100,
             'drawdown_pct': drawdown_pct,
-            'open_positions': len(self.positions),
+            'open_positions': len(self._slots),
             'consecutive_losses': self.consecutive_losses,
             'total_trades': len(self.trade_history)
         }
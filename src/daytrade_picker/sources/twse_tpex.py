@@ -1,9 +1,17 @@
 import datetime as dt
+import functools
 import json
-from typing import Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
 
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
 
 
 _TWSE_MI_INDEX = "https://www.twse.com.tw/exchangeReport/MI_INDEX"
@@ -11,19 +19,33 @@ _TWSE_T86 = "https://www.twse.com.tw/rwd/zh/fund/T86"
 _TPEX_DAILY_QUOTES = "https://www.tpex.org.tw/web/stock/aftertrading/daily_close_quotes/stk_quote_result.php"
 _TPEX_3INST = "https://www.tpex.org.tw/web/stock/3insti/daily_trade/3insti_hedge_result.php"
 
+# Shared session: keep-alive reuses TCP/TLS connections across fetches to the same host.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+_SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
 
+@functools.lru_cache(maxsize=256)
 def _yyyymmdd(d: dt.date) -> str:
     return d.strftime("%Y%m%d")
 
 
+@functools.lru_cache(maxsize=256)
 def _roc_yyy_mm_dd(d: dt.date) -> str:
     roc_year = d.year - 1911
     return f"{roc_year}/{d.month:02d}/{d.day:02d}"
 
 
 def _req_json(url: str, params: dict[str, Any]) -> dict[str, Any]:
-    r = requests.get(url, params=params, timeout=30)
+    r = _SESSION.get(url, params=params, timeout=30)
     r.raise_for_status()
+    if orjson is not None:
+        # orjson parses the raw bytes directly (no text decode); anything it rejects
+        # (BOM, HTML error pages, ...) falls through to the lenient path below.
+        try:
+            return orjson.loads(r.content)
+        except orjson.JSONDecodeError:
+            pass
     try:
         return r.json()
     except requests.exceptions.JSONDecodeError:
@@ -36,14 +58,44 @@ def _req_json(url: str, params: dict[str, Any]) -> dict[str, Any]:
             return {}
 
 
-def fetch_daily_prices_all(run_date: dt.date) -> pd.DataFrame:
-    twse = _fetch_twse_prices(run_date)
-    tpex = _fetch_tpex_prices(run_date)
-    df = pd.concat([twse, tpex], ignore_index=True)
-    df["date"] = pd.to_datetime(df["date"]).dt.date
+def _clean_numeric(df: pd.DataFrame, cols: list[str]) -> pd.DataFrame:
+    # One regex pass strips thousands separators across all columns; placeholders
+    # such as "--" / "-" are left for to_numeric(errors="coerce") to turn into NaN.
+    return df[cols].replace(",", "", regex=True).apply(pd.to_numeric, errors="coerce")
+
+
+def _fetch_both(
+    run_date: dt.date,
+    twse_fn: Callable[[dt.date], pd.DataFrame],
+    tpex_fn: Callable[[dt.date], pd.DataFrame],
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # TWSE and TPEX are separate hosts; the requests release the GIL while waiting on I/O,
+    # so fetching both in threads roughly halves the wall time.
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        twse = ex.submit(twse_fn, run_date)
+        tpex = ex.submit(tpex_fn, run_date)
+        return twse.result(), tpex.result()
+
+
+def _combine_markets(twse: pd.DataFrame, tpex: pd.DataFrame) -> pd.DataFrame:
+    frames = [f for f in (twse, tpex) if not f.empty]
+    if len(frames) == 1:
+        # Only one market has data (holiday / single-market day): skip concat and just
+        # align to the columns concat would have produced.
+        df = frames[0].reindex(columns=twse.columns.union(tpex.columns, sort=False))
+    else:
+        df = pd.concat([twse, tpex], ignore_index=True)
+    # The fetchers already fill `date` with datetime.date objects; only parse other dtypes.
+    if df["date"].dtype != object:
+        df["date"] = pd.to_datetime(df["date"]).dt.date
     return df
 
 
+def fetch_daily_prices_all(run_date: dt.date) -> pd.DataFrame:
+    twse, tpex = _fetch_both(run_date, _fetch_twse_prices, _fetch_tpex_prices)
+    return _combine_markets(twse, tpex)
+
+
 def _fetch_twse_prices(run_date: dt.date) -> pd.DataFrame:
     payload = _req_json(
         _TWSE_MI_INDEX,
@@ -130,18 +182,8 @@ def _fetch_twse_prices(run_date: dt.date) -> pd.DataFrame:
     raw.insert(0, "date", run_date)
     raw.insert(1, "market", "TWSE")
 
-    for col in ["open", "high", "low", "close", "change"]:
-        raw[col] = (
-            raw[col]
-            .astype(str)
-            .str.replace(",", "", regex=False)
-            .replace({"--": None, "-": None})
-        )
-        raw[col] = pd.to_numeric(raw[col], errors="coerce")
-
-    for col in ["volume", "turnover"]:
-        raw[col] = raw[col].astype(str).str.replace(",", "", regex=False)
-        raw[col] = pd.to_numeric(raw[col], errors="coerce")
+    num_cols = ["open", "high", "low", "close", "change", "volume", "turnover"]
+    raw[num_cols] = _clean_numeric(raw, num_cols)
 
     raw["pct_change"] = (raw["change"] / (raw["close"] - raw["change"])) * 100
     raw["pct_change"] = raw["pct_change"].replace([pd.NA, pd.NaT], None)
@@ -160,7 +202,8 @@ def _fetch_tpex_prices(run_date: dt.date) -> pd.DataFrame:
         params={"l": "zh-tw", "d": _roc_yyy_mm_dd(run_date), "o": "json"},
     )
 
-    data = payload.get("aaData") or payload.get("data")
+    # TPEX columns are positional; rows too short to hold 成交金額 are skipped.
+    data = [row for row in (payload.get("aaData") or payload.get("data") or []) if len(row) >= 10]
     if not data:
         return pd.DataFrame(
             columns=[
@@ -183,46 +226,27 @@ def _fetch_tpex_prices(run_date: dt.date) -> pd.DataFrame:
             ]
         )
 
-    # TPEX columns are positional; keep a conservative subset.
+    # Keep a conservative subset, selected by position in one pass.
     # Common order: 代號, 名稱, 收盤, 漲跌, 開盤, 最高, 最低, 均價, 成交股數, 成交金額, ...
-    rows = []
-    for row in data:
-        if len(row) < 10:
-            continue
-        stock_id = str(row[0]).strip()
-        name = str(row[1]).strip()
-        close = row[2]
-        change = row[3]
-        open_ = row[4]
-        high = row[5]
-        low = row[6]
-        volume = row[8]
-        turnover = row[9]
-        rows.append(
-            {
-                "date": run_date,
-                "market": "TPEX",
-                "stock_id": stock_id,
-                "name": name,
-                "open": open_,
-                "high": high,
-                "low": low,
-                "close": close,
-                "change": change,
-                "volume": volume,
-                "turnover": turnover,
-            }
-        )
-
-    df = pd.DataFrame(rows)
-
-    for col in ["open", "high", "low", "close", "change"]:
-        df[col] = df[col].astype(str).str.replace(",", "", regex=False).replace({"--": None, "-": None})
-        df[col] = pd.to_numeric(df[col], errors="coerce")
+    raw = pd.DataFrame(data)
+    df = pd.DataFrame(
+        {
+            "date": run_date,
+            "market": "TPEX",
+            "stock_id": raw[0].astype(str).str.strip(),
+            "name": raw[1].astype(str).str.strip(),
+            "open": raw[4],
+            "high": raw[5],
+            "low": raw[6],
+            "close": raw[2],
+            "change": raw[3],
+            "volume": raw[8],
+            "turnover": raw[9],
+        }
+    )
 
-    for col in ["volume", "turnover"]:
-        df[col] = df[col].astype(str).str.replace(",", "", regex=False)
-        df[col] = pd.to_numeric(df[col], errors="coerce")
+    num_cols = ["open", "high", "low", "close", "change", "volume", "turnover"]
+    df[num_cols] = _clean_numeric(df, num_cols)
 
     df["pct_change"] = (df["change"] / (df["close"] - df["change"])) * 100
 
@@ -235,11 +259,8 @@ def _fetch_tpex_prices(run_date: dt.date) -> pd.DataFrame:
 
 
 def fetch_institution_net_all(run_date: dt.date) -> pd.DataFrame:
-    twse = _fetch_twse_institution(run_date)
-    tpex = _fetch_tpex_institution(run_date)
-    df = pd.concat([twse, tpex], ignore_index=True)
-    df["date"] = pd.to_datetime(df["date"]).dt.date
-    return df
+    twse, tpex = _fetch_both(run_date, _fetch_twse_institution, _fetch_tpex_institution)
+    return _combine_markets(twse, tpex)
 
 
 def _fetch_twse_institution(run_date: dt.date) -> pd.DataFrame:
@@ -271,9 +292,8 @@ def _fetch_twse_institution(run_date: dt.date) -> pd.DataFrame:
         }
     )
 
-    for col in ["foreign_net", "invest_net"]:
-        out[col] = out[col].astype(str).str.replace(",", "", regex=False)
-        out[col] = pd.to_numeric(out[col], errors="coerce")
+    num_cols = ["foreign_net", "invest_net"]
+    out[num_cols] = _clean_numeric(out, num_cols)
 
     return out
 
@@ -313,8 +333,7 @@ def _fetch_tpex_institution(run_date: dt.date) -> pd.DataFrame:
         }
     )
 
-    for col in ["foreign_net", "invest_net"]:
-        out[col] = out[col].astype(str).str.replace(",", "", regex=False)
-        out[col] = pd.to_numeric(out[col], errors="coerce")
+    num_cols = ["foreign_net", "invest_net"]
+    out[num_cols] = _clean_numeric(out, num_cols)
 
     return out
@@ -11,6 +11,10 @@ def persist_daily(df: pd.DataFrame, run_date: dt.date, cfg: dict) -> None:
     csv_path = out_dir / f"market_{run_date.isoformat()}.csv"
     df.to_csv(csv_path, index=False, encoding="utf-8-sig")
 
+    if cfg["storage"].get("write_parquet"):
+        # 欄式壓縮檔，供下游快速讀取（需安裝 pyarrow）
+        df.to_parquet(out_dir / f"market_{run_date.isoformat()}.parquet", engine="pyarrow", compression="zstd", index=False)
+
     if not cfg["storage"].get("use_sqlite"):
         return
 
@@ -22,4 +26,6 @@ def persist_daily(df: pd.DataFrame, run_date: dt.date, cfg: dict) -> None:
     table = f"market_{run_date.strftime('%Y%m%d')}"
 
     with sqlite3.connect(sqlite_path) as conn:
+        # 僅對此連線關閉 fsync；整張表仍在單一交易內寫入，資料可由 CSV 重建
+        conn.execute("PRAGMA synchronous=OFF")
         df.to_sql(table, conn, if_exists="replace", index=False)
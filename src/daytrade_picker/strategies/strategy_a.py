@@ -1,35 +1,41 @@
+import numpy as np
 import pandas as pd
 
 
 def apply_strategy_a(df: pd.DataFrame, cfg: dict) -> pd.DataFrame:
     s = cfg.get("strategy_A", {})
 
-    out = df.copy()
+    # close_pos is derived from the input frame; the input itself is never copied or mutated.
+    hl_range = (df["high"] - df["low"]).replace(0, pd.NA)
+    close_pos = (df["close"] - df["low"]) / hl_range
 
-    # Minimal MVP: Only uses same-day features.
-    # vol_ratio/new-high/MA need historical data; kept as NaN for now until history module is added.
-    for col in ["vol_ratio", "ma20", "is_20d_high", "close_pos"]:
-        if col not in out.columns:
-            out[col] = pd.NA
-
-    if "close_pos" in out.columns:
-        hl_range = (out["high"] - out["low"]).replace(0, pd.NA)
-        out["close_pos"] = (out["close"] - out["low"]) / hl_range
+    # Combine every filter into one mask and slice once instead of re-filtering per rule.
+    keep = np.ones(len(df), dtype=bool)
 
     min_pct = s.get("min_pct_change")
     max_pct = s.get("max_pct_change")
     if min_pct is not None:
-        out = out[out["pct_change"].fillna(-999) >= float(min_pct)]
+        keep &= (df["pct_change"].fillna(-999) >= float(min_pct)).to_numpy(dtype=bool)
     if max_pct is not None:
-        out = out[out["pct_change"].fillna(999) <= float(max_pct)]
+        keep &= (df["pct_change"].fillna(999) <= float(max_pct)).to_numpy(dtype=bool)
 
     close_pos_min = s.get("close_position_min")
     if close_pos_min is not None:
-        out = out[out["close_pos"].fillna(0) >= float(close_pos_min)]
+        keep &= (close_pos.fillna(0) >= float(close_pos_min)).to_numpy(dtype=bool)
 
     if s.get("require_institution_net_buy"):
-        inst_ok = (out["foreign_net"].fillna(0) > 0) | (out["invest_net"].fillna(0) > 0)
-        out = out[inst_ok]
+        inst_ok = (df["foreign_net"].fillna(0) > 0) | (df["invest_net"].fillna(0) > 0)
+        keep &= inst_ok.to_numpy(dtype=bool)
+
+    # take() returns a fresh frame holding only the kept rows, so new columns go straight onto it.
+    out = df.take(np.flatnonzero(keep))
+
+    # Minimal MVP: Only uses same-day features.
+    # vol_ratio/new-high/MA need historical data; kept as NaN for now until history module is added.
+    for col in ["vol_ratio", "ma20", "is_20d_high", "close_pos"]:
+        if col not in out.columns:
+            out[col] = pd.NA
+    out["close_pos"] = close_pos.to_numpy()[keep]
 
     out = _score(out)
     out = out.sort_values(["score", "turnover"], ascending=[False, False])
@@ -37,19 +43,19 @@ def apply_strategy_a(df: pd.DataFrame, cfg: dict) -> pd.DataFrame:
     return out
 
 
-def _score(df: pd.DataFrame) -> pd.DataFrame:
-    out = df.copy()
-
-    pct = out["pct_change"].fillna(0)
-    turnover = out["turnover"].fillna(0)
-    foreign = out["foreign_net"].fillna(0)
-    invest = out["invest_net"].fillna(0)
+def _score(out: pd.DataFrame) -> pd.DataFrame:
+    # Adds the score column in place; apply_strategy_a only passes its own filtered frame.
+    # Score on plain float arrays (NaN -> 0) in one expression instead of chained Series ops.
+    pct = out["pct_change"].to_numpy(dtype=float, na_value=0.0)
+    turnover = out["turnover"].to_numpy(dtype=float, na_value=0.0)
+    foreign = out["foreign_net"].to_numpy(dtype=float, na_value=0.0)
+    invest = out["invest_net"].to_numpy(dtype=float, na_value=0.0)
 
     out["score"] = (
-        pct.clip(lower=0) * 2
-        + (turnover / 1e8).clip(upper=10)
-        + (foreign / 1e5).clip(lower=-5, upper=10)
-        + (invest / 1e5).clip(lower=-5, upper=10)
+        np.maximum(pct, 0) * 2
+        + np.minimum(turnover / 1e8, 10)
+        + np.clip(foreign / 1e5, -5, 10)
+        + np.clip(invest / 1e5, -5, 10)
     )
 
     return out
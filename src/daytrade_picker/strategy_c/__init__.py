@@ -1,7 +1,8 @@
 __all__ = [
     "run_strategy_c",
+    "run_strategy_c_batch",
     "backtest_strategy_c",
 ]
 
-from .strategy import run_strategy_c
+from .strategy import run_strategy_c, run_strategy_c_batch
 from .backtest import backtest_strategy_c
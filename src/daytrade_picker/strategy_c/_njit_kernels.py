@@ -0,0 +1,192 @@
+"""
+Strategy C 技術指標的數值核心
+
+輸入皆為原始 float64 陣列；安裝 numba 時以 @njit(nogil=True) 編譯（可在執行緒間平行），
+未安裝時逐元素迴圈的核心改用等價的 NumPy / pandas 寫法，避免退化成純 Python 迴圈。
+"""
+import numpy as np
+import pandas as pd
+
+try:
+    from .._jit import HAS_NUMBA, njit
+except ImportError:  # 以頂層模組載入時（main_strategy.py）
+    from _jit import HAS_NUMBA, njit
+
+
+@njit(cache=True, nogil=True)
+def _obv(close, volume):
+    """OBV：收盤上漲加當日量、下跌減當日量、持平（或無法比較）不變，首日為 0"""
+    n = close.shape[0]
+    out = np.zeros(n, dtype=np.float64)
+    for i in range(1, n):
+        if close[i] > close[i - 1]:
+            out[i] = out[i - 1] + volume[i]
+        elif close[i] < close[i - 1]:
+            out[i] = out[i - 1] - volume[i]
+        else:
+            out[i] = out[i - 1]
+    return out
+
+
+@njit(cache=True, nogil=True)
+def _wilder_mean(values, period):
+    # 與 pandas ewm(alpha=1/period, adjust=False, min_periods=period).mean() 逐步一致（含 NaN 處理）
+    n = values.shape[0]
+    out = np.full(n, np.nan)
+    if n == 0:
+        return out
+    alpha = 1.0 / period
+    weighted = values[0]
+    nobs = 1 if weighted == weighted else 0
+    if nobs >= period:
+        out[0] = weighted
+    old_wt = 1.0
+    for i in range(1, n):
+        cur = values[i]
+        is_obs = cur == cur
+        if is_obs:
+            nobs += 1
+        if weighted == weighted:
+            old_wt *= 1.0 - alpha
+            if is_obs:
+                if weighted != cur:
+                    weighted = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+                old_wt = 1.0
+        elif is_obs:
+            weighted = cur
+        if nobs >= period:
+            out[i] = weighted
+    return out
+
+
+@njit(cache=True, nogil=True)
+def _rsi_wilder(close, period):
+    """Wilder RSI（漲跌幅以 alpha = 1 / period 指數平滑）"""
+    n = close.shape[0]
+    gain = np.full(n, np.nan)
+    loss = np.full(n, np.nan)
+    for i in range(1, n):
+        delta = close[i] - close[i - 1]
+        if delta == delta:
+            gain[i] = delta if delta > 0 else 0.0
+            loss[i] = -delta if delta < 0 else 0.0
+    avg_gain = _wilder_mean(gain, period)
+    avg_loss = _wilder_mean(loss, period)
+
+    out = np.full(n, np.nan)
+    for i in range(n):
+        g = avg_gain[i]
+        l = avg_loss[i]
+        if g != g or l != l:
+            continue
+        if l == 0.0:
+            # 無跌幅：有漲幅時 RSI = 100，完全持平則無定義
+            if g > 0.0:
+                out[i] = 100.0
+        else:
+            out[i] = 100.0 - 100.0 / (1.0 + g / l)
+    return out
+
+
+@njit(cache=True, nogil=True)
+def _williams_r_last(high, low, close, period):
+    """最後一筆 Williams %R；資料不足 period 筆時為 NaN"""
+    n = close.shape[0]
+    if n < period:
+        return np.nan
+    highest_high = np.max(high[n - period:])
+    lowest_low = np.min(low[n - period:])
+    num = highest_high - close[n - 1]
+    den = highest_high - lowest_low
+    if den == 0.0:
+        if num != num or num == 0.0:
+            return np.nan
+        return -np.inf if num > 0.0 else np.inf
+    return -100.0 * (num / den)
+
+
+@njit(cache=True, nogil=True)
+def _bb_last(close, period, std):
+    """最後一筆布林通道 (上軌, 中軌, 下軌)，標準差為樣本標準差（ddof=1）"""
+    n = close.shape[0]
+    if n < period or period < 2:
+        return np.nan, np.nan, np.nan
+    window = close[n - period:]
+    middle = np.mean(window)
+    std_dev = np.sqrt(np.sum((window - middle) ** 2) / (period - 1))
+    return middle + std_dev * std, middle, middle - std_dev * std
+
+
+@njit(cache=True, nogil=True)
+def _bbands(close, period, std):
+    """
+    整段布林通道 (上軌, 中軌, 下軌)：單次掃描以視窗版 Welford 同時維護平均與平方差和
+
+    移出 / 加入的順序與 Kahan 補償沿用 pandas rolling var 的做法，
+    視窗內含 NaN 時該點為 NaN，與 rolling(period).mean() / .std() 一致。
+    """
+    n = close.shape[0]
+    upper = np.full(n, np.nan)
+    middle = np.full(n, np.nan)
+    lower = np.full(n, np.nan)
+    if period < 2:
+        return upper, middle, lower
+    nobs = 0
+    mean = 0.0
+    m2 = 0.0
+    comp = 0.0
+    same_run = 0  # 連續相同價格筆數；整個視窗同價時標準差直接為 0
+    prev = np.nan
+    for i in range(n):
+        # 移出離開視窗的舊值
+        if i >= period:
+            y = close[i - period]
+            if y == y:
+                nobs -= 1
+                if nobs > 0:
+                    prev_mean = mean - comp
+                    v = y - comp
+                    t = v - mean
+                    comp = t + mean - v
+                    mean = mean - t / nobs
+                    m2 = m2 - (y - prev_mean) * (y - mean)
+                else:
+                    mean = 0.0
+                    m2 = 0.0
+        # 加入新值
+        x = close[i]
+        if x == x:
+            same_run = same_run + 1 if x == prev else 1
+            prev = x
+            nobs += 1
+            prev_mean = mean - comp
+            v = x - comp
+            t = v - mean
+            comp = t + mean - v
+            mean = mean + t / nobs
+            m2 = m2 + (x - prev_mean) * (x - mean)
+        if nobs == period:
+            if same_run >= nobs:
+                var = 0.0
+            else:
+                var = max(m2 / (nobs - 1), 0.0)
+            std_dev = np.sqrt(var)
+            middle[i] = mean
+            upper[i] = mean + std_dev * std
+            lower[i] = mean - std_dev * std
+    return upper, middle, lower
+
+
+if not HAS_NUMBA:
+    # 未安裝 numba：逐元素迴圈改以向量化實作，結果與上方核心相同
+
+    def _obv(close, volume):  # noqa: F811
+        direction = np.zeros(len(close), dtype=np.int64)
+        direction[1:] = (close[1:] > close[:-1]).astype(np.int64) - (close[1:] < close[:-1])
+        return np.cumsum(np.where(direction != 0, direction * volume, 0.0))
+
+    def _rsi_wilder(close, period):  # noqa: F811
+        delta = pd.Series(close).diff()
+        gain = delta.clip(lower=0).ewm(alpha=1 / period, adjust=False, min_periods=period).mean()
+        loss = (-delta).clip(lower=0).ewm(alpha=1 / period, adjust=False, min_periods=period).mean()
+        return (100 - (100 / (1 + gain / loss))).to_numpy()
@@ -2,8 +2,11 @@ from __future__ import annotations
 
 import datetime as dt
 
+import numpy as np
 import pandas as pd
 
+from .._jit import njit
+from .factors import compute_daily_features
 from .strategy import run_strategy_c
 
 
@@ -18,7 +21,21 @@ def backtest_strategy_c(
     max_positions: int = 5,
     hold_days: int = 2,
 ) -> pd.DataFrame:
-    dates = sorted([d for d in set(daily_price["trade_date"].tolist()) if start_date <= d <= end_date])
+    # 依交易日穩定排序一次：回測日曆直接取排序後的唯一值，
+    # 每天只傳「到當日為止」的前綴切片（iloc 視圖），不再逐日布林篩選並複製
+    by_date = daily_price.sort_values("trade_date", kind="mergesort")
+    date_col = by_date["trade_date"].to_numpy()
+    dates = [d for d in pd.unique(date_col) if start_date <= d <= end_date]
+    date_ends = np.searchsorted(date_col, dates, side="right")
+
+    # 價格查表只建一次：(交易日, 代號) -> 列索引，數值運算交給 _picks_pnl
+    row_index = _build_row_index(daily_price)
+    open_arr = pd.to_numeric(daily_price["open"], errors="coerce").to_numpy(dtype=np.float64)
+    close_arr = pd.to_numeric(daily_price["close"], errors="coerce").to_numpy(dtype=np.float64)
+
+    # 個股因子只往回看（均線、20 日量價），用整段歷史算一次，各日取當日列即與前綴切片的結果相同；
+    # 族群日資料的 sector_mtm_z 以整段歷史標準化，仍須逐日以前綴計算，避免用到未來資料
+    features = compute_daily_features(daily_price, float_dtype=cfg.get("features", {}).get("float_dtype"))
 
     equity = capital
     curve = []
@@ -37,9 +54,10 @@ def backtest_strategy_c(
         candidates, _, _, _ = run_strategy_c(
             trade_date=d,
             stock_meta=stock_meta,
-            daily_price=daily_price[daily_price["trade_date"] <= d].copy(),
+            daily_price=by_date.iloc[: date_ends[i]],
             risk_flags=None,
             cfg=bt_cfg,
+            features=features,
         )
 
         picks = candidates.head(max_positions)
@@ -48,27 +66,17 @@ def backtest_strategy_c(
             curve.append({"trade_date": next_d, "equity": equity, "num_trades": 0, "pnl": 0.0})
             continue
 
-        pnl_total = 0.0
-        trades = 0
-        for _, row in picks.iterrows():
-            sid = row["stock_id"]
+        exit_date = dates[min(i + 1 + hold_days, len(dates) - 1)]
+        sids = picks["stock_id"].tolist()
+        entry_rows = np.array([row_index.get((next_d, sid), -1) for sid in sids], dtype=np.int64)
+        exit_rows = np.array([row_index.get((exit_date, sid), -1) for sid in sids], dtype=np.int64)
+        if "shares" in picks.columns:
+            # 無法估算部位（例如缺前一日低點）時股數為 NaN，視為 0 股略過
+            shares = picks["shares"].fillna(0).to_numpy(dtype=np.int64)
+        else:
+            shares = np.zeros(len(picks), dtype=np.int64)
 
-            entry_px = _get_price(daily_price, next_d, sid, "open")
-            if entry_px is None:
-                continue
-
-            exit_date = dates[min(i + 1 + hold_days, len(dates) - 1)]
-            exit_px = _get_price(daily_price, exit_date, sid, "close")
-            if exit_px is None:
-                continue
-
-            shares = int(row.get("shares") or 0)
-            if shares <= 0:
-                continue
-
-            pnl = (exit_px - entry_px) * shares
-            pnl_total += pnl
-            trades += 1
+        pnl_total, trades = _picks_pnl(entry_rows, exit_rows, shares, open_arr, close_arr)
 
         equity = equity + pnl_total
         curve.append({"trade_date": next_d, "equity": equity, "num_trades": trades, "pnl": pnl_total})
@@ -76,11 +84,33 @@ def backtest_strategy_c(
     return pd.DataFrame(curve)
 
 
-def _get_price(daily_price: pd.DataFrame, trade_date: dt.date, stock_id: str, col: str) -> float | None:
-    r = daily_price[(daily_price["trade_date"] == trade_date) & (daily_price["stock_id"] == stock_id)]
-    if len(r) == 0:
-        return None
-    v = r.iloc[0][col]
-    if pd.isna(v):
-        return None
-    return float(v)
+def _build_row_index(daily_price: pd.DataFrame) -> dict:
+    # 同一 (交易日, 代號) 重複時保留第一筆，與逐列篩選取 iloc[0] 一致。
+    # 每天只查少數幾檔，用 dict 直接雜湊查找；改用 MultiIndex + .at / get_indexer
+    # 每次查詢反而要多建索引物件，實測並不更快。
+    index: dict = {}
+    keys = zip(daily_price["trade_date"].tolist(), daily_price["stock_id"].tolist())
+    for i, key in enumerate(keys):
+        index.setdefault(key, i)
+    return index
+
+
+# 明確簽章讓 numba 在載入模組時即編譯（搭配 cache=True 直接讀取快取）
+@njit("Tuple((f8, i8))(i8[:], i8[:], i8[:], f8[:], f8[:])", cache=True)
+def _picks_pnl(entry_rows, exit_rows, shares, open_arr, close_arr):
+    # 列索引為 -1（查無資料）、價格為 NaN 或股數 <= 0 的標的略過
+    pnl_total = 0.0
+    trades = 0
+    for k in range(entry_rows.shape[0]):
+        e = entry_rows[k]
+        x = exit_rows[k]
+        if e < 0 or x < 0 or shares[k] <= 0:
+            continue
+        entry_px = open_arr[e]
+        exit_px = close_arr[x]
+        if np.isnan(entry_px) or np.isnan(exit_px):
+            continue
+        pnl_total += (exit_px - entry_px) * shares[k]
+        trades += 1
+    return pnl_total, trades
+
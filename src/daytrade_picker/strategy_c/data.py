@@ -36,45 +36,49 @@ def make_demo_market_data(asof: dt.date, num_stocks: int, num_sectors: int, hist
 
     sector_momentum = {s: rng.normal(0.001, 0.02, size=len(dates)) for s in sector_ids}
 
-    rows: list[dict] = []
-    for t, d in enumerate(dates):
-        for i, sid in enumerate(stock_ids):
-            s = sector[i]
-            drift = sector_momentum[s][t]
-            noise = rng.normal(0, 0.025)
-            ret = drift + noise
-
-            if t == 0:
-                prev_close = base_prices[i]
-            else:
-                prev_close = rows[-num_stocks + i]["close"]
-
-            close = max(2.0, prev_close * (1.0 + ret))
-            open_ = close * (1.0 + rng.normal(0, 0.01))
-            high = max(open_, close) * (1.0 + abs(rng.normal(0, 0.01)))
-            low = min(open_, close) * (1.0 - abs(rng.normal(0, 0.01)))
-
-            volume = int(rng.uniform(2000, 80000) * (1.0 + abs(ret) * 10))
-            turnover = float(base_turnover[i] * (0.4 + abs(ret) * 8) * rng.uniform(0.7, 1.3))
-
-            pct_change = (close / prev_close - 1.0) * 100 if prev_close else 0.0
-
-            rows.append(
-                {
-                    "trade_date": d,
-                    "stock_id": sid,
-                    "open": float(open_),
-                    "high": float(high),
-                    "low": float(low),
-                    "close": float(close),
-                    "pct_change": float(pct_change),
-                    "volume": int(volume),
-                    "turnover": float(turnover),
-                    "is_limit_up": False,
-                    "is_limit_down": False,
-                }
-            )
-
-    daily_price = pd.DataFrame(rows)
+    # 以 (天數, 股票數) 的陣列一次產生所有亂數，避免逐格迴圈
+    shape = (len(dates), num_stocks)
+    drift = np.stack([sector_momentum[s] for s in sector], axis=1) if num_stocks else np.zeros(shape)
+    # 所有逐格亂數各以一次批次抽樣取得，再依需要縮放
+    z = rng.standard_normal((4, *shape))
+    u = rng.random((2, *shape))
+    ret = drift + 0.025 * z[0]
+
+    # 收盤價下限 2.0 需逐日套用，因此只在天數上迴圈，股票維度向量化
+    close = np.empty(shape)
+    prev = base_prices
+    for t in range(len(dates)):
+        prev = close[t] = np.maximum(2.0, prev * (1.0 + ret[t]))
+
+    # 前一日收盤即收盤陣列下移一列（首日為基準價），不必在迴圈內另行記錄
+    prev_close = np.empty(shape)
+    prev_close[:1] = base_prices
+    prev_close[1:] = close[:-1]
+
+    open_ = close * (1.0 + 0.01 * z[1])
+    high = np.maximum(open_, close) * (1.0 + 0.01 * np.abs(z[2]))
+    low = np.minimum(open_, close) * (1.0 - 0.01 * np.abs(z[3]))
+
+    volume = ((2000 + 78000 * u[0]) * (1.0 + np.abs(ret) * 10)).astype(np.int64)
+    turnover = base_turnover * (0.4 + np.abs(ret) * 8) * (0.7 + 0.6 * u[1])
+
+    pct_change = (close / prev_close - 1.0) * 100
+
+    n_rows = close.size
+    daily_price = pd.DataFrame(
+        {
+            "trade_date": np.repeat(dates, num_stocks),
+            "stock_id": np.tile(np.array(stock_ids, dtype=object), len(dates)),
+            "open": open_.ravel(),
+            "high": high.ravel(),
+            "low": low.ravel(),
+            "close": close.ravel(),
+            "pct_change": pct_change.ravel(),
+            "volume": volume.ravel(),
+            "turnover": turnover.ravel(),
+            "is_limit_up": np.zeros(n_rows, dtype=bool),
+            "is_limit_down": np.zeros(n_rows, dtype=bool),
+        }
+    )
 
     return MarketData(stock_meta=stock_meta, daily_price=daily_price)
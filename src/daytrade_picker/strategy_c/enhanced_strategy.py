@@ -2,13 +2,147 @@
 增強版 Strategy C - 加入籌碼面分析
 Enhanced Strategy with Chip Analysis (OBV, Institutional Investors)
 """
-from typing import Dict, List, Optional, Tuple
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Deque, Dict, List, Mapping, Optional, Tuple, Union
+import os
+import threading
 import pandas as pd
 import numpy as np
 import logging
 
+try:
+    from ._njit_kernels import HAS_NUMBA, _bb_last, _bbands, _obv, _rsi_wilder, _wilder_mean, _williams_r_last
+except ImportError:  # 以頂層模組載入時（main_strategy.py）
+    from _njit_kernels import HAS_NUMBA, _bb_last, _bbands, _obv, _rsi_wilder, _wilder_mean, _williams_r_last
+
+try:
+    import bottleneck as bn
+except ImportError:  # pragma: no cover - 選用加速
+    bn = None
+
 logger = logging.getLogger(__name__)
 
+# bottleneck 的固定視窗函式（串流演算法，每步 O(1)）；min_count 預設為整個視窗，與 rolling(period) 一致
+_BN_MOVE = {'max': 'move_max', 'min': 'move_min', 'mean': 'move_mean', 'std': 'move_std'}
+
+
+# 買進訊號門檻，以及 RSI（+10）與 OBV 底背離（+20）合計的最高加分
+_BUY_SCORE = 70
+_MAX_COSTLY_GAIN = 30
+
+
+
+class ReasonCode(IntEnum):
+    """評分理由代碼（bit 位置）；依此順序輸出理由文字"""
+    RSI_OVERSOLD = 0
+    RSI_OVERBOUGHT = 1
+    WILLIAMS_OVERSOLD = 2
+    WILLIAMS_OVERBOUGHT = 3
+    BB_LOWER = 4
+    BB_UPPER = 5
+    VOLUME_SURGE = 6
+    OBV_BULLISH = 7
+    OBV_DIVERGENCE_BULLISH = 8
+    OBV_BEARISH = 9
+    OBV_DIVERGENCE_BEARISH = 10
+    INST_BUY_CONSENSUS = 11
+    INST_SELL_CONSENSUS = 12
+    FOREIGN_BUY = 13
+    FOREIGN_SELL = 14
+    INSUFFICIENT_DATA = 15
+    COSTLY_SKIPPED = 16
+
+
+# 各理由的 (加減分, 文字樣板)；樣板以結果中的 technical 欄位填值，只在需要顯示時才格式化
+_REASONS = {
+    ReasonCode.RSI_OVERSOLD: (10, "✓ RSI 超賣 ({rsi:.1f})"),
+    ReasonCode.RSI_OVERBOUGHT: (-10, "✗ RSI 超買 ({rsi:.1f})"),
+    ReasonCode.WILLIAMS_OVERSOLD: (10, "✓ Williams %R 超賣 ({williams_r:.1f})"),
+    ReasonCode.WILLIAMS_OVERBOUGHT: (-10, "✗ Williams %R 超買 ({williams_r:.1f})"),
+    ReasonCode.BB_LOWER: (10, "✓ 價格接近布林下軌"),
+    ReasonCode.BB_UPPER: (-10, "✗ 價格接近布林上軌"),
+    ReasonCode.VOLUME_SURGE: (10, "✓ 成交量放大 ({volume_ratio:.1f}x)"),
+    ReasonCode.OBV_BULLISH: (15, "✓ OBV 價量齊揚"),
+    ReasonCode.OBV_DIVERGENCE_BULLISH: (20, "✓✓ OBV 底背離（強烈買訊）"),
+    ReasonCode.OBV_BEARISH: (-15, "✗ OBV 價量齊跌"),
+    ReasonCode.OBV_DIVERGENCE_BEARISH: (-20, "✗✗ OBV 頂背離（強烈賣訊）"),
+    ReasonCode.INST_BUY_CONSENSUS: (25, "✓✓ 三大法人一致買超"),
+    ReasonCode.INST_SELL_CONSENSUS: (-25, "✗✗ 三大法人一致賣超"),
+    ReasonCode.FOREIGN_BUY: (10, "✓ 外資買超"),
+    ReasonCode.FOREIGN_SELL: (-10, "✗ 外資賣超"),
+    ReasonCode.INSUFFICIENT_DATA: (0, "資料不足"),
+    ReasonCode.COSTLY_SKIPPED: (0, "略過 RSI / OBV（已無法達到買進門檻）"),
+}
+
+_OBV_REASONS = {
+    'bullish': ReasonCode.OBV_BULLISH,
+    'divergence_bullish': ReasonCode.OBV_DIVERGENCE_BULLISH,
+    'bearish': ReasonCode.OBV_BEARISH,
+    'divergence_bearish': ReasonCode.OBV_DIVERGENCE_BEARISH,
+}
+
+
+def _render_reasons(flags: int, technical: Dict) -> List[str]:
+    """依理由代碼的 bitmask 產生理由文字（依 ReasonCode 順序）"""
+    return [_REASONS[code][1].format(**technical) for code in ReasonCode if flags >> code & 1]
+
+
+# 指標快取的最大筆數（以 (代號, 最後一筆時間, 筆數, 最後收盤, 最後成交量) 為鍵）
+_INDICATOR_CACHE_SIZE = 4096
+
+
+@dataclass
+class _StreamState:
+    """update_stock 逐筆更新所需的狀態：各序列最近一段視窗與 Wilder 平滑的均值"""
+    close: Deque[float]
+    high: Deque[float]
+    low: Deque[float]
+    volume: Deque[float]
+    obv: Deque[float]
+    avg_gain: float
+    avg_loss: float
+    n: int
+
+
+def _wilder_step(avg: float, value: float, alpha: float) -> float:
+    """Wilder 平滑的單步更新，算式與 _wilder_mean（pandas ewm adjust=False）逐位元一致"""
+    if avg == value:
+        return avg
+    old_wt = 1.0 - alpha
+    return (old_wt * avg + alpha * value) / (old_wt + alpha)
+
+
+def _rsi_from_avg(avg_gain: float, avg_loss: float) -> float:
+    """由平均漲幅 / 跌幅計算 RSI，無跌幅時與 _rsi_wilder 相同處理"""
+    if avg_loss == 0.0:
+        return 100.0 if avg_gain > 0.0 else np.nan
+    return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+
+# 法人買賣超分類表，依 (買超 - 賣超) + 1 取值
+_INST_LABELS = ('賣超', '中性', '買超')
+
+
+def _rolling(values: pd.Series, period: int, how: str) -> pd.Series:
+    """固定視窗滾動統計（max / min / mean / std）；安裝 bottleneck 時改用其 move_* 函式"""
+    # bottleneck 要求視窗不大於資料長度；資料不足時交給 pandas（全為 NaN）
+    if bn is not None and period <= len(values):
+        func = getattr(bn, _BN_MOVE[how])
+        kwargs = {'ddof': 1} if how == 'std' else {}
+        out = func(values.to_numpy(dtype=np.float64), window=period, **kwargs)
+        return pd.Series(out, index=values.index)
+    return getattr(values.rolling(window=period), how)()
+
+
+def _tail(values: np.ndarray, period: int) -> np.ndarray:
+    """最後 period 筆；資料不足時回傳 NaN，與 rolling(period) 的最後一筆一致"""
+    if len(values) < period:
+        return np.array([np.nan])
+    return values[-period:]
+
 
 class ChipAnalyzer:
     """籌碼分析器"""
@@ -28,22 +162,20 @@ class ChipAnalyzer:
             logger.error("資料缺少 Close 或 Volume 欄位")
             return pd.Series([0] * len(df))
         
-        obv = [0]
-        for i in range(1, len(df)):
-            if df['Close'].iloc[i] > df['Close'].iloc[i-1]:
-                obv.append(obv[-1] + df['Volume'].iloc[i])
-            elif df['Close'].iloc[i] < df['Close'].iloc[i-1]:
-                obv.append(obv[-1] - df['Volume'].iloc[i])
-            else:
-                obv.append(obv[-1])
-        
+        obv = _obv(df['Close'].to_numpy(dtype=np.float64), df['Volume'].to_numpy(dtype=np.float64))
         return pd.Series(obv, index=df.index)
     
     @staticmethod
-    def obv_signal(df: pd.DataFrame, obv_ma_period: int = 20) -> str:
+    def obv_signal(df: pd.DataFrame, obv_ma_period: int = 20,
+                   obv: Optional[np.ndarray] = None) -> str:
         """
         OBV 訊號判斷
         
+        Args:
+            df: 股票資料 (需包含 Close, Volume)
+            obv_ma_period: OBV 均線週期
+            obv: 已算好的 OBV 陣列；提供時直接使用，不重算也不寫回 df
+        
         Returns:
             'bullish': 多頭訊號 (價漲量增)
             'bearish': 空頭訊號 (價跌量增)
@@ -51,23 +183,28 @@ class ChipAnalyzer:
             'divergence_bearish': 頂背離 (價漲但 OBV 下降)
             'neutral': 中性
         """
-        if len(df) < obv_ma_period + 5:
+        close = np.asarray(df['Close'])
+        if len(close) < obv_ma_period + 5:
             return 'neutral'
         
+        if obv is not None:
+            return ChipAnalyzer._classify_obv(close, np.asarray(obv), obv_ma_period)
+        
         # 計算 OBV
         df['OBV'] = ChipAnalyzer.calculate_obv(df)
-        df['OBV_MA'] = df['OBV'].rolling(window=obv_ma_period).mean()
-        
-        # 最近 5 天資料
-        recent = df.tail(5)
-        
-        # 價格趨勢
-        price_trend = recent['Close'].iloc[-1] > recent['Close'].iloc[0]
-        # OBV 趨勢
-        obv_trend = recent['OBV'].iloc[-1] > recent['OBV'].iloc[0]
+        df['OBV_MA'] = _rolling(df['OBV'], obv_ma_period, 'mean')
+
+        return ChipAnalyzer._classify_obv(close, df['OBV'].to_numpy(), obv_ma_period)
+
+    @staticmethod
+    def _classify_obv(close: np.ndarray, obv: np.ndarray, obv_ma_period: int) -> str:
+        """依收盤價與 OBV 陣列判斷 OBV 訊號（呼叫端需先確認資料長度足夠）"""
+        # 最近 5 天的價格趨勢與 OBV 趨勢
+        price_trend = close[-1] > close[-5]
+        obv_trend = obv[-1] > obv[-5]
         
         # OBV 是否在均線上
-        obv_above_ma = df['OBV'].iloc[-1] > df['OBV_MA'].iloc[-1]
+        obv_above_ma = obv[-1] > np.mean(_tail(obv, obv_ma_period))
         
         # 判斷背離
         if price_trend and not obv_trend:
@@ -104,12 +241,8 @@ class ChipAnalyzer:
             }
         """
         def classify(value: float) -> str:
-            if value > threshold:
-                return '買超'
-            elif value < -threshold:
-                return '賣超'
-            else:
-                return '中性'
+            # 賣超 / 中性 / 買超 對應 -1 / 0 / 1，平移後直接查表（NaN 兩個比較皆為 False，歸為中性）
+            return _INST_LABELS[int(value > threshold) - int(value < -threshold) + 1]
         
         foreign_status = classify(foreign)
         trust_status = classify(investment_trust)
@@ -136,6 +269,41 @@ class ChipAnalyzer:
             'total_net': foreign + investment_trust + dealer
         }
 
+    @staticmethod
+    def analyze_institutional_batch(foreign: np.ndarray, investment_trust: np.ndarray,
+                                    dealer: np.ndarray, threshold: float = 1_000) -> Dict[str, np.ndarray]:
+        """
+        analyze_institutional 的向量化版本，一次分析多檔
+
+        Args:
+            foreign / investment_trust / dealer: 各檔買賣超 (張)，等長陣列
+            threshold: 判斷門檻 (張)
+
+        Returns:
+            與 analyze_institutional 相同的鍵，值為逐檔對應的陣列
+        """
+        arrays = [np.asarray(a, dtype=np.float64) for a in (foreign, investment_trust, dealer)]
+        buys = [a > threshold for a in arrays]
+        sells = [a < -threshold for a in arrays]
+        labels = np.array(_INST_LABELS)
+        status = [labels[b.astype(np.int8) - s.astype(np.int8) + 1] for b, s in zip(buys, sells)]
+
+        buy_count = sum(b.astype(np.int8) for b in buys)
+        sell_count = sum(s.astype(np.int8) for s in sells)
+        consensus = np.select(
+            [buy_count >= 2, sell_count >= 2, (buy_count == 1) & (sell_count == 1)],
+            ['法人一致買超', '法人一致賣超', '分歧'],
+            default='中性',
+        )
+
+        return {
+            'foreign': status[0],
+            'investment_trust': status[1],
+            'dealer': status[2],
+            'consensus': consensus,
+            'total_net': arrays[0] + arrays[1] + arrays[2]
+        }
+
 
 class EnhancedStrategyC:
     """增強版策略 C"""
@@ -155,11 +323,17 @@ class EnhancedStrategyC:
             'obv_ma_period': 20,
             'volume_ma_period': 20,
             'volume_threshold': 1.5,  # 成交量需大於均量的倍數
-            'institutional_threshold': 1000  # 法人買賣超門檻 (張)
+            'institutional_threshold': 1000,  # 法人買賣超門檻 (張)
+            'indicator_dtype': 'float64'  # 價格指標的浮點精度，'float32' 可減半記憶體流量
         }
         """
         self.config = config or self._default_config()
         self.chip_analyzer = ChipAnalyzer()
+        # 指標結果快取（LRU）；scan_stocks 可能多執行緒呼叫，存取時加鎖
+        self._indicator_cache: "OrderedDict[tuple, Dict]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # update_stock 的逐檔串流狀態
+        self._streams: Dict[str, _StreamState] = {}
     
     def _default_config(self) -> Dict:
         return {
@@ -172,214 +346,460 @@ class EnhancedStrategyC:
             'obv_ma_period': 20,
             'volume_ma_period': 20,
             'volume_threshold': 1.5,
-            'institutional_threshold': 1000
+            'institutional_threshold': 1000,
+            'indicator_dtype': 'float64'
         }
     
     def calculate_rsi(self, df: pd.DataFrame, period: int = 14) -> pd.Series:
-        """計算 RSI"""
-        delta = df['Close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
-        return rsi
+        """計算 RSI（Wilder 平滑：alpha = 1 / period 的指數移動平均）"""
+        rsi = _rsi_wilder(df['Close'].to_numpy(dtype=np.float64), period)
+        return pd.Series(rsi, index=df.index)
     
     def calculate_williams_r(self, df: pd.DataFrame, period: int = 14) -> pd.Series:
         """計算 Williams %R"""
-        highest_high = df['High'].rolling(window=period).max()
-        lowest_low = df['Low'].rolling(window=period).min()
+        highest_high = _rolling(df['High'], period, 'max')
+        lowest_low = _rolling(df['Low'], period, 'min')
         williams_r = -100 * ((highest_high - df['Close']) / (highest_high - lowest_low))
         return williams_r
     
     def calculate_bollinger_bands(self, df: pd.DataFrame, period: int = 20, std: int = 2) -> Tuple[pd.Series, pd.Series, pd.Series]:
         """計算布林通道"""
-        ma = df['Close'].rolling(window=period).mean()
-        std_dev = df['Close'].rolling(window=period).std()
+        if HAS_NUMBA:
+            # 單次掃描同時得到平均與標準差
+            upper, middle, lower = _bbands(df['Close'].to_numpy(dtype=np.float64), period, float(std))
+            return (pd.Series(upper, index=df.index), pd.Series(middle, index=df.index),
+                    pd.Series(lower, index=df.index))
+        ma = _rolling(df['Close'], period, 'mean')
+        std_dev = _rolling(df['Close'], period, 'std')
         upper_band = ma + (std_dev * std)
         lower_band = ma - (std_dev * std)
         return upper_band, ma, lower_band
+
+    def _compute_indicators(self, data: Union[pd.DataFrame, Dict[str, np.ndarray]],
+                            skip_costly: bool = False) -> Dict:
+        """
+        一次取出 Close/High/Low/Volume 陣列，計算評分所需的各指標最後一筆數值
+        
+        評分只讀最後一筆，因此視窗型指標直接對最後一個視窗取值，
+        不在 df 上附加中間欄位。skip_costly=True 時只算最後視窗即可得到的
+        Williams %R、布林位置與量比，需掃過整段資料的 RSI 與 OBV 留待 _add_costly_indicators。
+        """
+        # 價格可依設定降為 float32；成交量固定 float64，避免 OBV 累加時失去精度
+        dtype = np.dtype(self.config.get('indicator_dtype', 'float64'))
+        close = np.asarray(data['Close'], dtype=dtype)
+        high = np.asarray(data['High'], dtype=dtype)
+        low = np.asarray(data['Low'], dtype=dtype)
+        volume = np.asarray(data['Volume'], dtype=np.float64)
+        last_close = close[-1]
+
+        williams = _williams_r_last(high, low, close, self.config['williams_period'])
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # 布林通道（20 日、2 倍標準差）
+            bb_upper, _, bb_lower = _bb_last(close, 20, 2.0)
+            bb_position = (last_close - bb_lower) / (bb_upper - bb_lower)
+
+            # 成交量
+            volume_ratio = volume[-1] / np.mean(_tail(volume, self.config['volume_ma_period']))
+
+        indicators = {
+            'williams_r': williams,
+            'bb_position': bb_position,
+            'volume_ratio': volume_ratio,
+        }
+        if not skip_costly:
+            self._add_costly_indicators(data, indicators)
+        return indicators
+
+    def _add_costly_indicators(self, data: Union[pd.DataFrame, Dict[str, np.ndarray]],
+                               indicators: Dict) -> None:
+        """補上需掃過整段資料的 RSI 與 OBV 訊號（float64 欄位轉陣列不複製）"""
+        close = np.asarray(data['Close'], dtype=np.dtype(self.config.get('indicator_dtype', 'float64')))
+        volume = np.asarray(data['Volume'], dtype=np.float64)
+        indicators['rsi'] = _rsi_wilder(close, self.config['rsi_period'])[-1]
+        # OBV 訊號（OBV 由陣列核心算好後傳入，obv_signal 不再重算）
+        indicators['obv_signal'] = self.chip_analyzer.obv_signal(
+            data, self.config['obv_ma_period'], obv=_obv(close, volume)
+        )
     
-    def analyze_stock(self, df: pd.DataFrame, 
-                     institutional_data: Optional[Dict] = None) -> Dict:
+    def analyze_stock(self, df: Union[pd.DataFrame, Dict[str, np.ndarray]],
+                     institutional_data: Optional[Dict] = None, only_buy: bool = False,
+                     symbol: Optional[str] = None) -> Dict:
         """
-        分析個股
+        分析個股（只讀取資料，不會在 df 上新增欄位）
         
         Args:
-            df: 股票資料 (需包含 Open, High, Low, Close, Volume)
+            df: 股票資料 (需包含 High, Low, Close, Volume)；
+                也可傳入預先取出的 {'High': 陣列, 'Low': ..., 'Close': ..., 'Volume': ...}
             institutional_data: 法人資料 {
                 'foreign': 外資買賣超(張),
                 'investment_trust': 投信買賣超(張),
                 'dealer': 自營商買賣超(張)
             }
+            only_buy: 只在意 BUY 訊號時設為 True；確定達不到買進門檻時提早回傳 HOLD，
+                不計算 RSI 與 OBV（此時 score 為未含這兩項的部分評分）
+            symbol: 股票代號；提供且資料帶有時間（Date 欄位或 DatetimeIndex）時，以
+                (代號, 最後一筆時間, 筆數, 最後收盤, 最後成交量) 快取指標，資料未變動的重複呼叫不重算
         
         Returns:
             {
                 'signal': 'BUY' | 'SELL' | 'HOLD',
                 'score': 0-100,
                 'reasons': [原因列表],
+                'reason_flags': 理由代碼 (ReasonCode) 的 bitmask,
                 'technical': {...},
                 'chip': {...}
             }
         """
-        if len(df) < 60:
-            return {
-                'signal': 'HOLD',
-                'score': 0,
-                'reasons': ['資料不足'],
-                'technical': {},
-                'chip': {}
-            }
+        return self._evaluate(df, self._institutional(institutional_data), only_buy, symbol=symbol)
+    
+    def _institutional(self, institutional_data: Optional[Dict]) -> Optional[Dict]:
+        """法人買賣超分析；無資料時為 None"""
+        if not institutional_data:
+            return None
+        return self.chip_analyzer.analyze_institutional(
+            institutional_data.get('foreign', 0),
+            institutional_data.get('investment_trust', 0),
+            institutional_data.get('dealer', 0),
+            self.config['institutional_threshold']
+        )
+    
+    def _evaluate(self, df: Union[pd.DataFrame, Dict[str, np.ndarray]],
+                  institutional_analysis: Optional[Dict], only_buy: bool = False,
+                  render: bool = True, symbol: Optional[str] = None) -> Dict:
+        """
+        依已算好的法人分析結果計算指標並評分（analyze_stock / scan_stocks 共用）
         
-        # === 技術面分析 ===
+        評分理由以 ReasonCode 的 bitmask 記在 'reason_flags'；render=False 時不產生
+        'reasons' 文字，留給呼叫端對要顯示的結果再呼叫 render_reasons。
+        only_buy=True 時先以便宜的指標與法人結果評分，若加上 RSI 與 OBV 的最高加分
+        仍到不了買進門檻，直接回傳 HOLD，不再計算這兩項。
+        有 symbol 時先查指標快取，命中則跳過所有指標計算（法人部分仍依本次輸入評分）。
+        """
+        if len(df['Close']) < 60:
+            return self._result('HOLD', 0, 1 << ReasonCode.INSUFFICIENT_DATA, {}, {}, render)
+        
+        key = self._cache_key(symbol, df) if symbol is not None else None
+        indicators = self._cache_get(key)
+        if indicators is not None:
+            return self._finish(indicators, institutional_analysis, render)
+        
+        # === 技術面與 OBV 籌碼指標 ===
+        indicators = self._compute_indicators(df, skip_costly=only_buy)
+        if only_buy:
+            score, flags = self._score_flags(indicators, institutional_analysis)
+            if score + _MAX_COSTLY_GAIN < _BUY_SCORE:
+                technical = {
+                    'rsi': np.nan,
+                    'williams_r': indicators['williams_r'],
+                    'bb_position': indicators['bb_position'],
+                    'volume_ratio': indicators['volume_ratio']
+                }
+                chip = {'obv_signal': None, 'institutional': institutional_analysis}
+                flags |= 1 << ReasonCode.COSTLY_SKIPPED
+                return self._result('HOLD', score, flags, technical, chip, render)
+            self._add_costly_indicators(df, indicators)
+        
+        self._cache_put(key, indicators)
+        return self._finish(indicators, institutional_analysis, render)
+    
+    def _finish(self, indicators: Dict, institutional_analysis: Optional[Dict], render: bool) -> Dict:
+        """依完整指標評分並組成結果"""
+        # === 綜合評分 ===
         
-        # RSI
-        df['RSI'] = self.calculate_rsi(df, self.config['rsi_period'])
-        rsi = df['RSI'].iloc[-1]
+        score, flags = self._score_flags(indicators, institutional_analysis)
         
-        # Williams %R
-        df['Williams_R'] = self.calculate_williams_r(df, self.config['williams_period'])
-        williams = df['Williams_R'].iloc[-1]
+        # === 決策 ===
         
-        # 布林通道
-        df['BB_Upper'], df['BB_Middle'], df['BB_Lower'] = self.calculate_bollinger_bands(df)
-        close = df['Close'].iloc[-1]
-        bb_position = (close - df['BB_Lower'].iloc[-1]) / (df['BB_Upper'].iloc[-1] - df['BB_Lower'].iloc[-1])
+        if score >= _BUY_SCORE:
+            signal = 'BUY'
+        elif score <= 30:
+            signal = 'SELL'
+        else:
+            signal = 'HOLD'
         
-        # 成交量
-        df['Volume_MA'] = df['Volume'].rolling(window=self.config['volume_ma_period']).mean()
-        volume_ratio = df['Volume'].iloc[-1] / df['Volume_MA'].iloc[-1]
+        technical = {
+            'rsi': indicators['rsi'],
+            'williams_r': indicators['williams_r'],
+            'bb_position': indicators['bb_position'],
+            'volume_ratio': indicators['volume_ratio']
+        }
+        chip = {
+            'obv_signal': indicators['obv_signal'],
+            'institutional': institutional_analysis
+        }
+        return self._result(signal, score, flags, technical, chip, render)
+    
+    @staticmethod
+    def _cache_key(symbol: str, data: Union[pd.DataFrame, Dict[str, np.ndarray]]) -> Optional[tuple]:
+        """
+        快取鍵：最後一筆的時間、資料筆數與最後一根 K 棒的收盤 / 成交量（盤中更新同一根 K 棒時也會失效）
         
-        # === 籌碼面分析 ===
+        資料沒有時間（無 Date 欄位且索引不是 DatetimeIndex）時回傳 None 不快取：
+        單靠筆數與最後一根 K 棒無法察覺較早 K 棒被修改。
+        """
+        if isinstance(data, pd.DataFrame):
+            if 'Date' in data.columns:
+                last = data['Date'].iloc[-1]
+            elif isinstance(data.index, pd.DatetimeIndex):
+                last = data.index[-1]
+            else:
+                return None
+        else:
+            dates = data.get('Date')
+            if dates is None:
+                return None
+            last = dates[-1]
+        return (symbol, last, len(data['Close']),
+                float(np.asarray(data['Close'])[-1]), float(np.asarray(data['Volume'])[-1]))
+    
+    def _cache_get(self, key: Optional[tuple]) -> Optional[Dict]:
+        if key is None:
+            return None
+        with self._cache_lock:
+            indicators = self._indicator_cache.get(key)
+            if indicators is not None:
+                self._indicator_cache.move_to_end(key)
+            return indicators
+    
+    def _cache_put(self, key: Optional[tuple], indicators: Dict) -> None:
+        if key is None:
+            return
+        with self._cache_lock:
+            self._indicator_cache[key] = indicators
+            self._indicator_cache.move_to_end(key)
+            if len(self._indicator_cache) > _INDICATOR_CACHE_SIZE:
+                self._indicator_cache.popitem(last=False)
+    
+    def init_stream(self, symbol: str, df: pd.DataFrame,
+                    institutional_data: Optional[Dict] = None) -> Dict:
+        """
+        以完整歷史資料建立 symbol 的串流狀態，之後可用 update_stock 逐筆更新
         
-        # OBV 訊號
-        obv_signal = self.chip_analyzer.obv_signal(df, self.config['obv_ma_period'])
+        Args:
+            df: 股票資料 (需包含 High, Low, Close, Volume，且價量皆為有效數值)
+            institutional_data: 同 analyze_stock
         
-        # 法人買賣超
-        institutional_analysis = None
-        if institutional_data:
-            institutional_analysis = self.chip_analyzer.analyze_institutional(
-                institutional_data.get('foreign', 0),
-                institutional_data.get('investment_trust', 0),
-                institutional_data.get('dealer', 0),
-                self.config['institutional_threshold']
-            )
+        Returns:
+            以整段資料分析的結果（同 analyze_stock）
+        """
+        close = np.asarray(df['Close'], dtype=np.float64)
+        volume = np.asarray(df['Volume'], dtype=np.float64)
+        period = self.config['rsi_period']
+        if len(close) <= period:
+            raise ValueError(f"建立串流狀態至少需要 {period + 1} 筆資料")
+        window = max(self.config['williams_period'], self.config['volume_ma_period'],
+                     self.config['obv_ma_period'], 20, 5)
+        
+        gain = np.full(len(close), np.nan)
+        loss = np.full(len(close), np.nan)
+        delta = np.diff(close)
+        gain[1:] = np.maximum(delta, 0.0)
+        loss[1:] = np.maximum(-delta, 0.0)
+        
+        def tail(values) -> Deque[float]:
+            return deque(np.asarray(values, dtype=np.float64)[-window:].tolist(), maxlen=window)
+        
+        self._streams[symbol] = _StreamState(
+            close=tail(close),
+            high=tail(df['High']),
+            low=tail(df['Low']),
+            volume=tail(volume),
+            obv=tail(_obv(close, volume)),
+            avg_gain=float(_wilder_mean(gain, period)[-1]),
+            avg_loss=float(_wilder_mean(loss, period)[-1]),
+            n=len(close),
+        )
+        return self.analyze_stock(df, institutional_data)
+    
+    def update_stock(self, symbol: str, new_row: Mapping[str, float],
+                     institutional_data: Optional[Dict] = None) -> Dict:
+        """
+        附加一根新 K 棒並回傳分析結果，不重算整段歷史
         
-        # === 綜合評分 ===
+        OBV 與 RSI 的 Wilder 平滑以單步遞推更新，其餘指標只讀固定長度的最近視窗，
+        每次更新的成本與歷史長度無關。結果與對附加後的完整資料呼叫 analyze_stock 相同。
         
-        score = 50  # 基準分
-        reasons = []
+        Args:
+            symbol: 已以 init_stream 建立狀態的股票代號
+            new_row: 新 K 棒 {'High': ..., 'Low': ..., 'Close': ..., 'Volume': ...}
+            institutional_data: 同 analyze_stock
+        """
+        state = self._streams.get(symbol)
+        if state is None:
+            raise ValueError(f"{symbol} 尚未建立串流狀態，請先呼叫 init_stream")
+        
+        close = float(new_row['Close'])
+        volume = float(new_row['Volume'])
+        delta = close - state.close[-1]
+        alpha = 1.0 / self.config['rsi_period']
+        state.avg_gain = _wilder_step(state.avg_gain, delta if delta > 0 else 0.0, alpha)
+        state.avg_loss = _wilder_step(state.avg_loss, -delta if delta < 0 else 0.0, alpha)
+        if delta > 0:
+            state.obv.append(state.obv[-1] + volume)
+        elif delta < 0:
+            state.obv.append(state.obv[-1] - volume)
+        else:
+            state.obv.append(state.obv[-1])
+        state.close.append(close)
+        state.high.append(float(new_row['High']))
+        state.low.append(float(new_row['Low']))
+        state.volume.append(volume)
+        state.n += 1
+        
+        institutional_analysis = self._institutional(institutional_data)
+        if state.n < 60:
+            return self._result('HOLD', 0, 1 << ReasonCode.INSUFFICIENT_DATA, {}, {}, True)
+        
+        data = {'Close': np.array(state.close), 'High': np.array(state.high),
+                'Low': np.array(state.low), 'Volume': np.array(state.volume)}
+        indicators = self._compute_indicators(data, skip_costly=True)
+        indicators['rsi'] = np.float64(_rsi_from_avg(state.avg_gain, state.avg_loss))
+        obv_period = self.config['obv_ma_period']
+        if state.n < obv_period + 5:
+            indicators['obv_signal'] = 'neutral'
+        else:
+            indicators['obv_signal'] = ChipAnalyzer._classify_obv(data['Close'], np.array(state.obv), obv_period)
+        return self._finish(indicators, institutional_analysis, True)
+    
+    @staticmethod
+    def _result(signal: str, score: int, flags: int, technical: Dict, chip: Dict, render: bool) -> Dict:
+        result = {
+            'signal': signal,
+            'score': min(100, max(0, score)),
+            'reason_flags': flags,
+            'technical': technical,
+            'chip': chip
+        }
+        if render:
+            result['reasons'] = _render_reasons(flags, technical)
+        return result
+    
+    def render_reasons(self, analysis: Dict) -> List[str]:
+        """取得分析結果的理由文字；scan_stocks(render_reasons=False) 的結果在此才格式化"""
+        if 'reasons' not in analysis:
+            analysis['reasons'] = _render_reasons(analysis['reason_flags'], analysis['technical'])
+        return analysis['reasons']
+    
+    def _score_flags(self, indicators: Dict, institutional_analysis: Optional[Dict]) -> Tuple[int, int]:
+        """
+        逐項評分，回傳 (總分, 理由 bitmask)；總分含基準分 50
         
-        # 技術面評分 (40 分)
-        if rsi < self.config['rsi_oversold']:
-            score += 10
-            reasons.append(f"✓ RSI 超賣 ({rsi:.1f})")
-        elif rsi > self.config['rsi_overbought']:
-            score -= 10
-            reasons.append(f"✗ RSI 超買 ({rsi:.1f})")
+        indicators 尚未含 RSI / OBV（only_buy 的預先評分）時略過這兩項。
+        """
+        codes = []
         
+        # 技術面評分 (40 分)
+        if 'rsi' in indicators:
+            rsi = indicators['rsi']
+            if rsi < self.config['rsi_oversold']:
+                codes.append(ReasonCode.RSI_OVERSOLD)
+            elif rsi > self.config['rsi_overbought']:
+                codes.append(ReasonCode.RSI_OVERBOUGHT)
+        
+        williams = indicators['williams_r']
         if williams < self.config['williams_oversold']:
-            score += 10
-            reasons.append(f"✓ Williams %R 超賣 ({williams:.1f})")
+            codes.append(ReasonCode.WILLIAMS_OVERSOLD)
         elif williams > self.config['williams_overbought']:
-            score -= 10
-            reasons.append(f"✗ Williams %R 超買 ({williams:.1f})")
+            codes.append(ReasonCode.WILLIAMS_OVERBOUGHT)
         
+        bb_position = indicators['bb_position']
         if bb_position < 0.2:
-            score += 10
-            reasons.append(f"✓ 價格接近布林下軌")
+            codes.append(ReasonCode.BB_LOWER)
         elif bb_position > 0.8:
-            score -= 10
-            reasons.append(f"✗ 價格接近布林上軌")
+            codes.append(ReasonCode.BB_UPPER)
         
-        if volume_ratio > self.config['volume_threshold']:
-            score += 10
-            reasons.append(f"✓ 成交量放大 ({volume_ratio:.1f}x)")
+        if indicators['volume_ratio'] > self.config['volume_threshold']:
+            codes.append(ReasonCode.VOLUME_SURGE)
         
         # 籌碼面評分 (40 分)
-        if obv_signal == 'bullish':
-            score += 15
-            reasons.append("✓ OBV 價量齊揚")
-        elif obv_signal == 'divergence_bullish':
-            score += 20
-            reasons.append("✓✓ OBV 底背離（強烈買訊）")
-        elif obv_signal == 'bearish':
-            score -= 15
-            reasons.append("✗ OBV 價量齊跌")
-        elif obv_signal == 'divergence_bearish':
-            score -= 20
-            reasons.append("✗✗ OBV 頂背離（強烈賣訊）")
+        obv_code = _OBV_REASONS.get(indicators.get('obv_signal'))
+        if obv_code is not None:
+            codes.append(obv_code)
         
         if institutional_analysis:
             if institutional_analysis['consensus'] == '法人一致買超':
-                score += 25
-                reasons.append(f"✓✓ 三大法人一致買超")
+                codes.append(ReasonCode.INST_BUY_CONSENSUS)
             elif institutional_analysis['consensus'] == '法人一致賣超':
-                score -= 25
-                reasons.append(f"✗✗ 三大法人一致賣超")
+                codes.append(ReasonCode.INST_SELL_CONSENSUS)
             elif institutional_analysis['foreign'] == '買超':
-                score += 10
-                reasons.append(f"✓ 外資買超")
+                codes.append(ReasonCode.FOREIGN_BUY)
             elif institutional_analysis['foreign'] == '賣超':
-                score -= 10
-                reasons.append(f"✗ 外資賣超")
-        
-        # === 決策 ===
-        
-        if score >= 70:
-            signal = 'BUY'
-        elif score <= 30:
-            signal = 'SELL'
-        else:
-            signal = 'HOLD'
+                codes.append(ReasonCode.FOREIGN_SELL)
         
-        return {
-            'signal': signal,
-            'score': min(100, max(0, score)),
-            'reasons': reasons,
-            'technical': {
-                'rsi': rsi,
-                'williams_r': williams,
-                'bb_position': bb_position,
-                'volume_ratio': volume_ratio
-            },
-            'chip': {
-                'obv_signal': obv_signal,
-                'institutional': institutional_analysis
-            }
-        }
+        score = 50  # 基準分
+        flags = 0
+        for code in codes:
+            score += _REASONS[code][0]
+            flags |= 1 << code
+        return score, flags
     
     def scan_stocks(self, stocks_data: Dict[str, pd.DataFrame],
-                   institutional_data: Optional[Dict[str, Dict]] = None) -> List[Dict]:
+                   institutional_data: Optional[Dict[str, Dict]] = None,
+                   only_buy: bool = False, render: bool = True) -> List[Dict]:
         """
         掃描多檔股票
         
         Args:
             stocks_data: {股票代號: DataFrame}
             institutional_data: {股票代號: {法人資料}}
+            only_buy: 只在意 BUY 訊號時設為 True，確定達不到門檻的股票略過 RSI / OBV 計算
+            render: False 時結果不含 'reasons' 文字（只有 'reason_flags'），
+                由呼叫端對要顯示的結果呼叫 render_reasons
         
         Returns:
             排序後的股票列表，依評分由高到低
         """
-        results = []
-        
-        for symbol, df in stocks_data.items():
-            inst_data = institutional_data.get(symbol) if institutional_data else None
-            analysis = self.analyze_stock(df, inst_data)
-            
-            results.append({
-                'symbol': symbol,
-                'signal': analysis['signal'],
-                'score': analysis['score'],
-                'reasons': analysis['reasons'],
-                'technical': analysis['technical'],
-                'chip': analysis['chip']
-            })
-        
-        # 依評分排序
+        symbols = list(stocks_data)
+        frames = [stocks_data[symbol] for symbol in symbols]
+        inst_list = self._institutional_for(symbols, institutional_data)
+        only_buy_list = [only_buy] * len(symbols)
+        
+        if HAS_NUMBA and len(symbols) > 1:
+            # 指標核心以 nogil 編譯，各檔可在執行緒間平行計算；
+            # 未安裝 numba 時多執行緒只會爭用 GIL，維持逐檔計算
+            with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+                results = list(executor.map(self._analyze_one, symbols, frames, inst_list, only_buy_list))
+        else:
+            results = [self._analyze_one(*args) for args in zip(symbols, frames, inst_list, only_buy_list)]
+        
+        # 依評分排序（穩定排序，同分維持輸入順序）
         results.sort(key=lambda x: x['score'], reverse=True)
         
+        if render:
+            for result in results:
+                self.render_reasons(result)
+        
         return results
     
+    def _institutional_for(self, symbols: List[str],
+                           institutional_data: Optional[Dict[str, Dict]]) -> List[Optional[Dict]]:
+        """以 analyze_institutional_batch 一次分析所有有法人資料的股票，回傳逐檔結果（無資料為 None）"""
+        out: List[Optional[Dict]] = [None] * len(symbols)
+        if not institutional_data:
+            return out
+        idx = [i for i, symbol in enumerate(symbols) if institutional_data.get(symbol)]
+        if not idx:
+            return out
+        rows = [institutional_data[symbols[i]] for i in idx]
+        batch = self.chip_analyzer.analyze_institutional_batch(
+            [r.get('foreign', 0) for r in rows],
+            [r.get('investment_trust', 0) for r in rows],
+            [r.get('dealer', 0) for r in rows],
+            self.config['institutional_threshold']
+        )
+        columns = {key: values.tolist() for key, values in batch.items()}
+        for k, i in enumerate(idx):
+            out[i] = {key: values[k] for key, values in columns.items()}
+        return out
+    
+    def _analyze_one(self, symbol: str, df: pd.DataFrame, inst_analysis: Optional[Dict],
+                     only_buy: bool = False) -> Dict:
+        """分析單檔並整理成 scan_stocks 的結果格式"""
+        # 理由文字在排序後才依需要產生
+        analysis = self._evaluate(df, inst_analysis, only_buy, render=False, symbol=symbol)
+        return {'symbol': symbol, **analysis}
+    
     def print_analysis(self, symbol: str, analysis: Dict):
         """印出分析結果"""
         print("=" * 60)
@@ -387,7 +807,7 @@ class EnhancedStrategyC:
         print("=" * 60)
         print(f"訊號: {analysis['signal']} (評分: {analysis['score']}/100)")
         print(f"\n理由:")
-        for reason in analysis['reasons']:
+        for reason in self.render_reasons(analysis):
             print(f"  {reason}")
         
         print(f"\n技術指標:")
@@ -1,5 +1,11 @@
+import numpy as np
 import pandas as pd
 
+try:
+    import bottleneck as bn
+except ImportError:  # pragma: no cover - 選用加速
+    bn = None
+
 
 def zscore(s: pd.Series) -> pd.Series:
     m = s.mean(skipna=True)
@@ -9,19 +15,55 @@ def zscore(s: pd.Series) -> pd.Series:
     return (s - m) / sd
 
 
-def compute_daily_features(daily_price: pd.DataFrame) -> pd.DataFrame:
+def group_zscore(s: pd.Series, keys: pd.Series) -> pd.Series:
+    """
+    依 keys 分組的 zscore，與 groupby(keys)[...].transform(zscore) 相同
+
+    組內平均與標準差以 Cython 的 transform("mean") / transform("std") 一次算好，
+    不逐組呼叫 Python；標準差為 0 或無法計算（例如只有一筆）的組整組為 0。
+    """
+    g = s.groupby(keys, observed=True)
+    m = g.transform("mean")
+    sd = g.transform("std")
+    z = (s - m) / sd
+    # keys 為 NaN 的列不屬於任何組，維持 NaN
+    degenerate = (sd == 0) | (sd.isna() & keys.notna())
+    return z.mask(degenerate, 0.0)
+
+
+def compute_daily_features(daily_price: pd.DataFrame, float_dtype: str | None = None) -> pd.DataFrame:
     df = daily_price.copy()
     df = df.sort_values(["stock_id", "trade_date"]).reset_index(drop=True)
 
-    g = df.groupby("stock_id", sort=False)
+    if float_dtype is not None:
+        # 例如 float32：滾動計算讀寫的位元組減半，精度對百分比門檻已足夠
+        px_cols = ["close", "high", "low", "volume"]
+        df[px_cols] = df[px_cols].astype(float_dtype)
+
+    # 已依 (stock_id, trade_date) 排序，同檔資料連續：整欄做一次滾動計算，
+    # 再把各檔前 w-1 筆（視窗跨到前一檔）設為 NaN，不必建立 groupby 物件
+    ids = df["stock_id"].to_numpy()
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]]) if len(ids) else np.array([], dtype=np.int64)
+    pos_in_group = np.arange(len(ids)) - np.repeat(starts, np.diff(np.r_[starts, len(ids)]))
+
+    def _rolling(col: str, w: int, how: str) -> pd.Series:
+        values = df[col].to_numpy()
+        if values.dtype.kind != "f":
+            values = values.astype(np.float64)
+        if bn is not None and w <= len(values):
+            r = getattr(bn, f"move_{how}")(values, window=w)
+        else:
+            r = getattr(pd.Series(values).rolling(w, min_periods=w), how)().to_numpy()
+        r[pos_in_group < w - 1] = np.nan
+        return pd.Series(r, index=df.index)
 
     for w in [5, 10, 20]:
-        df[f"ma_{w}"] = g["close"].transform(lambda x: x.rolling(w, min_periods=w).mean())
+        df[f"ma_{w}"] = _rolling("close", w, "mean")
 
-    df["vol_20d_avg"] = g["volume"].transform(lambda x: x.rolling(20, min_periods=20).mean())
+    df["vol_20d_avg"] = _rolling("volume", 20, "mean")
     df["vol_ratio_20d"] = df["volume"] / df["vol_20d_avg"]
 
-    df["high_20d"] = g["high"].transform(lambda x: x.rolling(20, min_periods=20).max())
+    df["high_20d"] = _rolling("high", 20, "max")
     df["is_20d_high"] = df["close"] >= df["high_20d"]
     df["distance_to_20d_high"] = (df["high_20d"] - df["close"]) / df["high_20d"]
 
@@ -47,18 +89,23 @@ def compute_daily_features(daily_price: pd.DataFrame) -> pd.DataFrame:
 def compute_sector_daily(stock_meta: pd.DataFrame, daily_price: pd.DataFrame, sector_col: str, mtm_lookback: int) -> pd.DataFrame:
     base = daily_price.merge(stock_meta[["stock_id", sector_col]], on="stock_id", how="left")
 
+    # 先算好布林旗標，groupby 只用內建 mean / sum（Cython），不逐群組呼叫 lambda
+    base["_up"] = (base["pct_change"] > 0).astype("int8")
+    base["_up3"] = (base["pct_change"] >= 3).astype("int64")
+
     grp = base.groupby(["trade_date", sector_col], as_index=False)
     sector = grp.agg(
         avg_pct_change=("pct_change", "mean"),
         median_pct_change=("pct_change", "median"),
-        up_ratio=("pct_change", lambda x: (x > 0).mean()),
-        num_up_3=("pct_change", lambda x: (x >= 3).sum()),
+        up_ratio=("_up", "mean"),
+        num_up_3=("_up3", "sum"),
     )
 
     sector = sector.sort_values([sector_col, "trade_date"]).reset_index(drop=True)
     g = sector.groupby(sector_col, sort=False)
 
-    sector["sector_mtm_5d"] = g["avg_pct_change"].transform(lambda x: x.rolling(mtm_lookback, min_periods=mtm_lookback).mean())
-    sector["sector_mtm_z"] = g["sector_mtm_5d"].transform(zscore)
+    mtm = g["avg_pct_change"].rolling(mtm_lookback, min_periods=mtm_lookback).mean()
+    sector["sector_mtm_5d"] = mtm.reset_index(level=0, drop=True)
+    sector["sector_mtm_z"] = group_zscore(sector["sector_mtm_5d"], sector[sector_col])
 
     return sector.rename(columns={sector_col: "sector_id"})
@@ -6,6 +6,38 @@ import yaml
 
 from .strategy import run_strategy_c
 
+try:
+    import pyarrow  # noqa: F401
+
+    _CSV_ENGINE = "pyarrow"
+except ImportError:
+    _CSV_ENGINE = "c"
+
+try:
+    import xlsxwriter  # noqa: F401
+
+    # 不開 constant_memory：to_excel 逐欄寫出，該模式會丟棄非依列順序寫入的儲存格
+    _XLSX_ENGINE = "xlsxwriter"
+except ImportError:
+    _XLSX_ENGINE = "openpyxl"
+
+# strategy_c 需要的日線欄位（依此順序輸出）
+_PRICE_COLS = [
+    "trade_date",
+    "stock_id",
+    "open",
+    "high",
+    "low",
+    "close",
+    "pct_change",
+    "volume",
+    "turnover",
+    "is_limit_up",
+    "is_limit_down",
+]
+# 讀檔時實際解析的欄位：日線欄位、舊檔的 date 欄，以及 stock_meta 用的 name / market
+_READ_COLS = frozenset(_PRICE_COLS) | {"date", "name", "market"}
+
 
 def _parse_date_from_market_filename(p: Path) -> dt.date | None:
     name = p.name
@@ -18,17 +50,29 @@ def _parse_date_from_market_filename(p: Path) -> dt.date | None:
         return None
 
 
+def _read_market_csv(path: Path) -> pd.DataFrame:
+    # 只解析用得到的欄位；安裝 pyarrow 時改用其多執行緒 CSV 解析器
+    if _CSV_ENGINE == "c":
+        return pd.read_csv(path, encoding="utf-8-sig", usecols=lambda c: c in _READ_COLS)
+    # pyarrow 引擎不接受 callable usecols，且欄位不存在會報錯，先讀表頭取交集
+    header = pd.read_csv(path, encoding="utf-8-sig", nrows=0).columns
+    usecols = [c for c in header if c in _READ_COLS]
+    return pd.read_csv(path, encoding="utf-8-sig", engine=_CSV_ENGINE, usecols=usecols)
+
+
 def load_market_history(market_dir: Path, end_date: dt.date, history_days: int) -> tuple[pd.DataFrame, pd.DataFrame]:
-    files = list(market_dir.glob("market_*.csv"))
+    # 檔名日期為 YYYY-MM-DD，字典序即日期序：先以字串比較排除 end_date 之後的檔案，
+    # 只對留下的檔名做 strptime，且依檔名排序後不必再依日期排序
+    end_str = end_date.isoformat()
     dated = []
-    for f in files:
+    for f in sorted(market_dir.glob("market_*.csv")):
+        if f.name[len("market_") : -len(".csv")] > end_str:
+            continue
         d = _parse_date_from_market_filename(f)
         if d is None:
             continue
-        if d <= end_date:
-            dated.append((d, f))
+        dated.append((d, f))
 
-    dated.sort(key=lambda x: x[0])
     dated = dated[-history_days:]
 
     if len(dated) == 0:
@@ -36,33 +80,20 @@ def load_market_history(market_dir: Path, end_date: dt.date, history_days: int)
 
     frames = []
     for d, f in dated:
-        df = pd.read_csv(f, encoding="utf-8-sig")
+        df = _read_market_csv(f)
         if "date" in df.columns:
             df = df.rename(columns={"date": "trade_date"})
         df["trade_date"] = pd.to_datetime(df["trade_date"]).dt.date
         frames.append(df)
 
-    daily_price = pd.concat(frames, ignore_index=True)
+    daily_price = pd.concat(frames, ignore_index=True, copy=False)
 
     # Normalize schema to strategy_c expectations
-    keep = {
-        "trade_date": "trade_date",
-        "stock_id": "stock_id",
-        "open": "open",
-        "high": "high",
-        "low": "low",
-        "close": "close",
-        "pct_change": "pct_change",
-        "volume": "volume",
-        "turnover": "turnover",
-        "is_limit_up": "is_limit_up",
-        "is_limit_down": "is_limit_down",
-    }
-    for k in list(keep.keys()):
+    for k in _PRICE_COLS:
         if k not in daily_price.columns:
             daily_price[k] = pd.NA
 
-    daily_price = daily_price[list(keep.keys())].copy()
+    daily_price = daily_price[_PRICE_COLS].copy()
 
     stock_meta = frames[-1][["stock_id", "name", "market"]].copy() if all(c in frames[-1].columns for c in ["stock_id", "name", "market"]) else pd.DataFrame(columns=["stock_id", "stock_name", "market"])
     stock_meta = stock_meta.rename(columns={"name": "stock_name"})
@@ -112,10 +143,17 @@ def run_strategy_c_real(
     csv_path = out_dir / f"strategyC_candidates_{trade_date.isoformat()}.csv"
     xlsx_path = out_dir / f"strategyC_candidates_{trade_date.isoformat()}.xlsx"
 
-    enriched = candidates.merge(stock_meta[["stock_id", "stock_name", "market", "themes"]], on="stock_id", how="left")
+    # stock_meta 以 stock_id 為索引後逐欄 map，省去整個 merge 的對齊與複製
+    meta = stock_meta.drop_duplicates(subset=["stock_id"]).set_index("stock_id")
+    sid = candidates["stock_id"]
+    enriched = candidates.assign(
+        stock_name=sid.map(meta["stock_name"]),
+        market=sid.map(meta["market"]),
+        themes=sid.map(meta["themes"]),
+    )
 
     enriched.to_csv(csv_path, index=False, encoding="utf-8-sig")
-    with pd.ExcelWriter(xlsx_path, engine="openpyxl") as w:
+    with pd.ExcelWriter(xlsx_path, engine=_XLSX_ENGINE) as w:
         enriched.to_excel(w, index=False, sheet_name="StrategyC")
         strong.to_excel(w, index=False, sheet_name="StrongThemes")
 
@@ -2,28 +2,30 @@ from __future__ import annotations
 
 import math
 
+import numpy as np
 import pandas as pd
 
 
 def apply_universe_filters(df: pd.DataFrame, cfg: dict) -> pd.DataFrame:
     u = cfg.get("universe", {})
 
-    out = df.copy()
+    # 各條件先合成一個遮罩，最後只取一次列（不先整份複製）
+    keep = np.ones(len(df), dtype=bool)
 
     if u.get("min_turnover") is not None:
-        out = out[out["turnover"].fillna(0) >= float(u["min_turnover"])]
+        keep &= (df["turnover"].fillna(0) >= float(u["min_turnover"])).to_numpy(dtype=bool)
 
     if u.get("min_price") is not None:
-        out = out[out["close"].fillna(0) >= float(u["min_price"])]
+        keep &= (df["close"].fillna(0) >= float(u["min_price"])).to_numpy(dtype=bool)
 
     if u.get("max_price") is not None:
-        out = out[out["close"].fillna(0) <= float(u["max_price"])]
+        keep &= (df["close"].fillna(0) <= float(u["max_price"])).to_numpy(dtype=bool)
 
     for col in ["is_disposed", "is_full_margin", "is_blacklist"]:
-        if col in out.columns:
-            out = out[out[col].fillna(False) == False]  # noqa: E712
+        if col in df.columns:
+            keep &= (df[col].fillna(False) == False).to_numpy(dtype=bool)  # noqa: E712
 
-    return out
+    return df.take(np.flatnonzero(keep))
 
 
 def suggest_stop(prev_low: float | None, buffer_pct: float) -> float | None:
@@ -47,3 +49,30 @@ def size_suggestion(capital: float, risk_per_trade: float, entry: float | None,
     lots_1000 = int(shares // 1000)
 
     return {"position_value": float(shares * entry), "shares": shares, "lots_1000": lots_1000}
+
+
+def suggest_stops(prev_low: np.ndarray, buffer_pct: float) -> np.ndarray:
+    """suggest_stop 的向量版本：無效的前日低點（NaN / inf）對應 NaN"""
+    prev_low = np.asarray(prev_low, dtype=np.float64)
+    return np.where(np.isfinite(prev_low), prev_low * (1.0 - buffer_pct), np.nan)
+
+
+def size_suggestions(capital: float, risk_per_trade: float, entry: np.ndarray, stop: np.ndarray, max_position_pct: float) -> dict:
+    """size_suggestion 的向量版本：逐列結果相同，不成立的列（缺值、停損不低於進場價等）為 NaN"""
+    entry = np.asarray(entry, dtype=np.float64)
+    stop = np.asarray(stop, dtype=np.float64)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # NaN 的比較皆為 False，缺值列自然落在無效遮罩內
+        valid = (entry > 0) & (stop > 0) & (stop < entry)
+
+        shares_by_risk = np.floor(capital * risk_per_trade / (entry - stop))
+        shares_by_cap = np.floor(capital * max_position_pct / entry)
+        shares = np.maximum(0.0, np.minimum(shares_by_risk, shares_by_cap))
+
+    shares = np.where(valid, shares, np.nan)
+    return {
+        "position_value": shares * entry,
+        "shares": shares,
+        "lots_1000": np.floor(shares / 1000),
+    }
@@ -1,11 +1,25 @@
 from __future__ import annotations
 
 import datetime as dt
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable
 
+import numpy as np
 import pandas as pd
 
-from .factors import compute_daily_features, compute_sector_daily, zscore
-from .risk import apply_universe_filters, size_suggestion, suggest_stop
+from .factors import compute_daily_features, compute_sector_daily, group_zscore, zscore
+from .risk import apply_universe_filters, size_suggestions, suggest_stops
+
+
+def _left_join(left: pd.DataFrame, right: pd.DataFrame, on: str | list[str]) -> pd.DataFrame:
+    """等同 left.merge(right, on=on, how="left")：右表以鍵為索引後 join（不排序），輸出列序與欄位相同"""
+    joined = left.join(right.set_index(on), on=on, how="left", lsuffix="_x", rsuffix="_y", sort=False)
+    return joined.reset_index(drop=True)
+
+
+def _filled(df: pd.DataFrame, col: str, fill: float) -> np.ndarray:
+    """欄位轉為 float64 陣列，缺值以 fill 補上（等同 fillna(fill)，但不建立中間 Series）"""
+    return df[col].to_numpy(dtype=np.float64, na_value=fill)
 
 
 def run_strategy_c(
@@ -15,24 +29,36 @@ def run_strategy_c(
     risk_flags: pd.DataFrame | None,
     cfg: dict,
     sector_mode: str = "industry",
+    *,
+    features: pd.DataFrame | None = None,
+    sector_daily: pd.DataFrame | None = None,
 ) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     demo_fallback = bool(cfg.get("demo", {}).get("fallback_if_empty", False))
 
-    features = compute_daily_features(daily_price)
-    sector_daily = compute_sector_daily(stock_meta, daily_price, sector_col=sector_mode, mtm_lookback=int(cfg["sector"]["mtm_lookback"]))
+    # 多個交易日共用同一份歷史時，可由呼叫端傳入預先算好的個股因子與族群日資料
+    if features is None:
+        features = compute_daily_features(daily_price, float_dtype=cfg.get("features", {}).get("float_dtype"))
+    if sector_daily is None:
+        sector_daily = compute_sector_daily(stock_meta, daily_price, sector_col=sector_mode, mtm_lookback=int(cfg["sector"]["mtm_lookback"]))
 
-    px_d = daily_price[daily_price["trade_date"] == trade_date].copy()
-    ft_d = features[features["trade_date"] == trade_date].copy()
+    # 一次雜湊分組取得各交易日的列位置：當日、前一交易日的切片與前一交易日本身都由此查得，
+    # 不再對整段歷史做多次布林篩選
+    date_rows = daily_price.groupby("trade_date").indices
+    no_rows = np.array([], dtype=np.intp)
 
-    base = px_d.merge(stock_meta, on="stock_id", how="left")
-    base = base.merge(ft_d, on=["trade_date", "stock_id"], how="left")
+    px_d = daily_price.take(date_rows.get(trade_date, no_rows))
+    ft_d = features[features["trade_date"] == trade_date]
+
+    base = _left_join(px_d, stock_meta, "stock_id")
+    base = _left_join(base, ft_d, ["trade_date", "stock_id"])
 
     if risk_flags is not None and len(risk_flags) > 0:
-        base = base.merge(risk_flags, on="stock_id", how="left")
+        base = _left_join(base, risk_flags, "stock_id")
 
     base = apply_universe_filters(base, cfg)
 
-    sec_d = sector_daily[sector_daily["trade_date"] == trade_date].copy()
+    # 布林篩選後以 take 取列：結果本身即為新表，之後新增欄位不需再 .copy()
+    sec_d = sector_daily.take(np.flatnonzero(sector_daily["trade_date"] == trade_date))
 
     sec_d["avg_pct_change_z"] = zscore(sec_d["avg_pct_change"])
     w = cfg["sector"]["weights"]
@@ -48,7 +74,7 @@ def run_strategy_c(
         & (sec_d["sector_mtm_z"].fillna(0) >= float(cfg["sector"]["thresh_mtm_z"]))
     )
 
-    strong_sectors = sec_d[sec_filter][["sector_id", "sector_score", "avg_pct_change", "up_ratio", "sector_mtm_z"]].copy()
+    strong_sectors = sec_d.take(np.flatnonzero(sec_filter))[["sector_id", "sector_score", "avg_pct_change", "up_ratio", "sector_mtm_z"]]
 
     if len(strong_sectors) == 0 and demo_fallback:
         strong_sectors = (
@@ -77,75 +103,95 @@ def run_strategy_c(
         return empty, features, sector_daily, strong_sectors
 
     base = base.rename(columns={sector_mode: "sector_id"})
-    base = base[base["sector_id"].isin(strong_sectors["sector_id"])].copy()
-    base = base.merge(strong_sectors[["sector_id", "sector_score"]], on="sector_id", how="left")
-
-    base["pct_change_z"] = base.groupby("sector_id")["pct_change"].transform(zscore)
-    base["vol_ratio_z"] = base.groupby("sector_id")["vol_ratio_20d"].transform(zscore)
+    base = base.take(np.flatnonzero(base["sector_id"].isin(strong_sectors["sector_id"])))
+
+    # sector_id 轉為類別（類別依字典序排列，排序結果與字串相同）：之後的 groupby / merge 以整數代碼進行
+    sector_dtype = pd.CategoricalDtype(sorted(strong_sectors["sector_id"].dropna().unique()))
+    base["sector_id"] = base["sector_id"].astype(sector_dtype)
+    sector_scores = strong_sectors[["sector_id", "sector_score"]].astype({"sector_id": sector_dtype})
+    base = _left_join(base, sector_scores, "sector_id")
+
+    base["pct_change_z"] = group_zscore(base["pct_change"], base["sector_id"])
+    base["vol_ratio_z"] = group_zscore(base["vol_ratio_20d"], base["sector_id"])
+
+    # 以下欄位在篩選與計分中的缺值補法一致，先一次補齊，之後直接取用
+    base = base.fillna({
+        "vol_ratio_20d": 0,
+        "pos_in_day": 0,
+        "distance_to_20d_high": 1.0,
+        "pct_change_z": 0,
+        "vol_ratio_z": 0,
+    })
+
+    # 篩選用欄位各轉一次 NumPy 陣列（缺值直接於轉換時補上），條件以原生布林陣列組合
+    pct_lo = _filled(base, "pct_change", -999)
+    pct_hi = _filled(base, "pct_change", 999)
+    vol_ratio = base["vol_ratio_20d"].to_numpy(dtype=np.float64)
+    close = _filled(base, "close", 0)
 
     leader_cfg = cfg["leader"]
     leader_filter = (
-        (base["pct_change"].fillna(-999) >= float(leader_cfg["thresh_leader_pct"]))
-        & (base["vol_ratio_20d"].fillna(0) >= float(leader_cfg["thresh_leader_vol_ratio"]))
-        & (base["is_20d_high"].fillna(False) == True)  # noqa: E712
-        & (base["pos_in_day"].fillna(0) >= float(leader_cfg["thresh_leader_pos"]))
+        (pct_lo >= float(leader_cfg["thresh_leader_pct"]))
+        & (vol_ratio >= float(leader_cfg["thresh_leader_vol_ratio"]))
+        & base["is_20d_high"].to_numpy(dtype=bool, na_value=False)
+        & (base["pos_in_day"].to_numpy(dtype=np.float64) >= float(leader_cfg["thresh_leader_pos"]))
     )
 
-    leaders = base[leader_filter].copy()
+    leaders = base.take(np.flatnonzero(leader_filter))
 
     if len(leaders) == 0:
         # Fallback: pick leaders by top percentile (or top-N) within sector.
         top_pct = float(leader_cfg.get("top_pct_in_sector", 0.0) or 0.0)
         if top_pct > 0:
-            ranked = base.sort_values(["sector_id", "pct_change"], ascending=[True, False]).copy()
-            ranked["_rank"] = ranked.groupby("sector_id").cumcount() + 1
-            ranked["_n"] = ranked.groupby("sector_id")["stock_id"].transform("count")
-            ranked["_cut"] = (ranked["_n"] * top_pct).round().clip(lower=1)
-            leaders = ranked[ranked["_rank"] <= ranked["_cut"]].copy()
+            ranked = base.sort_values(["sector_id", "pct_change"], ascending=[True, False])
+            # 同一個分組物件取名次與組內檔數，門檻在 NumPy 上計算
+            by_sector = ranked.groupby("sector_id", observed=True, sort=False)
+            rank = by_sector.cumcount().to_numpy() + 1
+            cut = np.maximum(np.round(by_sector["stock_id"].transform("count").to_numpy() * top_pct), 1)
+            leaders = ranked.take(np.flatnonzero(rank <= cut))
         elif demo_fallback:
-            leaders = base.sort_values(["sector_id", "pct_change"], ascending=[True, False]).copy()
+            leaders = base.sort_values(["sector_id", "pct_change"], ascending=[True, False])
 
     lw = leader_cfg["weights"]
     leaders["score_leader"] = (
-        float(lw["pct_change_z"]) * leaders["pct_change_z"].fillna(0)
-        + float(lw["vol_ratio_z"]) * leaders["vol_ratio_z"].fillna(0)
-        + float(lw["pos_in_day"]) * leaders["pos_in_day"].fillna(0)
+        float(lw["pct_change_z"]) * leaders["pct_change_z"]
+        + float(lw["vol_ratio_z"]) * leaders["vol_ratio_z"]
+        + float(lw["pos_in_day"]) * leaders["pos_in_day"]
     )
 
     leaders = (
         leaders.sort_values(["sector_id", "score_leader"], ascending=[True, False])
-        .groupby("sector_id", as_index=False, sort=False)
+        .groupby("sector_id", as_index=False, sort=False, observed=True)
         .head(int(leader_cfg["top_n_per_sector"]))
         .reset_index(drop=True)
     )
 
     followers_cfg = cfg["follower"]
 
+    pct_in_range = (pct_lo >= float(followers_cfg["pct_change_min"])) & (
+        pct_hi <= float(followers_cfg["pct_change_max"])
+    )
     followers_filter = (
-        (base["pct_change"].fillna(-999) >= float(followers_cfg["pct_change_min"]))
-        & (base["pct_change"].fillna(999) <= float(followers_cfg["pct_change_max"]))
-        & (base["vol_ratio_20d"].fillna(0) >= float(followers_cfg["vol_ratio_min"]))
-        & (base["vol_ratio_20d"].fillna(0) <= float(followers_cfg["vol_ratio_max"]))
-        & (base["close"].fillna(0) > base["ma_5"].fillna(1e18))
-        & (base["close"].fillna(0) > base["ma_10"].fillna(1e18))
-        & (base["distance_to_20d_high"].fillna(1.0) <= float(followers_cfg["thresh_dist_20d_high"]))
+        pct_in_range
+        & (vol_ratio >= float(followers_cfg["vol_ratio_min"]))
+        & (vol_ratio <= float(followers_cfg["vol_ratio_max"]))
+        & (close > _filled(base, "ma_5", 1e18))
+        & (close > _filled(base, "ma_10", 1e18))
+        & (base["distance_to_20d_high"].to_numpy(dtype=np.float64) <= float(followers_cfg["thresh_dist_20d_high"]))
     )
 
-    followers = base[followers_filter].copy()
+    followers = base.take(np.flatnonzero(followers_filter))
 
     if len(followers) == 0 and demo_fallback:
         # Fallback: relax MA & distance constraints in demo so we can see ranking behavior.
-        followers = base[
-            (base["pct_change"].fillna(-999) >= float(followers_cfg["pct_change_min"]))
-            & (base["pct_change"].fillna(999) <= float(followers_cfg["pct_change_max"]))
-        ].copy()
+        followers = base.take(np.flatnonzero(pct_in_range))
 
     fw = followers_cfg["weights"]
     followers["score_follow"] = (
-        float(fw["pct_change_z"]) * followers["pct_change_z"].fillna(0)
-        + float(fw["vol_ratio_z"]) * followers["vol_ratio_z"].fillna(0)
-        + float(fw["one_minus_dist_20d_high"]) * (1.0 - followers["distance_to_20d_high"].fillna(1.0))
-        + float(fw["pos_in_day"]) * followers["pos_in_day"].fillna(0)
+        float(fw["pct_change_z"]) * followers["pct_change_z"]
+        + float(fw["vol_ratio_z"]) * followers["vol_ratio_z"]
+        + float(fw["one_minus_dist_20d_high"]) * (1.0 - followers["distance_to_20d_high"])
+        + float(fw["pos_in_day"]) * followers["pos_in_day"]
     )
 
     if len(leaders) == 0 or len(followers) == 0:
@@ -168,8 +214,8 @@ def run_strategy_c(
 
     leader_pick = leaders[["sector_id", "stock_id", "score_leader"]].rename(columns={"stock_id": "leader_id"})
 
-    followers = followers.merge(leader_pick, on="sector_id", how="left")
-    followers = followers[followers["leader_id"].notna()].copy()
+    # 沒有領頭股的族群直接由 inner join 排除，不先補 NaN 再篩掉
+    followers = followers.merge(leader_pick, on="sector_id", how="inner", sort=False)
 
     tw = cfg["total_score_weights"]
     followers["score_sector"] = followers["sector_score"].fillna(0)
@@ -179,41 +225,41 @@ def run_strategy_c(
         + float(tw["score_follow"]) * followers["score_follow"].fillna(0)
     )
 
-    prev_date = _prev_trade_date(daily_price, trade_date)
+    # 只需前 K 檔時先以部分排序取出，後續的前日低點合併與部位計算只處理這 K 列
+    top_k = cfg.get("output", {}).get("top_k")
+    if top_k is not None and int(top_k) < len(followers):
+        followers = followers.nlargest(int(top_k), "score_total")
+
+    prev_date = _prev_date(np.array(sorted(date_rows), dtype=object), trade_date)
     prev_low = None
     if prev_date is not None:
         prev_low = (
-            daily_price[daily_price["trade_date"] == prev_date][["stock_id", "low"]]
+            daily_price.take(date_rows[prev_date])[["stock_id", "low"]]
             .rename(columns={"low": "prev_low"})
-            .copy()
         )
-        followers = followers.merge(prev_low, on="stock_id", how="left")
+        followers = _left_join(followers, prev_low, "stock_id")
     else:
         followers["prev_low"] = pd.NA
 
     ps = cfg["position_sizing"]
     buffer_pct = float(ps["stop_buffer_pct"])
 
-    followers["suggest_entry"] = followers["close"].astype(float)
-    followers["suggest_stop"] = followers["prev_low"].apply(lambda x: suggest_stop(float(x) if pd.notna(x) else None, buffer_pct))
-
-    capital = float(ps["capital"])
-    risk_per_trade = float(ps["risk_per_trade"])
-    max_position_pct = float(ps["max_position_pct"])
-
-    sizing = followers.apply(
-        lambda r: size_suggestion(
-            capital=capital,
-            risk_per_trade=risk_per_trade,
-            entry=float(r["suggest_entry"]) if pd.notna(r["suggest_entry"]) else None,
-            stop=float(r["suggest_stop"]) if pd.notna(r["suggest_stop"]) else None,
-            max_position_pct=max_position_pct,
-        ),
-        axis=1,
-        result_type="expand",
+    # 停損與部位大小整欄以 NumPy 計算，不逐列呼叫 suggest_stop / size_suggestion
+    entry = followers["close"].to_numpy(dtype=float, na_value=np.nan)
+    stop = suggest_stops(followers["prev_low"].to_numpy(dtype=float, na_value=np.nan), buffer_pct)
+    followers["suggest_entry"] = entry
+    followers["suggest_stop"] = stop
+
+    sizing = size_suggestions(
+        capital=float(ps["capital"]),
+        risk_per_trade=float(ps["risk_per_trade"]),
+        entry=entry,
+        stop=stop,
+        max_position_pct=float(ps["max_position_pct"]),
+    )
+    followers[["position_value", "shares", "lots_1000"]] = np.column_stack(
+        [sizing["position_value"], sizing["shares"], sizing["lots_1000"]]
     )
-
-    followers = pd.concat([followers, sizing], axis=1)
 
     out = followers[
         [
@@ -231,18 +277,76 @@ def run_strategy_c(
             "shares",
             "lots_1000",
         ]
-    ].copy()
+    ]
 
     out = out.sort_values("score_total", ascending=False).reset_index(drop=True)
+    # 對外仍輸出字串欄位
+    out["sector_id"] = out["sector_id"].astype(object)
 
     return out, features, sector_daily, strong_sectors
 
 
+def run_strategy_c_batch(
+    trade_dates: Iterable[dt.date],
+    stock_meta: pd.DataFrame,
+    daily_price: pd.DataFrame,
+    risk_flags: pd.DataFrame | None,
+    cfg: dict,
+    sector_mode: str = "industry",
+    max_workers: int | None = None,
+) -> dict[dt.date, pd.DataFrame]:
+    """對多個交易日執行 Strategy C，回傳 {交易日: 候選股}
+
+    個股因子與族群日資料只計算一次；各交易日彼此獨立，分散到子行程平行計算。
+    共用的資料表在每個子行程初始化時傳入一次，不隨每個交易日重複序列化。
+    max_workers=1 時在目前行程依序執行。
+    """
+    dates = list(trade_dates)
+    features = compute_daily_features(daily_price, float_dtype=cfg.get("features", {}).get("float_dtype"))
+    sector_daily = compute_sector_daily(stock_meta, daily_price, sector_col=sector_mode, mtm_lookback=int(cfg["sector"]["mtm_lookback"]))
+    shared = (stock_meta, daily_price, risk_flags, cfg, sector_mode, features, sector_daily)
+
+    if max_workers == 1 or len(dates) <= 1:
+        return {d: _run_shared(shared, d) for d in dates}
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_batch_worker, initargs=(shared,)) as ex:
+        return dict(zip(dates, ex.map(_run_batch_date, dates)))
+
+
+_BATCH_SHARED: tuple | None = None
+
+
+def _init_batch_worker(shared: tuple) -> None:
+    global _BATCH_SHARED
+    _BATCH_SHARED = shared
+
+
+def _run_batch_date(d: dt.date) -> pd.DataFrame:
+    return _run_shared(_BATCH_SHARED, d)
+
+
+def _run_shared(shared: tuple, d: dt.date) -> pd.DataFrame:
+    stock_meta, daily_price, risk_flags, cfg, sector_mode, features, sector_daily = shared
+    candidates, _, _, _ = run_strategy_c(
+        d,
+        stock_meta,
+        daily_price,
+        risk_flags,
+        cfg,
+        sector_mode,
+        features=features,
+        sector_daily=sector_daily,
+    )
+    return candidates
+
+
 def _prev_trade_date(daily_price: pd.DataFrame, d: dt.date) -> dt.date | None:
-    dates = sorted(set(daily_price["trade_date"].tolist()))
-    if d not in dates:
-        return None
-    idx = dates.index(d)
-    if idx == 0:
+    return _prev_date(np.sort(pd.unique(daily_price["trade_date"])), d)
+
+
+def _prev_date(dates: np.ndarray, d: dt.date) -> dt.date | None:
+    # dates 為已排序的唯一交易日；d 不在其中或已是第一天時回傳 None
+    i = int(np.searchsorted(dates, d))
+    if i == 0 or i >= len(dates) or dates[i] != d:
         return None
-    return dates[idx - 1]
+    return dates[i - 1]
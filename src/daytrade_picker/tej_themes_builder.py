@@ -3,6 +3,8 @@ from pathlib import Path
 
 import pandas as pd
 
+from .themes_builder import join_themes, write_themes_csv
+
 
 def build_themes_mapping_from_tej(
     out_path: Path,
@@ -41,13 +43,8 @@ def build_themes_mapping_from_tej(
     out = out[out["stock_id"].notna() & (out["stock_id"] != "")]
     out = out[out["themes"].notna() & (out["themes"] != "")]
 
-    out = (
-        out.groupby("stock_id", as_index=False)["themes"]
-        .apply(lambda s: ";".join(sorted(set([x for x in s.tolist() if x and x != "nan"]))))
-        .reset_index(drop=True)
-    )
+    out = join_themes(out)
 
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    out.to_csv(out_path, index=False, encoding="utf-8-sig")
+    write_themes_csv(out, out_path)
 
     return out
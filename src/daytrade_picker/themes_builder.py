@@ -1,8 +1,19 @@
 import re
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+except ImportError:  # 未安裝 pyarrow 時以 pandas 寫檔
+    pa = None
+
+# 推測欄位用的樣式，預先編譯一次
+_STOCK_ID_PAT = re.compile(r"\b\d{4}\b")
+_NUMERIC_PAT = re.compile(r"[\d\.,]+")
+
 
 def build_themes_mapping(
     input_path: Path | None,
@@ -17,8 +28,10 @@ def build_themes_mapping(
 
     df = _read_any(input_path, sheet=sheet)
 
-    stock_col = _guess_stock_id_col(df)
-    theme_col = _guess_theme_col(df)
+    # 兩個推測函式共用各欄的字串轉換結果
+    str_cache: dict = {}
+    stock_col = _guess_stock_id_col(df, str_cache)
+    theme_col = _guess_theme_col(df, str_cache)
 
     out = df[[stock_col, theme_col]].copy()
     out.columns = ["stock_id", "themes"]
@@ -32,17 +45,41 @@ def build_themes_mapping(
 
     out["themes"] = out["themes"].str.replace(r"\s+", "", regex=True)
 
-    out = (
-        out.groupby("stock_id", as_index=False)["themes"]
-        .apply(lambda s: ";".join(sorted(set([x for x in s.tolist() if x and x != "nan"]))))
-        .reset_index(drop=True)
-    )
+    out = join_themes(out)
 
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    out.to_csv(out_path, index=False, encoding="utf-8-sig")
+    write_themes_csv(out, out_path)
     return out
 
 
+def write_themes_csv(out: pd.DataFrame, out_path: Path) -> None:
+    """
+    寫出 themes_mapping.csv（UTF-8 含 BOM，Excel 開啟中文不亂碼）
+
+    安裝 pyarrow 時以其 C++ CSV writer 輸出，BOM 先行寫入；否則使用 DataFrame.to_csv。
+    """
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    if pa is None:
+        out.to_csv(out_path, index=False, encoding="utf-8-sig")
+        return
+    with open(out_path, "wb") as f:
+        f.write("\ufeff".encode("utf-8"))
+        pa_csv.write_csv(pa.Table.from_pandas(out, preserve_index=False), f)
+
+
+def join_themes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    每檔股票的題材去重、排序後以 ";" 串接（stock_id 依序排列）
+
+    先整表 drop_duplicates / sort_values，再以 groupby().agg(";".join) 串接，
+    不逐組呼叫 Python lambda。題材全為空或 "nan" 的股票保留為空字串。
+    """
+    stock_ids = np.sort(df["stock_id"].unique())
+    valid = df[(df["themes"] != "") & (df["themes"] != "nan") & df["themes"].notna()]
+    valid = valid.drop_duplicates(["stock_id", "themes"]).sort_values(["stock_id", "themes"])
+    joined = valid.groupby("stock_id", sort=False)["themes"].agg(";".join)
+    return joined.reindex(stock_ids, fill_value="").rename_axis("stock_id").reset_index()
+
+
 def _pick_latest_export(input_dir: Path) -> Path:
     if not input_dir.exists():
         raise RuntimeError(f"Input directory does not exist: {input_dir}")
@@ -71,7 +108,15 @@ def _read_any(path: Path, sheet: str | None) -> pd.DataFrame:
     raise RuntimeError(f"Unsupported export file type: {path}")
 
 
-def _guess_stock_id_col(df: pd.DataFrame) -> str:
+def _as_str(df: pd.DataFrame, c, str_cache: dict | None) -> pd.Series:
+    if str_cache is None:
+        return df[c].astype(str)
+    if c not in str_cache:
+        str_cache[c] = df[c].astype(str)
+    return str_cache[c]
+
+
+def _guess_stock_id_col(df: pd.DataFrame, str_cache: dict | None = None) -> str:
     cols = list(df.columns)
 
     preferred = [
@@ -90,15 +135,15 @@ def _guess_stock_id_col(df: pd.DataFrame) -> str:
                 return c
 
     for c in cols:
-        s = df[c].astype(str)
-        hit = s.str.contains(r"\b\d{4}\b", regex=True, na=False).mean()
+        s = _as_str(df, c, str_cache)
+        hit = s.str.contains(_STOCK_ID_PAT, na=False).mean()
         if hit >= 0.5:
             return c
 
     raise RuntimeError(f"Cannot infer stock_id column from: {cols}")
 
 
-def _guess_theme_col(df: pd.DataFrame) -> str:
+def _guess_theme_col(df: pd.DataFrame, str_cache: dict | None = None) -> str:
     cols = list(df.columns)
 
     preferred = [
@@ -116,14 +161,11 @@ def _guess_theme_col(df: pd.DataFrame) -> str:
             if p in str(c):
                 return c
 
-    non_numeric = []
+    # 取第一個非數值欄，找到即停止，不必檢查其餘欄位
     for c in cols:
-        s = df[c].astype(str)
-        numeric_ratio = s.str.fullmatch(r"[\d\.,]+", na=False).mean()
+        s = _as_str(df, c, str_cache)
+        numeric_ratio = s.str.fullmatch(_NUMERIC_PAT, na=False).mean()
         if numeric_ratio < 0.5:
-            non_numeric.append(c)
-
-    if non_numeric:
-        return non_numeric[0]
+            return c
 
     raise RuntimeError(f"Cannot infer themes column from: {cols}")
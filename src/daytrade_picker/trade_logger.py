@@ -3,13 +3,33 @@
 記錄所有交易細節，用於分析和改進策略
 """
 from typing import Dict, List, Optional
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, fields
 from datetime import datetime
+import numpy as np
 import pandas as pd
 import json
 import os
 import logging
 
+try:
+    import orjson
+
+    def _dumps(obj) -> str:
+        # OPT_SERIALIZE_NUMPY：指標值常為 numpy 純量；NaN 會寫成 null
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode('utf-8')
+
+    def _loads(data):
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # 標準庫寫出的舊檔可能含 NaN，orjson 不接受，改用 json 解析
+            return json.loads(data)
+except ImportError:  # 未安裝 orjson 時退回標準庫
+    def _dumps(obj) -> str:
+        return json.dumps(obj, ensure_ascii=False)
+
+    _loads = json.loads
+
 logger = logging.getLogger(__name__)
 
 
@@ -75,10 +95,10 @@ class TradeLogger:
         # 建立目錄
         os.makedirs(log_dir, exist_ok=True)
         
-        # 當日檔案名稱
+        # 當日檔案名稱（JSON Lines：每行一筆，新增時只需附加一行）
         self.today_file = os.path.join(
             log_dir, 
-            f"trades_{datetime.now().strftime('%Y%m%d')}.json"
+            f"trades_{datetime.now().strftime('%Y%m%d')}.jsonl"
         )
         
         # 載入當日已存在的日誌
@@ -86,16 +106,31 @@ class TradeLogger:
     
     def _load_today_logs(self):
         """載入當日的日誌"""
+        if not os.path.exists(self.today_file):
+            self._migrate_legacy_log()
         if os.path.exists(self.today_file):
             try:
                 with open(self.today_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.logs = [TradeLog(**log) for log in data]
+                    self.logs = [TradeLog(**_loads(line)) for line in f if line.strip()]
                 logger.info(f"已載入 {len(self.logs)} 筆當日交易日誌")
             except Exception as e:
                 logger.error(f"載入日誌失敗: {e}")
                 self.logs = []
     
+    def _migrate_legacy_log(self):
+        """舊版當日檔（.json，整份陣列）轉存為 .jsonl；舊檔保留不刪除"""
+        legacy_file = os.path.splitext(self.today_file)[0] + '.json'
+        if not os.path.exists(legacy_file):
+            return
+        try:
+            with open(legacy_file, 'r', encoding='utf-8') as f:
+                data = _loads(f.read())
+            with open(self.today_file, 'w', encoding='utf-8') as f:
+                f.writelines(_dumps(log) + '\n' for log in data)
+            logger.info(f"已將 {len(data)} 筆舊版日誌轉存至 {self.today_file}")
+        except Exception as e:
+            logger.error(f"轉換舊版日誌失敗: {e}")
+    
     def log_signal(self, symbol: str, signal_type: str, price: float,
                    score: float, technical: Dict, chip: Dict, 
                    market: Dict, notes: str = "") -> TradeLog:
@@ -196,21 +231,11 @@ class TradeLogger:
         return log
     
     def _save_log(self, log: TradeLog):
-        """儲存單筆日誌到檔案"""
+        """儲存單筆日誌到檔案（附加一行，不重讀、不重寫既有紀錄）"""
         try:
-            # 讀取現有資料
-            if os.path.exists(self.today_file):
-                with open(self.today_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-            else:
-                data = []
-            
-            # 加入新日誌
-            data.append(asdict(log))
-            
-            # 寫入檔案
-            with open(self.today_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            with open(self.today_file, 'a', encoding='utf-8') as f:
+                # TradeLog 為扁平欄位，直接序列化 __dict__，不需 asdict 的遞迴複製
+                f.write(_dumps(vars(log)) + '\n')
         
         except Exception as e:
             logger.error(f"儲存日誌失敗: {e}")
@@ -250,20 +275,22 @@ class TradeLogger:
                 'avg_loss': 0
             }
         
-        winning = [log for log in closed_trades if log.pnl > 0]
-        losing = [log for log in closed_trades if log.pnl < 0]
+        # 損益只取出一次成陣列，各項統計皆由陣列計算
+        pnls = np.fromiter((log.pnl for log in closed_trades), dtype=np.float64, count=len(closed_trades))
+        wins = pnls[pnls > 0]
+        losses = pnls[pnls < 0]
         
         return {
-            'total_trades': len(closed_trades),
-            'winning_trades': len(winning),
-            'losing_trades': len(losing),
-            'win_rate': (len(winning) / len(closed_trades) * 100) if closed_trades else 0,
-            'total_pnl': sum(log.pnl for log in closed_trades),
-            'avg_pnl': sum(log.pnl for log in closed_trades) / len(closed_trades),
-            'avg_win': sum(log.pnl for log in winning) / len(winning) if winning else 0,
-            'avg_loss': sum(log.pnl for log in losing) / len(losing) if losing else 0,
-            'best_trade': max(log.pnl for log in closed_trades),
-            'worst_trade': min(log.pnl for log in closed_trades)
+            'total_trades': pnls.size,
+            'winning_trades': wins.size,
+            'losing_trades': losses.size,
+            'win_rate': wins.size / pnls.size * 100,
+            'total_pnl': float(pnls.sum()),
+            'avg_pnl': float(pnls.mean()),
+            'avg_win': float(wins.mean()) if wins.size else 0,
+            'avg_loss': float(losses.mean()) if losses.size else 0,
+            'best_trade': float(pnls.max()),
+            'worst_trade': float(pnls.min())
         }
     
     def generate_daily_report(self) -> str:
@@ -317,7 +344,10 @@ class TradeLogger:
         filepath = os.path.join(self.log_dir, filename)
         
         # 轉換為 DataFrame
-        df = pd.DataFrame([asdict(log) for log in self.logs])
+        df = pd.DataFrame(
+            [vars(log) for log in self.logs],
+            columns=[f.name for f in fields(TradeLog)]
+        )
         
         # 儲存
         df.to_csv(filepath, index=False, encoding='utf-8-sig')
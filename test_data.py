@@ -2,9 +2,19 @@
 import pandas as pd
 from datetime import date
 
-# 讀取今日資料
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = 'pyarrow'  # 多執行緒解析
+except ImportError:
+    CSV_ENGINE = 'c'
+
+# 讀取今日資料（只讀下方統計用到的欄位）
 today = date(2026, 2, 5)
-df = pd.read_csv(f'data/daily/prices_{today}.csv')
+df = pd.read_csv(
+    f'data/daily/prices_{today}.csv',
+    usecols=['stock_id', 'name', 'close', 'volume', 'change'],
+    engine=CSV_ENGINE,
+)
 
 print(f"📊 今日股票資料摘要 ({today})")
 print("=" * 70)
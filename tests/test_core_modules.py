@@ -9,15 +9,29 @@
     python tests/test_core_modules.py
 """
 
+import copy
+
 import pytest
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-import sys
-import os
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import yaml
+
+try:
+    import pytest_benchmark  # noqa: F401
+    HAS_PYTEST_BENCHMARK = True
+except ImportError:
+    HAS_PYTEST_BENCHMARK = False
 
-# 加入專案路徑
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+if __name__ == "__main__":
+    # 直接以腳本執行時才需手動加入專案根目錄；
+    # 透過 pytest 執行時由 pyproject.toml 的 pythonpath 設定處理
+    import os
+    import sys
+
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 # 匯入要測試的模組
 from src.daytrade_picker.core.error_handler import (
@@ -37,39 +51,45 @@ from src.daytrade_picker.core.equity_protection import (
     EquityProtection,
     TradingStatus
 )
+from src.daytrade_picker.strategy_c.backtest import backtest_strategy_c
+from src.daytrade_picker.strategy_c.data import make_demo_market_data
+from src.daytrade_picker.strategy_c.enhanced_strategy import EnhancedStrategyC
+from src.daytrade_picker.strategy_c._njit_kernels import _bbands
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+
+# 小型測試序列的資料於模組載入時以 float64 陣列建立一次，
+# 測試內以 pd.Series(..., copy=False) 包裝，省去由 list 推斷型別；需要修改時請先 .copy()
+_ARR_WITH_NAN = np.array([1, 2, np.nan, 4, 5], dtype=np.float64)
+_ARR_WITH_OUTLIER = np.array([1, 2, 3, 4, 5, 100], dtype=np.float64)  # 100 是異常值
+_ARR_RSI_VALID = np.array([30, 40, 50, 60, 70], dtype=np.float64)
+_ARR_RSI_INVALID = np.array([30, 40, 150, 60, 70], dtype=np.float64)
+_NAN_OPEN = np.array([100, np.nan, 102], dtype=np.float64)
+
+
+@pytest.fixture(scope="class")
+def handler():
+    """不涉及錯誤計數的測試共用同一個 handler"""
+    return ErrorHandler()
 
 
 class TestErrorHandler:
     """測試錯誤處理模組"""
     
-    def test_safe_division_normal(self):
+    def test_safe_division_normal(self, handler):
         """測試正常除法"""
-        handler = ErrorHandler()
         result = handler.safe_division(10, 2)
         assert result == 5.0
     
-    def test_safe_division_by_zero(self):
-        """測試除以零"""
-        handler = ErrorHandler()
-        result = handler.safe_division(10, 0, default=0.0)
-        assert result == 0.0
-    
-    def test_safe_division_nan(self):
-        """測試 NaN 處理"""
-        handler = ErrorHandler()
-        result = handler.safe_division(10, np.nan, default=0.0)
-        assert result == 0.0
-    
-    def test_safe_division_infinity(self):
-        """測試無限值處理"""
-        handler = ErrorHandler()
-        result = handler.safe_division(10, np.inf, default=0.0)
+    @pytest.mark.parametrize("divisor", [0, np.nan, np.inf], ids=["zero", "nan", "infinity"])
+    def test_safe_division_invalid_divisor(self, handler, divisor):
+        """測試除以零、NaN 與無限值時回傳預設值"""
+        result = handler.safe_division(10, divisor, default=0.0)
         assert result == 0.0
     
-    def test_clean_nan_single_value(self):
+    def test_clean_nan_single_value(self, handler):
         """測試單一值 NaN 清理"""
-        handler = ErrorHandler()
-        
         # NaN 值
         result = handler.clean_nan(np.nan, default=0.0)
         assert result == 0.0
@@ -78,27 +98,35 @@ class TestErrorHandler:
         result = handler.clean_nan(10.5, default=0.0)
         assert result == 10.5
     
-    def test_clean_nan_series(self):
+    @pytest.mark.parametrize("value", [
+        pytest.param(np.float32('nan'), id="float32_nan"),
+        pytest.param(np.float16('nan'), id="float16_nan"),
+        pytest.param(pd.NA, id="pd_na"),
+        pytest.param(None, id="none"),
+    ])
+    def test_clean_nan_missing_scalars(self, handler, value):
+        """測試 NumPy 各精度 NaN、pd.NA 與 None 皆視為缺值"""
+        assert handler.clean_nan(value, default=-1.0) == -1.0
+        
+        # None 視為缺值，非數值型別原樣返回
+        assert handler.clean_nan(None, default=0.0) == 0.0
+        assert handler.clean_nan('abc', default=0.0) == 'abc'
+    
+    def test_clean_nan_series(self, handler):
         """測試 Series NaN 清理"""
-        handler = ErrorHandler()
-        
-        data = pd.Series([1, 2, np.nan, 4, 5])
+        data = pd.Series(_ARR_WITH_NAN, copy=False)
         result = handler.clean_nan(data, default=0.0)
         
         assert not result.isna().any()
         assert result.iloc[2] == 0.0
     
-    def test_validate_price_valid(self):
+    def test_validate_price_valid(self, handler):
         """測試有效價格驗證"""
-        handler = ErrorHandler()
-        
         assert handler.validate_price(100.0) == True
         assert handler.validate_price(0.01) == True
     
-    def test_validate_price_invalid(self):
+    def test_validate_price_invalid(self, handler):
         """測試無效價格驗證"""
-        handler = ErrorHandler()
-        
         with pytest.raises(DataValidationError):
             handler.validate_price(0)
         
@@ -107,9 +135,37 @@ class TestErrorHandler:
         
         with pytest.raises(DataValidationError):
             handler.validate_price(np.nan)
+        
+        with pytest.raises(DataValidationError):
+            handler.validate_price('abc')
+    
+    def test_validate_quantity(self, handler):
+        """測試交易數量驗證"""
+        assert handler.validate_quantity(5) == True
+        assert handler.validate_quantity(np.int64(5)) == True
+        
+        for bad in (np.nan, None, -1, 2000, '5'):
+            with pytest.raises(DataValidationError):
+                handler.validate_quantity(bad)
+    
+    def test_validate_dataframe_nan_columns(self):
+        """測試 DataFrame 驗證回報所有含 NaN 的欄位"""
+        df = pd.DataFrame({
+            'open': [100, np.nan],
+            'close': [101, 102],
+            'volume': [np.nan, np.nan]
+        })
+        
+        assert ErrorHandler.validate_dataframe(df, ['close']) == True
+        
+        with pytest.raises(DataValidationError) as exc_info:
+            ErrorHandler.validate_dataframe(df, ['open', 'close', 'volume'])
+        assert 'open' in str(exc_info.value)
+        assert 'volume' in str(exc_info.value)
     
     def test_safe_execute_decorator(self):
         """測試安全執行裝飾器"""
+        # 會累計錯誤次數，使用獨立的 handler
         handler = ErrorHandler()
         
         @handler.safe_execute(default_return=0.0)
@@ -121,108 +177,165 @@ class TestErrorHandler:
         
         # 錯誤情況（除以零）
         assert risky_function(10, 0) == 0.0
-
-
-class TestDataValidator:
-    """測試資料驗證模組"""
     
-    def test_validate_ohlcv_valid_data(self):
-        """測試有效 OHLCV 資料"""
-        validator = DataValidator()
+    def test_safe_execute_error_count_threads(self):
+        """測試多執行緒下錯誤計數正確累計"""
+        import threading
         
-        data = pd.DataFrame({
-            'open': [100, 101, 102],
-            'high': [102, 103, 104],
-            'low': [99, 100, 101],
-            'close': [101, 102, 103],
-            'volume': [1000, 1100, 1200]
-        })
+        handler = ErrorHandler()
         
-        is_valid, errors = validator.validate_ohlcv_data(data, strict=False)
-        assert is_valid == True
-        assert len(errors) == 0
-    
-    def test_validate_ohlcv_missing_columns(self):
-        """測試缺少欄位"""
-        validator = DataValidator()
+        @handler.safe_execute(default_return=0.0, log_traceback=False)
+        def risky_function():
+            return 1 / 0
+        
+        threads = [
+            threading.Thread(target=lambda: [risky_function() for _ in range(50)])
+            for _ in range(4)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        
+        assert handler.get_error_summary()['total_errors'] == 200
         
-        data = pd.DataFrame({
+        handler.reset_error_log()
+        assert handler.error_count == 0
+
+
+def _make_valid_ohlcv() -> pd.DataFrame:
+    """三筆正常的 OHLCV 資料；其他案例由此衍生"""
+    return pd.DataFrame({
+        'open': [100, 101, 102],
+        'high': [102, 103, 104],
+        'low': [99, 100, 101],
+        'close': [101, 102, 103],
+        'volume': [1000, 1100, 1200]
+    })
+
+
+_VALID_OHLCV = _make_valid_ohlcv()
+
+# validate_ohlcv_data 的測試案例：(資料, 預期是否有效, 錯誤訊息應包含的字串)，於載入模組時建立一次
+OHLCV_CASES = [
+    pytest.param(_VALID_OHLCV, True, None, id="valid_data"),
+    pytest.param(
+        pd.DataFrame({
             'open': [100, 101],
             'close': [101, 102]
             # 缺少 high, low, volume
-        })
-        
-        is_valid, errors = validator.validate_ohlcv_data(data, strict=False)
-        assert is_valid == False
-        assert len(errors) > 0
-    
-    def test_validate_ohlcv_price_relationship(self):
-        """測試價格關係異常"""
-        validator = DataValidator()
-        
-        data = pd.DataFrame({
+        }),
+        False, '缺少必要欄位', id="missing_columns"
+    ),
+    pytest.param(
+        pd.DataFrame({
             'open': [100],
             'high': [99],  # 錯誤: High < Open
             'low': [100],
             'close': [100],
             'volume': [1000]
-        })
-        
-        is_valid, errors = validator.validate_ohlcv_data(data, strict=False)
-        assert is_valid == False
-        assert any('High' in str(e) for e in errors)
-    
-    def test_validate_ohlcv_nan_values(self):
-        """測試 NaN 值檢測"""
-        validator = DataValidator()
-        
-        data = pd.DataFrame({
-            'open': [100, np.nan, 102],
-            'high': [102, 103, 104],
-            'low': [99, 100, 101],
-            'close': [101, 102, 103],
-            'volume': [1000, 1100, 1200]
-        })
-        
-        is_valid, errors = validator.validate_ohlcv_data(data, strict=False)
-        assert is_valid == False
-        assert any('NaN' in str(e) for e in errors)
+        }),
+        False, 'High', id="price_relationship"
+    ),
+    pytest.param(_VALID_OHLCV.assign(open=_NAN_OPEN), False, 'NaN', id="nan_values"),
+]
+
+
+@pytest.fixture(scope="module")
+def valid_ohlcv():
+    """整個模組共用的正常 OHLCV 資料；需要修改的測試請先 .copy()"""
+    return _make_valid_ohlcv()
+
+
+@pytest.fixture(scope="class")
+def validator():
+    return DataValidator()
+
+
+class TestDataValidator:
+    """測試資料驗證模組"""
     
-    def test_clean_ohlcv_data(self):
+    @pytest.mark.parametrize("frame,expected_valid,err_substr", OHLCV_CASES)
+    def test_validate_ohlcv(self, validator, frame, expected_valid, err_substr):
+        """測試 OHLCV 驗證：有效資料、缺少欄位、價格關係異常、NaN 值"""
+        is_valid, errors = validator.validate_ohlcv_data(frame, strict=False)
+        assert is_valid == expected_valid
+        if err_substr is None:
+            assert len(errors) == 0
+        else:
+            assert any(err_substr in str(e) for e in errors)
+    
+    def test_validate_ohlcv_throughput(self, validator):
+        """測試 10 萬筆 OHLCV 驗證的吞吐量：只計驗證本身，資料表於計時前以 float64 陣列零複製建立"""
+        import time
+        
+        n = 100_000
+        rng = np.random.default_rng(0)
+        open_ = rng.uniform(50.0, 150.0, n)
+        close = open_ * rng.uniform(0.95, 1.05, n)
+        frame = pd.DataFrame({
+            'open': open_,
+            'high': np.maximum(open_, close) + rng.uniform(0.0, 1.0, n),
+            'low': np.minimum(open_, close) - rng.uniform(0.0, 1.0, n),
+            'close': close,
+            'volume': rng.integers(1, 10_000, n).astype(np.float64),
+        }, copy=False)
+        
+        start = time.perf_counter()
+        is_valid, errors = validator.validate_ohlcv_data(frame, strict=False)
+        elapsed = time.perf_counter() - start
+        
+        assert is_valid
+        assert errors == []
+        # 寬鬆上限：只為攔下退化成 apply / iterrows 的實作
+        assert elapsed < 0.1
+    
+    def test_clean_ohlcv_data(self, validator, valid_ohlcv):
         """測試資料清理"""
-        validator = DataValidator()
-        
-        data = pd.DataFrame({
-            'open': [100, np.nan, 102],
-            'high': [102, 103, 104],
-            'low': [99, 100, 101],
-            'close': [101, 102, 103],
-            'volume': [1000, -100, 1200]  # 包含異常值
-        })
+        data = valid_ohlcv.copy()
+        data.loc[1, 'open'] = np.nan
+        data.loc[1, 'volume'] = -100  # 異常值
         
         clean_data = validator.clean_ohlcv_data(data, method='fill')
         
-        # 應該沒有 NaN
-        assert not clean_data.isna().any().any()
+        # 應該沒有 NaN（直接檢查底層 float64 陣列，省去中間的布林 DataFrame）
+        assert not np.isnan(clean_data.to_numpy(dtype=np.float64)).any()
         
         # 應該沒有負數成交量
         assert (clean_data['volume'] >= 0).all()
     
     def test_detect_outliers_iqr(self):
         """測試異常值偵測 (IQR)"""
-        data = pd.Series([1, 2, 3, 4, 5, 100])  # 100 是異常值
+        data = pd.Series(_ARR_WITH_OUTLIER, copy=False)
         
         outliers = DataValidator.detect_outliers(data, method='iqr', threshold=1.5)
         
         assert outliers.iloc[-1] == True  # 最後一個是異常值
         assert outliers.iloc[0] == False  # 第一個不是異常值
     
-    def test_validate_indicator(self):
-        """測試技術指標驗證"""
-        validator = DataValidator()
+    def test_detect_outliers_iqr_large(self):
+        """測試大量資料的 IQR 偵測與 Series.quantile 定義一致、注入的異常值被標出，且維持向量化速度"""
+        import time
+        
+        data = pd.Series(np.random.default_rng(0).standard_normal(1_000_000))
+        data.iloc[::1000] = np.nan
+        data.iloc[[1, 2]] = [50.0, -50.0]  # 注入上下兩側的異常值
         
+        start = time.perf_counter()
+        outliers = DataValidator.detect_outliers(data, method='iqr', threshold=1.5)
+        elapsed = time.perf_counter() - start
+        
+        q1, q3 = data.quantile(0.25), data.quantile(0.75)
+        expected = (data < q1 - 1.5 * (q3 - q1)) | (data > q3 + 1.5 * (q3 - q1))
+        assert outliers.equals(expected)
+        assert outliers.iloc[[1, 2]].all()
+        # 寬鬆上限：只為攔下退化成逐元素 Python 迴圈的實作
+        assert elapsed < 1.0
+    
+    def test_validate_indicator(self, validator):
+        """測試技術指標驗證"""
         # 有效的 RSI
-        rsi = pd.Series([30, 40, 50, 60, 70])
+        rsi = pd.Series(_ARR_RSI_VALID, copy=False)
         is_valid, errors = validator.validate_indicator(
             rsi,
             name='RSI',
@@ -231,7 +344,7 @@ class TestDataValidator:
         assert is_valid == True
         
         # 無效的 RSI (超出範圍)
-        invalid_rsi = pd.Series([30, 40, 150, 60, 70])
+        invalid_rsi = pd.Series(_ARR_RSI_INVALID, copy=False)
         is_valid, errors = validator.validate_indicator(
             invalid_rsi,
             name='RSI',
@@ -240,13 +353,17 @@ class TestDataValidator:
         assert is_valid == False
 
 
+@pytest.fixture(scope="class")
+def calculator():
+    """只計算、不檢查累計統計的測試共用同一個計算器"""
+    return TradingCostCalculator(commission_discount=0.6)
+
+
 class TestTradingCosts:
     """測試交易成本計算模組"""
     
-    def test_calculate_commission(self):
+    def test_calculate_commission(self, calculator):
         """測試手續費計算"""
-        calculator = TradingCostCalculator(commission_discount=0.6)
-        
         commission = calculator.calculate_commission(
             price=100,
             quantity=1,
@@ -281,10 +398,8 @@ class TestTradingCosts:
         assert tax_daytrade < tax_normal
         assert abs(tax_daytrade * 2 - tax_normal) < 1  # 允許小誤差
     
-    def test_calculate_round_trip_cost(self):
+    def test_calculate_round_trip_cost(self, calculator):
         """測試往返交易成本"""
-        calculator = TradingCostCalculator(commission_discount=0.6)
-        
         costs = calculator.calculate_round_trip_cost(
             entry_price=100,
             exit_price=100,  # 同價買賣
@@ -303,10 +418,48 @@ class TestTradingCosts:
         # 成本率應該合理 (通常 0.2% - 0.6%)
         assert 0.001 < costs['cost_rate'] < 1.0
     
-    def test_calculate_net_pnl_profit(self):
-        """測試淨損益計算（獲利情況）"""
-        calculator = TradingCostCalculator(commission_discount=0.6)
+    def test_calculate_round_trip_cost_batch(self, calculator):
+        """測試批次往返成本與逐筆計算一致"""
+        entries = np.array([100.0, 50.0, 10.0])
+        exits = np.array([102.0, 49.0, 10.5])
+        quantities = np.array([1, 3, 1])
+        daytrade = np.array([True, False, True])
+        
+        batch = calculator.calculate_round_trip_cost_batch(
+            entries, exits, quantities, daytrade
+        )
         
+        for i in range(len(entries)):
+            single = calculator.calculate_round_trip_cost(
+                entries[i], exits[i], int(quantities[i]), bool(daytrade[i])
+            )
+            assert batch['total_cost'][i] == pytest.approx(single['total_cost'])
+            assert batch['tax'][i] == pytest.approx(single['tax'])
+    
+    def test_calculate_round_trip_cost_batch_random(self):
+        """測試大量隨機交易下批次計算與逐筆計算各欄位一致"""
+        calculator = TradingCostCalculator(commission_discount=0.6)
+        rng = np.random.default_rng(0)
+        n = 10_000
+        
+        # 價格涵蓋最低手續費生效與不生效的區間
+        entries = rng.uniform(1.0, 1000.0, n)
+        exits = entries * rng.uniform(0.9, 1.1, n)
+        quantities = rng.integers(1, 20, n)
+        daytrade = rng.random(n) < 0.5
+        
+        batch = calculator.calculate_round_trip_cost_batch(entries, exits, quantities, daytrade)
+        
+        singles = [
+            calculator.calculate_round_trip_cost(e, x, int(q), bool(d))
+            for e, x, q, d in zip(entries, exits, quantities, daytrade)
+        ]
+        for key in singles[0]:
+            expected = np.array([single[key] for single in singles])
+            np.testing.assert_allclose(batch[key], expected, rtol=1e-9, err_msg=key)
+    
+    def test_calculate_net_pnl_profit(self, calculator):
+        """測試淨損益計算（獲利情況）"""
         result = calculator.calculate_net_pnl(
             entry_price=100,
             exit_price=102,  # 獲利 2%
@@ -323,10 +476,8 @@ class TestTradingCosts:
         # 淨利應該仍然是正數
         assert result['net_pnl'] > 0
     
-    def test_calculate_net_pnl_loss(self):
+    def test_calculate_net_pnl_loss(self, calculator):
         """測試淨損益計算（虧損情況）"""
-        calculator = TradingCostCalculator(commission_discount=0.6)
-        
         result = calculator.calculate_net_pnl(
             entry_price=100,
             exit_price=98,  # 虧損 2%
@@ -340,10 +491,40 @@ class TestTradingCosts:
         # 淨損應該更大（加上成本）
         assert result['net_pnl'] < result['gross_pnl']
     
-    def test_estimate_breakeven_price(self):
-        """測試損益兩平價計算"""
+    def test_calculate_net_pnl_batch(self, calculator):
+        """測試批次淨損益與逐筆計算一致"""
+        entries = np.array([100.0, 100.0, 10.0])
+        exits = np.array([102.0, 98.0, 10.5])
+        quantities = np.array([1, 1, 3])
+        
+        batch = calculator.calculate_net_pnl_batch(entries, exits, quantities, True)
+        
+        for i in range(len(entries)):
+            single = calculator.calculate_net_pnl(entries[i], exits[i], int(quantities[i]), True)
+            for key, value in single.items():
+                assert batch[key][i] == pytest.approx(value), key
+    
+    @pytest.mark.skipif(not HAS_PYTEST_BENCHMARK, reason="需要安裝 pytest-benchmark")
+    @pytest.mark.benchmark(group="pnl")
+    def test_bench_net_pnl_batch(self, benchmark):
+        """基準測試：10⁶ 筆淨損益批次計算，鎖住向量化路徑的效能"""
+        n = 1_000_000
+        entries = np.full(n, 100.0)
+        exits = np.full(n, 102.0)
+        quantities = np.ones(n)
         calculator = TradingCostCalculator(commission_discount=0.6)
         
+        result = benchmark.pedantic(
+            calculator.calculate_net_pnl_batch,
+            args=(entries, exits, quantities, True),
+            rounds=5,
+            iterations=1,
+        )
+        
+        assert result['net_pnl'].shape == (n,)
+    
+    def test_estimate_breakeven_price(self, calculator):
+        """測試損益兩平價計算"""
         breakeven = calculator.estimate_breakeven_price(
             entry_price=100,
             quantity=1,
@@ -356,8 +537,18 @@ class TestTradingCosts:
         # 需要漲幅應該合理 (通常 0.3% - 0.8%)
         assert 0.2 < breakeven['price_increase_pct'] < 1.0
     
+    def test_estimate_breakeven_price_batch(self, calculator):
+        """測試批次損益兩平價與迭代結果一致（含最低手續費情況）"""
+        entries = np.array([1.2, 10.0, 100.0, 523.5])
+        batch = calculator.estimate_breakeven_price_batch(entries, quantities=1)
+        
+        for entry, price in zip(entries, batch):
+            single = calculator.estimate_breakeven_price(entry, 1, is_daytrade=True)
+            assert abs(price - single['breakeven_price']) < 0.01
+    
     def test_get_cost_summary(self):
         """測試成本統計摘要"""
+        # 檢查累計筆數，使用獨立的計算器
         calculator = TradingCostCalculator(commission_discount=0.6)
         
         # 執行幾筆交易
@@ -371,6 +562,25 @@ class TestTradingCosts:
         assert summary['avg_cost_per_trade'] > 0
 
 
+@pytest.fixture(scope="class")
+def base_protection():
+    """資金保護系統（測試所依賴的門檻明確列出），整個測試類別只建立一次"""
+    return EquityProtection(
+        initial_capital=1000000,
+        max_daily_loss_pct=2.0,
+        max_drawdown_pct=10.0,
+        consecutive_loss_limit=3,
+        position_scaling=True,
+        auto_suspend=True
+    )
+
+
+@pytest.fixture
+def protection(base_protection):
+    """每個測試各自取得一份深複製，互不影響狀態"""
+    return copy.deepcopy(base_protection)
+
+
 class TestEquityProtection:
     """測試資金曲線保護模組"""
     
@@ -385,10 +595,8 @@ class TestEquityProtection:
         assert protection.current_capital == 1000000
         assert protection.trading_status == TradingStatus.ACTIVE
     
-    def test_update_equity_profit(self):
+    def test_update_equity_profit(self, protection):
         """測試更新資金（獲利）"""
-        protection = EquityProtection(initial_capital=1000000)
-        
         result = protection.update_equity(pnl=10000)
         
         assert result['current_capital'] == 1010000
@@ -396,23 +604,16 @@ class TestEquityProtection:
         assert protection.consecutive_wins == 1
         assert protection.consecutive_losses == 0
     
-    def test_update_equity_loss(self):
+    def test_update_equity_loss(self, protection):
         """測試更新資金（虧損）"""
-        protection = EquityProtection(initial_capital=1000000)
-        
         result = protection.update_equity(pnl=-10000)
         
         assert result['current_capital'] == 990000
         assert protection.consecutive_losses == 1
         assert protection.consecutive_wins == 0
     
-    def test_drawdown_calculation(self):
+    def test_drawdown_calculation(self, protection):
         """測試回撤計算"""
-        protection = EquityProtection(
-            initial_capital=1000000,
-            max_drawdown_pct=10.0
-        )
-        
         # 先獲利到高峰
         protection.update_equity(100000)  # 1,100,000
         
@@ -422,47 +623,21 @@ class TestEquityProtection:
         # 回撤應該是 (1,100,000 - 1,050,000) / 1,100,000 ≈ 4.5%
         assert abs(protection.current_drawdown - 0.0455) < 0.01
     
-    def test_max_daily_loss_protection(self):
-        """測試單日虧損保護"""
-        protection = EquityProtection(
-            initial_capital=1000000,
-            max_daily_loss_pct=2.0,
-            auto_suspend=True
-        )
-        
-        # 虧損 2% (達到上限)
-        protection.update_equity(-20000)
+    @pytest.mark.parametrize("pnl", [
+        pytest.param(-20000, id="max_daily_loss"),   # 虧損 2% (達到單日上限)
+        pytest.param(-100000, id="max_drawdown"),    # 虧損 10% (達到回撤上限)
+    ])
+    def test_protection_triggers(self, protection, pnl):
+        """測試單日虧損與最大回撤保護：觸發後暫停交易"""
+        protection.update_equity(pnl)
         
-        # 應該被暫停
         assert protection.trading_status == TradingStatus.SUSPENDED
         
         can_trade, reason = protection.can_trade()
         assert can_trade == False
     
-    def test_max_drawdown_protection(self):
-        """測試最大回撤保護"""
-        protection = EquityProtection(
-            initial_capital=1000000,
-            max_drawdown_pct=10.0,
-            auto_suspend=True
-        )
-        
-        # 虧損 10% (達到回撤上限)
-        protection.update_equity(-100000)
-        
-        # 應該被暫停
-        assert protection.trading_status == TradingStatus.SUSPENDED
-        
-        can_trade, reason = protection.can_trade()
-        assert can_trade == False
-    
-    def test_consecutive_loss_reduction(self):
+    def test_consecutive_loss_reduction(self, protection):
         """測試連續虧損減倉"""
-        protection = EquityProtection(
-            initial_capital=1000000,
-            consecutive_loss_limit=3
-        )
-        
         # 連續虧損 3 次
         protection.update_equity(-5000)
         protection.update_equity(-5000)
@@ -471,13 +646,8 @@ class TestEquityProtection:
         # 應該進入減倉模式
         assert protection.trading_status == TradingStatus.REDUCED
     
-    def test_position_size_multiplier(self):
+    def test_position_size_multiplier(self, protection):
         """測試部位大小乘數"""
-        protection = EquityProtection(
-            initial_capital=1000000,
-            position_scaling=True
-        )
-        
         # 正常狀態應該是 1.0
         assert protection.get_position_size_multiplier() == 1.0
         
@@ -489,20 +659,16 @@ class TestEquityProtection:
         multiplier = protection.get_position_size_multiplier()
         assert multiplier < 1.0
     
-    def test_reset_daily_pnl(self):
+    def test_reset_daily_pnl(self, protection):
         """測試重置每日損益"""
-        protection = EquityProtection(initial_capital=1000000)
-        
         protection.update_equity(-10000)
         assert protection.daily_pnl == -10000
         
         protection.reset_daily_pnl()
         assert protection.daily_pnl == 0.0
     
-    def test_get_statistics(self):
+    def test_get_statistics(self, protection):
         """測試統計資訊"""
-        protection = EquityProtection(initial_capital=1000000)
-        
         # 執行一些交易
         protection.update_equity(5000)
         protection.update_equity(-3000)
@@ -515,6 +681,138 @@ class TestEquityProtection:
         assert stats['losing_trades'] == 1
         assert stats['total_pnl'] == 6000
         assert stats['win_rate_pct'] > 0
+    
+    def test_update_equity_series_matches_scalar(self):
+        """測試批次套用損益與逐筆 update_equity 的狀態與結果一致"""
+        rng = np.random.default_rng(0)
+        pnls = rng.normal(0, 8000, 2000).round(0)
+        kwargs = dict(
+            initial_capital=1000000,
+            max_daily_loss_pct=5.0,
+            max_drawdown_pct=10.0,
+            consecutive_loss_limit=3,
+            recovery_period_days=0,
+            track_trade_history=True
+        )
+        
+        scalar = EquityProtection(**kwargs)
+        statuses = [scalar.update_equity(pnl)['trading_status'] for pnl in pnls]
+        
+        batch = EquityProtection(**kwargs)
+        result = batch.update_equity_series(pnls)
+        
+        assert list(result['trading_status']) == statuses
+        assert result['equity'][-1] == scalar.current_capital
+        assert batch.equity_curve == scalar.equity_curve
+        assert batch.trading_status == scalar.trading_status
+        assert batch.max_drawdown_reached == scalar.max_drawdown_reached
+        assert batch.get_statistics() == scalar.get_statistics()
+        assert [t['status'] for t in batch.trade_history] == [t['status'] for t in scalar.trade_history]
+    
+    def test_trade_history_tracking(self, protection):
+        """測試逐筆交易明細僅在啟用時記錄"""
+        protection.update_equity(5000)
+        assert protection.trade_history == []
+        assert protection.get_statistics()['total_trades'] == 1
+        
+        tracked = EquityProtection(initial_capital=1000000, track_trade_history=True)
+        tracked.update_equity(5000)
+        assert len(tracked.trade_history) == 1
+        assert tracked.trade_history[0]['pnl'] == 5000
+
+
+class TestStrategyCBacktest:
+    """Strategy C 回測的冒煙測試（使用內建示範資料）"""
+    
+    def test_backtest_on_demo_data(self):
+        """從示範資料第一個交易日開始回測：首日缺前一日低點、股數為 NaN 時不應中斷"""
+        cfg = yaml.safe_load((PROJECT_ROOT / "config_strategyC.yml").read_text(encoding="utf-8"))
+        md = make_demo_market_data(
+            asof=date(2024, 6, 28), num_stocks=60, num_sectors=6, history_days=30, seed=7
+        )
+        dates = sorted(md.daily_price["trade_date"].unique())
+        
+        curve = backtest_strategy_c(
+            start_date=dates[0],
+            end_date=dates[-1],
+            capital=1_000_000,
+            risk_per_trade=0.01,
+            stock_meta=md.stock_meta,
+            daily_price=md.daily_price,
+            cfg=cfg,
+        )
+        
+        assert len(curve) == len(dates) - 1
+        assert np.isfinite(curve["equity"].to_numpy(dtype=float)).all()
+        assert curve["num_trades"].sum() > 0
+
+
+def _make_price_frame(n: int = 150, seed: int = 3) -> pd.DataFrame:
+    """隨機漫步的日 K 資料（RangeIndex、無 Date 欄位）"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.02, n))
+    return pd.DataFrame({
+        'Close': close,
+        'High': close * (1 + rng.uniform(0, 0.02, n)),
+        'Low': close * (1 - rng.uniform(0, 0.02, n)),
+        'Volume': rng.uniform(1e3, 1e4, n),
+    })
+
+
+class TestEnhancedStrategyC:
+    """增強版 Strategy C：串流更新、指標快取與布林通道核心"""
+    
+    def test_update_stock_matches_analyze_stock(self):
+        """逐筆 update_stock 的結果與對完整資料呼叫 analyze_stock 相同"""
+        df = _make_price_frame()
+        strategy = EnhancedStrategyC()
+        strategy.init_stream('2330', df.iloc[:80])
+        
+        for k in range(80, len(df)):
+            streamed = strategy.update_stock('2330', df.iloc[k].to_dict())
+            full = strategy.analyze_stock(df.iloc[:k + 1])
+            
+            assert streamed['score'] == full['score']
+            assert streamed['signal'] == full['signal']
+            assert streamed['technical'] == full['technical']
+            assert streamed['chip']['obv_signal'] == full['chip']['obv_signal']
+    
+    def test_cache_skipped_without_timestamp(self):
+        """無時間資訊的資料不快取：較早 K 棒被修改時不得回傳舊指標"""
+        df = _make_price_frame()
+        strategy = EnhancedStrategyC()
+        strategy.analyze_stock(df, symbol='2330')
+        
+        edited = df.copy()
+        edited.loc[edited.index[:-1], 'Close'] += 50  # 筆數與最後一根 K 棒不變
+        
+        result = strategy.analyze_stock(edited, symbol='2330')
+        expected = EnhancedStrategyC().analyze_stock(edited)
+        assert result['technical']['rsi'] == expected['technical']['rsi']
+    
+    def test_cache_hit_with_dates(self):
+        """帶 Date 欄位時相同資料重複呼叫會命中快取"""
+        df = _make_price_frame().assign(Date=pd.bdate_range('2024-01-01', periods=150))
+        strategy = EnhancedStrategyC()
+        first = strategy.analyze_stock(df, symbol='2330')
+        
+        assert len(strategy._indicator_cache) == 1
+        assert strategy.analyze_stock(df, symbol='2330') == first
+    
+    def test_bbands_matches_rolling(self):
+        """_bbands 單次掃描結果與 rolling mean / std 一致（含 NaN 與整段同價）"""
+        close = _make_price_frame(n=300)['Close'].to_numpy()
+        close[50] = np.nan
+        close[120:150] = 100.0
+        series = pd.Series(close)
+        
+        upper, middle, lower = _bbands(close, 20, 2.0)
+        
+        ma = series.rolling(20).mean().to_numpy()
+        std = series.rolling(20).std().to_numpy()
+        np.testing.assert_allclose(middle, ma, rtol=1e-12, atol=1e-12)
+        np.testing.assert_allclose(upper, ma + 2 * std, rtol=1e-12, atol=1e-9)
+        np.testing.assert_allclose(lower, ma - 2 * std, rtol=1e-12, atol=1e-9)
 
 
 # 整合測試
@@ -544,6 +842,26 @@ class TestIntegration:
         assert trade_result['net_pnl'] > 0  # 應該有獲利
         assert protection_result['current_capital'] > 1000000
         assert protection.can_trade()[0] == True
+    
+    def test_full_trade_workflow_hot_loop(self):
+        """連續 1000 筆交易的效能防護：update_equity 每筆應為 O(1)，避免退化成 O(N²)"""
+        import time
+        
+        protection = EquityProtection(initial_capital=1000000)
+        calculator = TradingCostCalculator(commission_discount=0.6)
+        
+        start = time.perf_counter()
+        for _ in range(1000):
+            trade_result = calculator.calculate_net_pnl(100.0, 102.0, 2, is_daytrade=True)
+            protection.update_equity(trade_result['net_pnl'])
+        elapsed = time.perf_counter() - start
+        
+        assert protection.current_capital == pytest.approx(
+            1000000 + 1000 * trade_result['net_pnl']
+        )
+        assert protection.get_statistics()['total_trades'] == 1000
+        assert protection.can_trade()[0] == True
+        assert elapsed < 0.5
 
 
 def run_all_tests():
@@ -552,8 +870,12 @@ def run_all_tests():
     print("🧪 執行核心模組測試套件")
     print("=" * 80)
     
-    # 使用 pytest 執行
-    exit_code = pytest.main([__file__, "-v", "--tb=short"])
+    # 使用 pytest 執行；與 pyproject.toml 相同的匯入設定，讓 pytest 以 importlib 另行載入本檔，
+    # 不再依 sys.path 重新解析整個套件
+    exit_code = pytest.main([
+        __file__, "-v", "--tb=short",
+        "--import-mode=importlib", "-p", "no:cacheprovider",
+    ])
     
     print("\n" + "=" * 80)
     if exit_code == 0: